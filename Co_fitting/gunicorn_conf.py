@@ -0,0 +1,173 @@
+"""
+gunicornの実行時設定
+
+ワーカー数・スレッド数は、使えるCPU数（cgroupのCPUクォータを考慮）とメモリ上限（cgroupの上限、なければ物理メモリ）から求める。
+アプリをマスタープロセスで読み込んでからforkし（preload）、読み込み済みのメモリをワーカー間でコピーオンライトで共有する。
+ワーカーは一定数のリクエストを処理すると作り直し（ジッター付き）、メモリの増加を抑える。
+
+GUNICORN_MODE:
+    sync    WSGI + 同期ワーカー（デフォルト）
+    gthread WSGI + スレッドワーカー（外部APIやメール送信など、待ち時間の長い同期処理が多い場合）
+    asgi    ASGI + uvicornワーカー（オプトイン、非同期ビュー以外のビューはスレッドで実行されるため、
+            benchmark_concurrency で本番相当のDB・キャッシュに対して効果を確認してから使う）
+
+使い方:
+    gunicorn -c Co_fitting/gunicorn_conf.py
+    GUNICORN_MODE=gthread gunicorn -c Co_fitting/gunicorn_conf.py
+    GUNICORN_MODE=asgi gunicorn -c Co_fitting/gunicorn_conf.py
+    WEB_CONCURRENCY=4 GUNICORN_THREADS=8 gunicorn -c Co_fitting/gunicorn_conf.py   # ワーカー数・スレッド数を指定する
+"""
+import gc
+import math
+import os
+
+# モードごとの (アプリ, ワーカークラス)
+MODES = {
+    'asgi': ('Co_fitting.asgi:application', 'uvicorn_worker.UvicornWorker'),
+    'gthread': ('Co_fitting.wsgi:application', 'gthread'),
+    'sync': ('Co_fitting.wsgi:application', 'sync'),
+}
+
+# ワーカー1つあたりに見込むメモリ（MB）
+DEFAULT_WORKER_MEMORY_MB = 192
+# gthreadで1ワーカーに持たせるスレッド数の上限
+MAX_THREADS_PER_WORKER = 32
+
+
+def _read_cgroup_file(path):
+    try:
+        with open(path) as cgroup_file:
+            return cgroup_file.read().split()
+    except OSError:
+        return None
+
+
+def available_cpus():
+    """使えるCPU数（CPUアフィニティとcgroupのCPUクォータの小さい方）"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    # cgroup v2: "クォータ 期間"（無制限なら "max 期間"）
+    quota = _read_cgroup_file('/sys/fs/cgroup/cpu.max')
+    if quota and quota[0] != 'max':
+        return max(1, min(cpus, math.ceil(int(quota[0]) / int(quota[1]))))
+
+    # cgroup v1: 無制限ならクォータは-1
+    quota = _read_cgroup_file('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period = _read_cgroup_file('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if quota and period and int(quota[0]) > 0:
+        return max(1, min(cpus, math.ceil(int(quota[0]) / int(period[0]))))
+    return cpus
+
+
+def available_memory():
+    """使えるメモリのバイト数（cgroupの上限、なければ物理メモリ、取得できなければNone）"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        limit = _read_cgroup_file(path)
+        # cgroup v1では無制限の場合に非常に大きな値が入る
+        if limit and limit[0] != 'max' and int(limit[0]) < 1 << 60:
+            return int(limit[0])
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def size_workers(mode, cpus, memory_bytes, worker_memory_bytes):
+    """(ワーカー数, スレッド数) を求める
+
+    - sync: CPUごとに2つ + 1（I/O待ちの間に他のワーカーがCPUを使う）
+    - gthread: ワーカーはCPU数 + 1 とし、syncの2倍の同時処理数になるようスレッド数を決める
+    - asgi: 1ワーカーが1つのイベントループで多数のリクエストを扱うため、CPU数と同じ
+
+    ワーカー数はメモリに収まる数（マスタープロセスの分を除く）を上限とし、
+    gthreadでメモリにより減らした分はスレッド数を増やして同時処理数を保つ。
+    """
+    if mode == 'sync':
+        workers = 2 * cpus + 1
+    elif mode == 'gthread':
+        workers = cpus + 1
+    else:
+        workers = cpus
+
+    if memory_bytes:
+        workers = max(1, min(workers, memory_bytes // worker_memory_bytes - 1))
+
+    threads = 1
+    if mode == 'gthread':
+        threads = min(MAX_THREADS_PER_WORKER, max(2, math.ceil(2 * (2 * cpus + 1) / workers)))
+    return workers, threads
+
+
+mode = os.environ.get('GUNICORN_MODE', 'sync')
+if mode not in MODES:
+    raise RuntimeError(f'GUNICORN_MODE には次の値を指定してください: {", ".join(MODES)}')
+
+wsgi_app, worker_class = MODES[mode]
+workers, threads = size_workers(
+    mode,
+    available_cpus(),
+    available_memory(),
+    int(os.environ.get('GUNICORN_WORKER_MEMORY_MB', DEFAULT_WORKER_MEMORY_MB)) * 1024 * 1024,
+)
+workers = int(os.environ.get('WEB_CONCURRENCY', workers))
+threads = int(os.environ.get('GUNICORN_THREADS', threads))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# 一定数のリクエストを処理したワーカーを作り直す（ジッターで全ワーカーが同時に再起動しないようにする）
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# ロードバランサーからのKeep-Alive接続を使い回す
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# ワーカーの生存確認用の一時ファイルをメモリ上に置く（コンテナのディスクI/Oで止まらないようにする）
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+
+def _close_db_connections():
+    """DB接続を閉じる（Djangoを読み込んでいなければ何もしない）"""
+    from django.apps import apps
+
+    if apps.ready:
+        from django.db import connections
+        connections.close_all()
+
+
+def when_ready(server):
+    """ワーカーを起動する前にマスタープロセスで呼ばれる"""
+    server.log.info(
+        'mode=%s workers=%s threads=%s preload=%s max_requests=%s(+%s)',
+        mode, workers, threads, preload_app, max_requests, max_requests_jitter,
+    )
+    if preload_app:
+        # preload中に開いた接続をワーカーに引き継がない
+        _close_db_connections()
+        # 読み込み済みのオブジェクトをGCの対象から外し、GCによる書き込みでコピーオンライトの共有が崩れないようにする
+        gc.freeze()
+
+
+def pre_fork(server, worker):
+    """fork直前にマスタープロセスで呼ばれる（ワーカーの再起動時も含む）"""
+    if preload_app:
+        _close_db_connections()
+
+
+def post_fork(server, worker):
+    """fork直後にワーカーで呼ばれる（マスタープロセスから引き継いだDB接続を使わずに接続し直す）"""
+    _close_db_connections()
+
+
+def worker_exit(server, worker):
+    """ワーカーの終了時に送信待ちのメールを送信してからメール送信スレッドを止める"""
+    from django.apps import apps
+
+    if apps.ready:
+        from Co_fitting.services.email_dispatcher import email_dispatcher
+        email_dispatcher.shutdown()
@@ -0,0 +1,151 @@
+"""
+メールのバックグラウンド送信
+
+送信するメールは送信待ち（users.EmailOutbox）に登録し、コミット後に wake_outbox() で送信を依頼する。
+リクエストごとにスレッドとSMTP接続を作らず、プロセス内で固定数のワーカースレッドと上限付きのキューで送信する。
+
+- ワーカーはそれぞれSMTP接続を保持して再利用し、一定時間送信がなければ切断する
+- 送信の失敗と再送は送信待ちの行に記録する（EmailOutbox.objects.drain）
+- キューが満杯の場合は依頼を諦めてログに残す（リクエストを待たせず、drain_outbox コマンドで送信する）
+- プロセス終了時は依頼済みの送信を終えてから停止する
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.core.mail import get_connection
+from django.db import close_old_connections
+
+from Co_fitting.utils.constants import EmailConstants
+
+logger = logging.getLogger(__name__)
+
+# ワーカーに停止を伝えるための番兵
+_STOP = object()
+# ワーカーに送信待ちメールの送信を依頼するための番兵
+_DRAIN_OUTBOX = object()
+
+
+class EmailDispatcher:
+    """固定数のワーカースレッドでメールを送信するディスパッチャ"""
+
+    def __init__(
+        self,
+        workers=EmailConstants.WORKERS,
+        queue_size=EmailConstants.QUEUE_SIZE,
+        idle_seconds=EmailConstants.CONNECTION_IDLE_SECONDS,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._threads = []
+        self._drain_requested = threading.Event()
+
+    def wake_outbox(self):
+        """送信待ちのメールの送信をワーカーに依頼する（依頼済みで未着手なら何もしない）"""
+        if self._drain_requested.is_set():
+            return True
+        self._ensure_started()
+        self._drain_requested.set()
+        try:
+            self._queue.put_nowait(_DRAIN_OUTBOX)
+        except queue.Full:
+            # 送信待ちのメールは失われないため、drain_outbox コマンドでの送信に任せる
+            self._drain_requested.clear()
+            logger.error('メール送信キューが満杯のため、送信待ちのメールの送信を依頼できませんでした')
+            return False
+        return True
+
+    def flush(self):
+        """依頼済みの送信がすべて処理されるまで待つ"""
+        if self._queue is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def shutdown(self, timeout=EmailConstants.SHUTDOWN_TIMEOUT):
+        """依頼済みの送信を終えてからワーカーを停止する"""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            threads, self._threads = self._threads, []
+            for _ in threads:
+                self._queue.put(_STOP)
+            self._pid = None
+
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def _ensure_started(self):
+        """ワーカーを起動する（fork後の子プロセスでは親のスレッドが引き継がれないため作り直す）"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._drain_requested.clear()
+            self._threads = [
+                threading.Thread(target=self._run, args=(self._queue,), name=f'email-dispatcher-{index}', daemon=True)
+                for index in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def _run(self, message_queue):
+        """ワーカーの処理（接続を保持したまま、依頼を受けるたびに送信待ちのメールを送信する）"""
+        connection = None
+        while True:
+            try:
+                request = message_queue.get(timeout=self.idle_seconds)
+            except queue.Empty:
+                # しばらく送信がなければ接続を閉じる（サーバー側でのタイムアウト切断を避ける）
+                connection = self._close(connection)
+                continue
+
+            try:
+                if request is _STOP:
+                    self._close(connection)
+                    return
+                connection = self._drain_outbox(connection)
+            finally:
+                message_queue.task_done()
+
+    def _drain_outbox(self, connection):
+        """送信待ちのメールがなくなるまでバッチで送信する（使用中の接続を返す）"""
+        from users.models import EmailOutbox
+
+        # 依頼の受付を再開してから送信する（送信中に登録されたメールも取りこぼさない）
+        self._drain_requested.clear()
+        if connection is None:
+            connection = get_connection()
+        close_old_connections()
+        try:
+            while any(EmailOutbox.objects.drain(connection=connection)):
+                pass
+        except Exception:
+            logger.exception('送信待ちのメールの送信に失敗しました')
+            connection = self._close(connection)
+        finally:
+            close_old_connections()
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        """接続を閉じる（閉じる際のエラーは無視する）"""
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        return None
+
+
+email_dispatcher = EmailDispatcher()
+atexit.register(email_dispatcher.shutdown)
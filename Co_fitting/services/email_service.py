@@ -1,16 +1,21 @@
-import threading
+import hashlib
 
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.cache import cache
 from django.utils import timezone
 
+from Co_fitting.utils.constants import CacheConstants
+
 
 class EmailService:
-    """メール送信のサービスクラス"""
+    """メール送信のサービスクラス
+
+    build_* は (件名, 本文, 宛先リスト) を作成する。送信はEmailOutboxへの登録で行う。
+    """
 
     @staticmethod
-    def send_signup_confirmation_email(user, confirmation_link):
-        """サインアップ確認メールを送信"""
+    def build_signup_confirmation(user, confirmation_link):
+        """サインアップ確認メールを作成"""
         subject = "アカウント登録の確認"
         message = (
             f"{user.username} さん\n\n"
@@ -19,29 +24,56 @@ class EmailService:
             f"{confirmation_link}\n\n"
             "このリンクは一度しか使用できませんのでご注意ください。"
         )
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+        return subject, message, [user.email]
 
     @staticmethod
-    def send_login_notification_email(user, ip_address):
-        """ログイン通知メールを送信"""
+    def build_login_notification(user, ip_address, suppressed_count=0):
+        """ログイン通知メールを作成（suppressed_countは前回の通知以降にまとめたログイン回数）"""
         subject = "ログイン通知"
         message = (
             f"{user.username} さん\n\n"
             "Co-fittingにて、あなたのアカウントでログインがありました。\n"
             f"日時: {timezone.localtime()}\n"
             f"IPアドレス: {ip_address}\n\n"
-            "もしこのログインに心当たりがない場合は、至急パスワードを変更してください。"
         )
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+        if suppressed_count:
+            message += f"前回の通知以降、同じIPアドレスから他に{suppressed_count}回のログインがありました。\n\n"
+        message += "もしこのログインに心当たりがない場合は、至急パスワードを変更してください。"
+        return subject, message, [user.email]
 
     @staticmethod
-    def send_login_notification_async(user, ip_address):
-        """ログイン通知メールを非同期で送信"""
-        threading.Thread(target=EmailService.send_login_notification_email, args=(user, ip_address)).start()
+    def build_coalesced_login_notification(user, ip_address):
+        """同じ (ユーザー, IPアドレス) の通知を一定時間に1通にまとめてログイン通知メールを作成
+
+        期間内の2回目以降のログインはNoneを返して通知せず、回数を数えておき、期間後の次の通知に記載する。
+        新しいIPアドレスからのログインは常に通知する。
+        """
+        window = settings.LOGIN_NOTIFICATION_WINDOW_SECONDS
+        if window <= 0:
+            return EmailService.build_login_notification(user, ip_address)
+
+        ip_hash = hashlib.sha256(str(ip_address).encode()).hexdigest()
+        window_key = CacheConstants.LOGIN_NOTIFICATION_WINDOW_KEY.format(user_id=user.pk, ip_hash=ip_hash)
+        suppressed_key = CacheConstants.LOGIN_NOTIFICATION_SUPPRESSED_KEY.format(user_id=user.pk, ip_hash=ip_hash)
+
+        # 期間内に通知済みなら、まとめた回数を数えるだけにする（addは同時ログインでも1リクエストだけが成功する）
+        if not cache.add(window_key, 1, window):
+            cache.add(suppressed_key, 0, CacheConstants.LOGIN_NOTIFICATION_SUPPRESSED_TIMEOUT)
+            try:
+                cache.incr(suppressed_key)
+            except ValueError:
+                # 期限切れと競合した場合は数えない
+                pass
+            return None
+
+        suppressed_count = cache.get(suppressed_key, 0)
+        if suppressed_count:
+            cache.delete(suppressed_key)
+        return EmailService.build_login_notification(user, ip_address, suppressed_count)
 
     @staticmethod
-    def send_email_change_confirmation_email(user, new_email, confirmation_link):
-        """メールアドレス変更確認メールを送信"""
+    def build_email_change_confirmation(user, new_email, confirmation_link):
+        """メールアドレス変更確認メールを作成"""
         subject = "メールアドレス変更の確認"
         message = (
             f"{user.username} さん\n\n"
@@ -51,4 +83,4 @@ class EmailService:
             f"{confirmation_link}\n\n"
             "このリンクは一度しか使用できませんのでご注意ください。"
         )
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [new_email])
+        return subject, message, [new_email]
@@ -14,6 +14,8 @@ from pathlib import Path
 import os
 import environ
 import sys
+import uuid
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -40,6 +42,10 @@ DEBUG = env('DEBUG')
 
 ALLOWED_HOSTS = env('DJANGO_ALLOWED_HOSTS').split(',')
 CSRF_TRUSTED_ORIGINS = env.list('CSRF_TRUSTED_ORIGINS', default=[])
+
+# デプロイごとに変わるビルドID（静的ページのキャッシュキーに使う）
+# 未設定の場合はプロセス起動ごとに生成し、再起動でキャッシュを作り直す
+BUILD_ID = env('BUILD_ID', default='') or uuid.uuid4().hex
 SILENCED_SYSTEM_CHECKS = env.list('SILENCED_SYSTEM_CHECKS', default=[])
 
 # Application definition
@@ -66,11 +72,12 @@ if USE_DJANGO_EXTENSIONS:
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'Co_fitting.utils.static_files.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Co_fitting.utils.auth_cache.CachedAuthenticationMiddleware',
+    'Co_fitting.utils.db_router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -128,6 +135,62 @@ DATABASES = {
     }
 }
 
+# リードレプリカ（カンマ区切りのホスト名。未設定ならすべてプライマリから読む）
+# 接続情報はプライマリと共通で、ホストのみ差し替える
+DATABASE_REPLICAS = []
+for index, replica_host in enumerate(env.list('DATABASE_REPLICA_HOSTS', default=[]), start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['Co_fitting.utils.db_router.ReplicaRouter']
+
+# 書き込み後、同じクライアントの読み取りをプライマリに固定する秒数（レプリケーション遅延の吸収）
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', default=5)
+
+
+# Cache
+# CACHE_URLで切り替える（django-environの形式）
+#   redis://host:6379/0               ワーカー・ホスト間で共有（DEBUGでない場合のデフォルト）
+#   filecache:///var/tmp/django_cache 同一ホストのワーカー間で共有
+#   locmemcache://                    プロセス内（DEBUG時のデフォルト）
+# バージョンキーによる無効化・再計算のロック・レプリカ遅延の目印は全ワーカーから見える必要があるため、
+# DEBUGでない場合はプロセス内キャッシュを許可しない（他のワーカーが期限まで古いデータを返し続ける）
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://' if DEBUG else 'redis://localhost:6379/0'),
+}
+CACHES['default'].setdefault('KEY_PREFIX', 'co-fitting')
+LOCMEM_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+if not DEBUG and CACHES['default']['BACKEND'] == LOCMEM_CACHE_BACKEND and 'test' not in sys.argv:
+    raise ImproperlyConfigured('CACHE_URL must point to a cache shared between workers (e.g. redis://) when DEBUG is off')
+
+# Session
+# SESSION_MODEで保存先を切り替える
+#   db         データベースのみ（デフォルト、リクエストごとにdjango_sessionを読む）
+#   cached_db  キャッシュから読み、書き込みはデータベースにも行う（キャッシュが消えてもログインは維持される）
+#   cache      キャッシュのみ（ワーカー間で共有されるCACHE_URLが前提、キャッシュの追い出しでログアウトされる）
+# db・cached_dbの期限切れセッションは clear_expired_sessions コマンドで定期的に削除する
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+}
+SESSION_MODE = env('SESSION_MODE', default='db')
+if SESSION_MODE not in SESSION_ENGINES:
+    raise ImproperlyConfigured(f'SESSION_MODE must be one of {", ".join(SESSION_ENGINES)}: {SESSION_MODE}')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+
+# ログインユーザーをキャッシュし、リクエストごとのUserテーブルの読み込みを省く（オプトイン）
+CACHED_AUTH_USER = env.bool('CACHED_AUTH_USER', default=False)
+
+# gunicornの起動モード（Co_fitting/gunicorn_conf.py）
+# asgiの場合のみ、読み取り専用のレシピAPIを非同期ビューで処理する（WSGIでは同期ビューのまま）
+GUNICORN_MODE = env('GUNICORN_MODE', default='sync')
+ASYNC_READ_VIEWS = GUNICORN_MODE == 'asgi'
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -194,6 +257,9 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')  # アプリパスワード
 DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL') or EMAIL_HOST_USER
 
+# 同じユーザー・IPアドレスからのログイン通知を1通にまとめる秒数（0でまとめない）
+LOGIN_NOTIFICATION_WINDOW_SECONDS = env.int('LOGIN_NOTIFICATION_WINDOW_SECONDS', default=60 * 60)
+
 
 # ログ取得用の設定
 
@@ -214,6 +280,11 @@ LOGGING = {
             "level": "ERROR",
             "propagate": True,
         },
+        "Co_fitting": {
+            "handlers": ["console"],
+            "level": "ERROR",
+            "propagate": False,
+        },
         "django_recaptcha": {
             "handlers": [],
             "level": "CRITICAL",
@@ -230,6 +301,7 @@ if LOG_FILE:
         "filename": LOG_FILE,
     }
     LOGGING["loggers"]["django"]["handlers"].append("file")
+    LOGGING["loggers"]["Co_fitting"]["handlers"].append("file")
 
 # SSL
 SECURE_SSL_REDIRECT = env('FORCE_SSL_REDIRECT')
@@ -245,6 +317,10 @@ USE_X_FORWARDED_HOST = True
 # こうしないとリダイレクト関係のテストが通らない
 if 'test' in sys.argv:
     SECURE_SSL_REDIRECT = False
+    # テストでは外部のキャッシュサーバーに依存せず、プロセス内キャッシュを使う
+    CACHES = {
+        'default': {'BACKEND': LOCMEM_CACHE_BACKEND},
+    }
 
 # reCAPTCHA設定
 RECAPTCHA_PUBLIC_KEY = env('RECAPTCHA_PUBLIC_KEY')
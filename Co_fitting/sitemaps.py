@@ -2,10 +2,22 @@
 サイトマップ生成モジュール
 
 Django Sitemap Frameworkを使用して、検索エンジン向けのサイトマップを生成する。
+サイトマップインデックス（/sitemap.xml）から、セクションごとのサイトマップ（/sitemap-<section>.xml?p=N）を参照する。
+共有レシピはIDの範囲で固定サイズのチャンクに分割し、generate_sitemapsコマンドで事前生成したファイルがあればそれを返す。
 """
+import re
+
 from django.contrib.sitemaps import Sitemap
+from django.contrib.sitemaps import views as sitemap_views
+from django.core.files.storage import default_storage
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.db.models import Max
+from django.http import HttpResponse
+from django.template.loader import render_to_string
 from django.urls import reverse
 from recipes.models import SharedRecipe
+from .utils.constants import AppConstants
+from .utils.db_router import read_from_replica
 
 
 class StaticViewSitemap(Sitemap):
@@ -26,23 +38,128 @@ class StaticViewSitemap(Sitemap):
         return reverse(item)
 
 
+class IdRangePage:
+    """IDの範囲で区切ったサイトマップの1チャンク"""
+
+    def __init__(self, object_list):
+        self.object_list = object_list
+
+
+class IdRangePaginator:
+    """IDの範囲で固定サイズのチャンクに分割するページネーター
+
+    OFFSETや件数のCOUNTを使わず、チャンク数は最大IDから求め、各チャンクはIDの範囲で取得する。
+    削除されたレシピの分だけチャンク内の件数は減るが、上限（chunk_size）を超えることはない。
+    """
+
+    def __init__(self, queryset, chunk_size):
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+
+    @property
+    def num_pages(self):
+        max_id = self.queryset.aggregate(max_id=Max('id'))['max_id'] or 0
+        return max(1, -(-max_id // self.chunk_size))
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('ページ番号が整数ではありません。')
+        if number < 1 or number > self.num_pages:
+            raise EmptyPage('ページが存在しません。')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        first_id = (number - 1) * self.chunk_size + 1
+        return IdRangePage(
+            self.queryset.filter(id__range=(first_id, first_id + self.chunk_size - 1)).order_by('id').iterator()
+        )
+
+
 class SharedRecipeSitemap(Sitemap):
-    """共有レシピ用のサイトマップ"""
+    """共有レシピ用のサイトマップ（IDの範囲でチャンクに分割）"""
     priority = 0.5
     changefreq = 'never'
     protocol = 'https'
+    limit = AppConstants.SITEMAP_CHUNK_SIZE
 
     def items(self):
-        return SharedRecipe.objects.all().order_by('-created_at')
+        # モデルインスタンスを作らず、URLと更新日時に必要な列だけを読む
+        return SharedRecipe.objects.values_list('access_token', 'created_at')
+
+    @property
+    def paginator(self):
+        return IdRangePaginator(self.items(), self.limit)
+
+    def location(self, item):
+        return reverse('recipes:shared_recipe_ogp', kwargs={'token': item[0]})
 
-    def location(self, obj):
-        return reverse('recipes:shared_recipe_ogp', kwargs={'token': obj.access_token})
+    def lastmod(self, item):
+        return item[1]
 
-    def lastmod(self, obj):
-        return obj.created_at
+    def get_latest_lastmod(self):
+        # 全件を読まずに集計クエリで求める
+        return SharedRecipe.objects.aggregate(latest=Max('created_at'))['latest']
 
 
 sitemaps = {
     'static': StaticViewSitemap,
     'shared_recipes': SharedRecipeSitemap,
 }
+
+
+def prebuilt_sitemap_path(section=None, page=1):
+    """事前生成したサイトマップのストレージ上のパス（sectionがNoneならインデックス）"""
+    if section is None:
+        return f'{AppConstants.SITEMAP_STORAGE_DIR}/sitemap.xml'
+    return f'{AppConstants.SITEMAP_STORAGE_DIR}/sitemap-{section}-{page}.xml'
+
+
+def render_sitemap_files(domain, protocol='https'):
+    """インデックスと全チャンクのサイトマップを生成し、(ストレージ上のパス, XML) を順に返す"""
+    site = type('SitemapSite', (), {'domain': domain})()
+    index_entries = []
+
+    for section, sitemap_class in sitemaps.items():
+        sitemap = sitemap_class()
+        section_url = f"{protocol}://{domain}{reverse('sitemap-section', kwargs={'section': section})}"
+        last_mod = sitemap.get_latest_lastmod()
+
+        for page in range(1, sitemap.paginator.num_pages + 1):
+            urls = sitemap.get_urls(page=page, site=site, protocol=protocol)
+            yield prebuilt_sitemap_path(section, page), render_to_string('sitemap.xml', {'urlset': urls})
+            index_entries.append({
+                'location': section_url if page == 1 else f'{section_url}?p={page}',
+                'last_mod': last_mod,
+            })
+
+    yield prebuilt_sitemap_path(), render_to_string('sitemap_index.xml', {'sitemaps': index_entries})
+
+
+def serve_prebuilt_sitemap(path):
+    """事前生成したサイトマップがあれば返す（なければNone）"""
+    if not default_storage.exists(path):
+        return None
+    with default_storage.open(path) as sitemap_file:
+        return HttpResponse(sitemap_file.read(), content_type='application/xml')
+
+
+@read_from_replica
+def sitemap_index(request):
+    """サイトマップインデックス（事前生成したファイルがなければその場で生成）"""
+    return serve_prebuilt_sitemap(prebuilt_sitemap_path()) or sitemap_views.index(
+        request, sitemaps, sitemap_url_name='sitemap-section'
+    )
+
+
+@read_from_replica
+def sitemap_section(request, section):
+    """セクションごとのサイトマップ（事前生成したファイルがなければその場で生成）"""
+    page = request.GET.get('p', '1')
+    if section in sitemaps and re.fullmatch(r'[1-9][0-9]*', page):
+        response = serve_prebuilt_sitemap(prebuilt_sitemap_path(section, page))
+        if response:
+            return response
+    return sitemap_views.sitemap(request, sitemaps, section=section)
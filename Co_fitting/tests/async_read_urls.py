@@ -0,0 +1,17 @@
+"""
+読み取り専用のレシピAPIを非同期ビューで処理するURL設定（テスト用）
+
+GUNICORN_MODE=asgi（settings.ASYNC_READ_VIEWS）で起動した場合と同じビューを、同じURL名で公開する。
+"""
+from django.urls import include, path
+
+from recipes import async_views
+
+urlpatterns = [
+    path('recipes/', include(([
+        path('share/<str:token>/', async_views.shared_recipe_ogp, name='shared_recipe_ogp'),
+        path('api/shared-recipes/', async_views.get_user_shared_recipes, name='get_user_shared_recipes'),
+        path('api/shared-recipes/<str:token>/', async_views.retrieve_shared_recipe, name='retrieve_shared_recipe'),
+        path('api/preset-recipes/', async_views.get_preset_recipes, name='get_preset_recipes'),
+    ], 'recipes'))),
+]
@@ -4,6 +4,7 @@ DRY原則に従い、重複するテストコードを統一する
 """
 from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.core.cache import cache
 import uuid
 import json
 
@@ -167,6 +168,8 @@ class BaseTestCase(TestCase):
     def setUp(self):
         """共通のセットアップ処理"""
         super().setUp()
+        # キャッシュされたレスポンスをテスト間で持ち越さない
+        cache.clear()
         # デフォルトプリセットユーザーを作成（多くのテストで必要）
         self.default_preset_user = create_default_preset_user()
 
@@ -279,3 +282,100 @@ def create_form_data(name='テストレシピ', len_steps=2, bean_g=20.0, is_ice
         form_data[f'step{i+1}_water'] = 100.0 * (i + 1)
 
     return form_data
+
+
+def count_queries(func):
+    """
+    funcの実行中に発行されたクエリ数を取得する共通関数
+
+    Args:
+        func (callable): 計測対象の処理
+
+    Returns:
+        int: 発行されたクエリ数
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as context:
+        func()
+    return len(context.captured_queries)
+
+
+def explain_queries(func):
+    """
+    funcの実行中に発行されたSELECT文の実行計画を取得する共通関数
+
+    Args:
+        func (callable): 計測対象の処理
+
+    Returns:
+        list: (SQL, 実行計画の文字列) のタプルのリスト
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as context:
+        func()
+
+    plans = []
+    prefix = connection.ops.explain_query_prefix()
+    with connection.cursor() as cursor:
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            cursor.execute(f'{prefix} {sql}')
+            plans.append((sql, ' '.join(str(row) for row in cursor.fetchall())))
+    return plans
+
+
+def analyze_tables(*table_names):
+    """
+    実行計画の検証前に、テーブルの統計情報を更新する共通関数（DBごとの構文の違いを吸収する）
+
+    Args:
+        *table_names (str): 対象テーブル名
+    """
+    from django.db import connection
+
+    quoted_names = ', '.join(connection.ops.quote_name(name) for name in table_names)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('ANALYZE')
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'ANALYZE {quoted_names}')
+        # MySQLのANALYZE TABLEは暗黙的にコミットし、テストのトランザクションを壊すため実行しない
+        # （InnoDBは統計情報を自動で再計算する）
+
+
+def assert_queries_use_index(test_case, func, table_name, index_name):
+    """
+    funcが発行するtable_nameへのSELECTが指定インデックスを使うことを検証する共通関数
+
+    Args:
+        test_case (TestCase): テストケースインスタンス
+        func (callable): 計測対象の処理
+        table_name (str): 対象テーブル名
+        index_name (str): 使われるべきインデックス名
+    """
+    from django.db import connection
+
+    # SQLiteでは一意制約が自動生成名のインデックス(sqlite_autoindex_*)になるため、同じ列を持つものも許容する
+    accepted_names = {index_name}
+    with connection.cursor() as cursor:
+        columns = connection.introspection.get_constraints(cursor, table_name)[index_name]['columns']
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'PRAGMA index_list({connection.ops.quote_name(table_name)})')
+            for name in [row[1] for row in cursor.fetchall()]:
+                cursor.execute(f'PRAGMA index_info({connection.ops.quote_name(name)})')
+                if [row[2] for row in cursor.fetchall()] == columns:
+                    accepted_names.add(name)
+
+    plans = [(sql, plan) for sql, plan in explain_queries(func) if table_name in sql]
+    test_case.assertTrue(plans, f"{table_name} へのクエリが発行されていません")
+    for sql, plan in plans:
+        test_case.assertTrue(
+            any(name in plan for name in accepted_names),
+            f"インデックス '{index_name}' が使われていません: {sql}\n{plan}"
+        )
@@ -3,9 +3,11 @@ from django.test.utils import override_settings as override_settings_utils
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.core import mail
+from django.core.management import call_command
 from django.db import connection
 from unittest.mock import patch
 from django_recaptcha.client import RecaptchaResponse
+from io import StringIO
 import json
 import time
 
@@ -44,7 +46,8 @@ class EndToEndWorkflowTestCase(BaseTestCase):
 
             self.assertEqual(response.status_code, 302)
 
-        # 2. 確認メールの送信確認
+        # 2. 確認メールの送信確認（送信待ちに登録されたメールを送信する）
+        call_command('drain_outbox', stdout=StringIO())
         self.assertEqual(len(mail.outbox), 1)
         self.assertIn('アカウント確認', mail.outbox[0].subject)
 
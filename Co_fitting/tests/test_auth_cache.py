@@ -0,0 +1,141 @@
+"""認証済みユーザーのキャッシュのテスト"""
+from asgiref.sync import async_to_sync
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY
+from django.core.cache import cache
+from django.test import RequestFactory, override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from users.models import User
+from Co_fitting.tests.helpers import BaseTestCase, create_test_user
+from Co_fitting.utils.auth_cache import get_cached_user, user_cache_key
+
+
+def count_user_queries(queries):
+    """Userテーブルを読んだクエリの数"""
+    table = connection.ops.quote_name(User._meta.db_table)
+    return sum(f'FROM {table}' in query['sql'] for query in queries.captured_queries)
+
+
+@override_settings(CACHED_AUTH_USER=True)
+class CachedAuthUserTestCase(BaseTestCase):
+    """CACHED_AUTH_USERを有効にした場合のテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+        self.client.force_login(self.user)
+        # 1回目のリクエストでユーザーをキャッシュする
+        self.client.get(reverse('mypage'))
+
+    def assert_user_reloaded(self, expected_reloads=1):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('mypage'))
+        self.assertEqual(count_user_queries(queries), expected_reloads)
+        return response
+
+    def test_cached_user_skips_user_query(self):
+        """2回目以降のリクエストではUserテーブルを読まないことをテスト"""
+        response = self.assert_user_reloaded(expected_reloads=0)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'test@example.com')
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_api_reaches_view_without_queries(self):
+        """セッションとユーザーがキャッシュ済みなら、プリセット一覧APIはDBにアクセスしないことをテスト"""
+        # SessionMiddlewareは初期化時のSESSION_ENGINEを使うため、新しいクライアントで検証する
+        client = self.client_class()
+        client.force_login(self.user)
+        client.get(reverse('recipes:get_preset_recipes'))
+
+        with self.assertNumQueries(0):
+            response = client.get(reverse('recipes:get_preset_recipes'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_hash_not_cached(self):
+        """キャッシュにパスワードのハッシュを保存しないことをテスト"""
+        session = self.client.session
+        cache_key = user_cache_key(session[SESSION_KEY], session[HASH_SESSION_KEY])
+
+        values = cache.get(cache_key)
+        self.assertIsNotNone(values)
+        self.assertNotIn('password', values)
+        self.assertNotIn(User.objects.get(pk=self.user.pk).password, values.values())
+
+    def test_saving_cached_user_keeps_password(self):
+        """キャッシュから復元したユーザーを保存してもパスワードを上書きしないことをテスト"""
+        password = User.objects.get(pk=self.user.pk).password
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+
+        cached_user = get_cached_user(request)
+        self.assertEqual(cached_user.email, 'test@example.com')
+        cached_user.username = '変更後'
+        cached_user.save()
+
+        self.assertEqual(User.objects.get(pk=self.user.pk).password, password)
+
+    def test_change_user_email_invalidates(self):
+        """メールアドレスの変更でキャッシュが無効化されることをテスト"""
+        User.objects.change_user_email(User.objects.get(pk=self.user.pk), 'changed@example.com')
+
+        response = self.assert_user_reloaded()
+        self.assertContains(response, 'changed@example.com')
+
+    def test_activate_user_invalidates(self):
+        """アカウントの有効化でキャッシュが無効化されることをテスト"""
+        User.objects.activate_user(User.objects.get(pk=self.user.pk))
+
+        self.assert_user_reloaded()
+
+    def test_change_user_password_logs_out_other_sessions(self):
+        """パスワードを変更すると、キャッシュ済みの他のセッションもログアウトされることをテスト"""
+        request = RequestFactory().post('/')
+        request.session = self.client.session.__class__()
+        User.objects.change_user_password(User.objects.get(pk=self.user.pk), 'newpassword123', request)
+
+        response = self.client.get(reverse('mypage'))
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_account_delete_invalidates(self):
+        """退会でキャッシュが無効化され、未ログイン扱いになることをテスト"""
+        other_client = self.client_class()
+        other_client.force_login(self.user)
+        other_client.get(reverse('mypage'))
+
+        self.client.post(reverse('users:account_delete'))
+        response = other_client.get(reverse('mypage'))
+
+        self.assertEqual(response.status_code, 302)
+
+
+    @override_settings(ROOT_URLCONF='Co_fitting.tests.async_read_urls')
+    def test_async_view_uses_cached_user(self):
+        """非同期ビューのrequest.auser()もキャッシュ済みのユーザーを使うことをテスト"""
+        self.async_client.force_login(self.user)
+        get = async_to_sync(self.async_client.get)
+        get(reverse('recipes:get_user_shared_recipes'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = get(reverse('recipes:get_user_shared_recipes'))
+
+        self.assertEqual(response.status_code, 200)
+        # 一覧の取得クエリだけが実行され、Userテーブルは読まない
+        self.assertGreater(len(queries), 0)
+        self.assertEqual(count_user_queries(queries), 0)
+
+
+class AuthUserCacheDisabledTestCase(BaseTestCase):
+    """CACHED_AUTH_USERが無効（デフォルト）の場合のテスト"""
+
+    def test_user_loaded_every_request(self):
+        """無効な場合はリクエストごとにUserテーブルを読むことをテスト"""
+        self.client.force_login(create_test_user())
+        self.client.get(reverse('mypage'))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('mypage'))
+
+        self.assertEqual(count_user_queries(queries), 1)
@@ -0,0 +1,99 @@
+"""キャッシュヘルパーのテスト"""
+import time
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from Co_fitting.utils.cache_utils import get_or_compute, lock_key, set_cached
+
+
+class GetOrComputeTests(SimpleTestCase):
+    """get_or_computeのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='計算結果'):
+        def func():
+            self.calls += 1
+            return value
+        return func
+
+    def test_computes_once_and_caches(self):
+        """初回だけ計算し、以降はキャッシュを返すこと"""
+        self.assertEqual(get_or_compute('key', self.compute(), 60), '計算結果')
+        self.assertEqual(get_or_compute('key', self.compute(), 60), '計算結果')
+        self.assertEqual(self.calls, 1)
+
+    def test_caches_none(self):
+        """Noneも結果としてキャッシュすること"""
+        get_or_compute('key', self.compute(None), 60)
+        self.assertIsNone(get_or_compute('key', self.compute(None), 60))
+        self.assertEqual(self.calls, 1)
+
+    def test_timeout_can_depend_on_value(self):
+        """timeoutに関数を渡すと、値に応じたTTLで保存すること"""
+        with patch('Co_fitting.utils.cache_utils.random.uniform', return_value=1.0):
+            get_or_compute('key', self.compute(None), lambda value: 60 if value else 5)
+
+        _, _, expires_at = cache.get('key')
+        self.assertAlmostEqual(expires_at, time.time() + 5, delta=1)
+
+    def test_ttl_is_jittered(self):
+        """TTLにジッターが加わること"""
+        set_cached('key', '値', 1000, jitter=0.1)
+
+        _, _, expires_at = cache.get('key')
+        self.assertTrue(time.time() + 890 <= expires_at <= time.time() + 1100)
+
+    def test_recomputes_early_near_expiry(self):
+        """計算に時間のかかる値は、期限の手前で再計算すること"""
+        cache.set('key', ('古い値', 100.0, time.time() + 1), 60)
+
+        self.assertEqual(get_or_compute('key', self.compute('新しい値'), 60), '新しい値')
+        self.assertEqual(self.calls, 1)
+
+    def test_early_recompute_returns_current_value_while_locked(self):
+        """他のリクエストが再計算中なら、早期再計算せず現在の値を返すこと"""
+        cache.set('key', ('古い値', 100.0, time.time() + 1), 60)
+        cache.add(lock_key('key'), 1)
+
+        self.assertEqual(get_or_compute('key', self.compute('新しい値'), 60), '古い値')
+        self.assertEqual(self.calls, 0)
+
+    def test_fresh_value_is_not_recomputed(self):
+        """期限まで十分に余裕があれば再計算しないこと"""
+        cache.set('key', ('値', 0.01, time.time() + 3600), 3600)
+
+        self.assertEqual(get_or_compute('key', self.compute('新しい値'), 60), '値')
+        self.assertEqual(self.calls, 0)
+
+    def test_waits_for_concurrent_compute(self):
+        """キャッシュがなく他のリクエストが計算中なら、計算せずにその結果を待つこと"""
+        cache.add(lock_key('key'), 1)
+
+        def finish_compute(seconds):
+            set_cached('key', '他のリクエストの結果', 60)
+
+        with patch('Co_fitting.utils.cache_utils.time.sleep', side_effect=finish_compute):
+            self.assertEqual(get_or_compute('key', self.compute(), 60), '他のリクエストの結果')
+        self.assertEqual(self.calls, 0)
+
+    def test_computes_without_caching_when_wait_times_out(self):
+        """待ちきれない場合は自分で計算し、ロックを持つリクエストの保存を妨げないこと"""
+        cache.add(lock_key('key'), 1)
+
+        with patch('Co_fitting.utils.cache_utils.time.sleep'):
+            self.assertEqual(get_or_compute('key', self.compute(), 60), '計算結果')
+        self.assertIsNone(cache.get('key'))
+
+    def test_lock_released_when_compute_fails(self):
+        """計算が例外で失敗してもロックを解放すること"""
+        def fail():
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            get_or_compute('key', fail, 60)
+        self.assertIsNone(cache.get(lock_key('key')))
@@ -0,0 +1,200 @@
+"""リードレプリカ振り分けのテスト"""
+import os
+import shutil
+import tempfile
+import time
+
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from Co_fitting.tests.helpers import create_default_preset_user, create_test_shared_recipe, create_test_user
+from Co_fitting.utils.db_router import (
+    STICKY_COOKIE_NAME,
+    ReplicaRoutingMiddleware,
+    read_from_primary,
+    read_from_replica,
+)
+from recipes.models import PresetRecipe, SharedRecipe
+from users.models import User
+
+REPLICA_ALIAS = 'replica_sqlite'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA_ALIAS], REPLICA_STICKY_SECONDS=5)
+class ReplicaRouterTestCase(TestCase):
+    """テスト用DBをプライマリ、一時ファイルのSQLiteをレプリカとして振り分けを検証する"""
+
+    # レプリカのエイリアスはsetUpClassで追加するため、その時点の全接続を対象にする
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        # レプリカ用のSQLiteを追加してスキーマを作成する
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings[REPLICA_ALIAS] = connections.configure_settings({
+            'default': connections.settings['default'],
+            REPLICA_ALIAS: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+            },
+        })[REPLICA_ALIAS]
+        # レプリカはプライマリと同じスキーマを持つ想定なので、マイグレーションではなくモデル定義から直接作成する
+        with connections[REPLICA_ALIAS].schema_editor() as schema_editor:
+            for model in apps.get_models():
+                schema_editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_ALIAS].close()
+        del connections[REPLICA_ALIAS]
+        del connections.settings[REPLICA_ALIAS]
+        shutil.rmtree(cls.replica_dir)
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.shared_recipe = create_test_shared_recipe(self.user, name='レプリカのレシピ')
+        self.copy_to_replica(self.user, self.shared_recipe, *self.shared_recipe.steps.all())
+
+        # プライマリだけを更新し、レプリケーション遅延がある状態を再現する
+        SharedRecipe.objects.filter(pk=self.shared_recipe.pk).update(name='プライマリのレシピ')
+
+        # 作成時に付いた「直近に変更された」印とキャッシュを消し、遅延が収まった後のアクセスとして扱う
+        cache.clear()
+
+    def copy_to_replica(self, *objects):
+        for obj in objects:
+            obj.save(using=REPLICA_ALIAS, force_insert=True)
+
+    def test_retrieve_shared_recipe_reads_from_replica(self):
+        """共有レシピ取得APIはレプリカから読むこと"""
+        response = self.client.get(reverse('recipes:retrieve_shared_recipe', args=[self.shared_recipe.access_token]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'レプリカのレシピ')
+
+    def test_shared_recipe_ogp_reads_from_replica(self):
+        """共有レシピのOGPページはレプリカから読むこと"""
+        response = self.client.get(reverse('recipes:shared_recipe_ogp', args=[self.shared_recipe.access_token]))
+
+        self.assertContains(response, 'レプリカのレシピ')
+
+    def test_sticky_cookie_reads_from_primary(self):
+        """直近に書き込んだクライアントはプライマリから読むこと"""
+        self.client.cookies[STICKY_COOKIE_NAME] = str(time.time() + 5)
+
+        response = self.client.get(reverse('recipes:retrieve_shared_recipe', args=[self.shared_recipe.access_token]))
+
+        self.assertEqual(response.json()['name'], 'プライマリのレシピ')
+
+    def test_expired_sticky_cookie_reads_from_replica(self):
+        """期限切れのCookieではレプリカから読むこと"""
+        self.client.cookies[STICKY_COOKIE_NAME] = str(time.time() - 1)
+
+        response = self.client.get(reverse('recipes:retrieve_shared_recipe', args=[self.shared_recipe.access_token]))
+
+        self.assertEqual(response.json()['name'], 'レプリカのレシピ')
+
+    def test_recently_changed_token_is_cached_from_primary(self):
+        """変更直後のトークンはレプリカの遅延をキャッシュしないようプライマリから読むこと"""
+        SharedRecipe.invalidate_token_cache(self.shared_recipe.access_token)
+
+        response = self.client.get(reverse('recipes:retrieve_shared_recipe', args=[self.shared_recipe.access_token]))
+
+        self.assertEqual(response.json()['name'], 'プライマリのレシピ')
+
+    def test_undecorated_view_reads_from_primary(self):
+        """デコレータのない処理はプライマリから読むこと"""
+        self.assertEqual(SharedRecipe.objects.get(pk=self.shared_recipe.pk).name, 'プライマリのレシピ')
+
+    def test_only_recipe_models_are_routed_to_replica(self):
+        """ユーザー（セッション・認証）の読み取りはレプリカへ送らないこと"""
+        @read_from_replica
+        def view(request):
+            return router.db_for_read(SharedRecipe), router.db_for_read(User)
+
+        recipe_db, user_db = view(RequestFactory().get('/'))
+
+        self.assertEqual(recipe_db, REPLICA_ALIAS)
+        self.assertEqual(user_db, 'default')
+
+    @override_settings(DATABASE_REPLICAS=['replica_a', 'replica_b', 'replica_c'])
+    def test_one_replica_per_request(self):
+        """1つのリクエスト内の読み取りはすべて同じレプリカへ送ること"""
+        @read_from_replica
+        def view(request):
+            return {router.db_for_read(SharedRecipe) for _ in range(20)}
+
+        self.assertEqual(len(view(RequestFactory().get('/'))), 1)
+
+    def test_read_from_primary_overrides_replica(self):
+        """read_from_primaryのブロック内はプライマリから読むこと"""
+        @read_from_replica
+        def view(request):
+            with read_from_primary():
+                return router.db_for_read(SharedRecipe)
+
+        self.assertEqual(view(RequestFactory().get('/')), 'default')
+
+    def test_default_presets_are_cached_from_primary(self):
+        """デフォルトプリセットのキャッシュはレプリカの遅延を拾わないこと"""
+        default_user = create_default_preset_user()
+        PresetRecipe.objects.create(
+            name='デフォルト', created_by=default_user, is_ice=False, len_steps=1, bean_g=20, water_ml=200,
+        )
+
+        response = self.client.get(reverse('recipes:get_preset_recipes'))
+
+        names = [recipe['name'] for recipe in response.json()['default_preset_recipes']]
+        self.assertEqual(names, ['デフォルト'])
+
+    def test_write_sets_sticky_cookie(self):
+        """書き込みを行ったレスポンスにプライマリ固定のCookieが付くこと"""
+        def get_response(request):
+            SharedRecipe.objects.filter(pk=self.shared_recipe.pk).update(name='更新')
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(RequestFactory().get('/'))
+
+        self.assertIn(STICKY_COOKIE_NAME, response.cookies)
+        self.assertEqual(response.cookies[STICKY_COOKIE_NAME]['max-age'], 5)
+
+    def test_read_only_request_does_not_set_sticky_cookie(self):
+        """読み取りだけのレスポンスにはCookieを付けないこと"""
+        def get_response(request):
+            SharedRecipe.objects.count()
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(RequestFactory().get('/'))
+
+        self.assertNotIn(STICKY_COOKIE_NAME, response.cookies)
+
+    def test_async_view_reads_from_replica(self):
+        """非同期ビューでもレシピの読み取りをレプリカへ送ること"""
+        @read_from_replica
+        async def view(request):
+            return router.db_for_read(SharedRecipe)
+
+        self.assertEqual(async_to_sync(view)(RequestFactory().get('/')), REPLICA_ALIAS)
+
+    def test_async_write_sets_sticky_cookie(self):
+        """ASGIで書き込みを行ったレスポンスにもプライマリ固定のCookieが付くこと"""
+        async def get_response(request):
+            await SharedRecipe.objects.filter(pk=self.shared_recipe.pk).aupdate(name='更新')
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+
+        self.assertIn(STICKY_COOKIE_NAME, response.cookies)
+
+    def test_replicas_are_not_migrated(self):
+        """レプリカにはマイグレーションを適用しないこと"""
+        self.assertFalse(router.allow_migrate(REPLICA_ALIAS, 'recipes'))
+        self.assertTrue(router.allow_migrate('default', 'recipes'))
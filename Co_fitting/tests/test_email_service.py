@@ -1,13 +1,21 @@
+import hashlib
 import threading
 import time
-from unittest.mock import patch
+from smtplib import SMTPException
+from unittest.mock import MagicMock, patch
 
 from django.conf import settings
 from django.core import mail
-from django.test import RequestFactory
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.db import transaction
+from django.test import RequestFactory, TransactionTestCase, override_settings
 
+from Co_fitting.services.email_dispatcher import EmailDispatcher
 from Co_fitting.services.email_service import EmailService
 from Co_fitting.tests.helpers import BaseTestCase, create_test_user
+from Co_fitting.utils.constants import CacheConstants
+from users.models import EmailOutbox, User
 
 
 class EmailServiceTestCase(BaseTestCase):
@@ -18,26 +26,29 @@ class EmailServiceTestCase(BaseTestCase):
         self.factory = RequestFactory()
         self.user = create_test_user()
 
-    def test_send_signup_confirmation_email_content(self):
+    def send_through_outbox(self, built):
+        """作成したメールを送信待ちに登録し、送信した1通を返す"""
+        EmailOutbox.objects.enqueue(*built)
+        self.assertEqual(EmailOutbox.objects.drain(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        return mail.outbox[0]
+
+    def test_signup_confirmation_email_content(self):
         confirmation_link = 'http://testserver/users/signup/confirm/test-uid/test-token/test-email/'
 
-        EmailService.send_signup_confirmation_email(self.user, confirmation_link)
+        email = self.send_through_outbox(EmailService.build_signup_confirmation(self.user, confirmation_link))
 
-        self.assertEqual(len(mail.outbox), 1)
-        email = mail.outbox[0]
         self.assertEqual(email.subject, 'アカウント登録の確認')
         self.assertIn(self.user.username, email.body)
         self.assertIn(confirmation_link, email.body)
         self.assertEqual(email.from_email, settings.DEFAULT_FROM_EMAIL)
         self.assertEqual(email.to, [self.user.email])
 
-    def test_send_login_notification_email_content(self):
+    def test_login_notification_email_content(self):
         ip_address = '192.168.1.1'
 
-        EmailService.send_login_notification_email(self.user, ip_address)
+        email = self.send_through_outbox(EmailService.build_login_notification(self.user, ip_address))
 
-        self.assertEqual(len(mail.outbox), 1)
-        email = mail.outbox[0]
         self.assertEqual(email.subject, 'ログイン通知')
         self.assertIn(self.user.username, email.body)
         self.assertIn(ip_address, email.body)
@@ -45,25 +56,14 @@ class EmailServiceTestCase(BaseTestCase):
         self.assertEqual(email.from_email, settings.DEFAULT_FROM_EMAIL)
         self.assertEqual(email.to, [self.user.email])
 
-    def test_send_login_notification_async_threading(self):
-        ip_address = '192.168.1.1'
-        initial_thread_count = threading.active_count()
-
-        EmailService.send_login_notification_async(self.user, ip_address)
-        time.sleep(0.5)
-
-        self.assertGreaterEqual(threading.active_count(), initial_thread_count)
-        self.assertEqual(len(mail.outbox), 1)
-        self.assertEqual(mail.outbox[0].subject, 'ログイン通知')
-
-    def test_send_email_change_confirmation_email_content(self):
+    def test_email_change_confirmation_email_content(self):
         new_email = 'newemail@example.com'
         confirmation_link = 'http://testserver/users/email-change/confirm/test-uid/test-token/test-email/'
 
-        EmailService.send_email_change_confirmation_email(self.user, new_email, confirmation_link)
+        email = self.send_through_outbox(
+            EmailService.build_email_change_confirmation(self.user, new_email, confirmation_link)
+        )
 
-        self.assertEqual(len(mail.outbox), 1)
-        email = mail.outbox[0]
         self.assertEqual(email.subject, 'メールアドレス変更の確認')
         self.assertIn(self.user.username, email.body)
         self.assertIn(new_email, email.body)
@@ -71,12 +71,181 @@ class EmailServiceTestCase(BaseTestCase):
         self.assertEqual(email.from_email, settings.DEFAULT_FROM_EMAIL)
         self.assertEqual(email.to, [new_email])
 
-    @patch('Co_fitting.services.email_service.send_mail')
-    def test_email_service_uses_correct_from_email(self, mock_send_mail):
-        EmailService.send_signup_confirmation_email(self.user, 'http://test/')
-        EmailService.send_login_notification_email(self.user, '192.168.1.1')
-        EmailService.send_email_change_confirmation_email(self.user, 'new@example.com', 'http://test/')
+    def test_outbox_records_default_from_email(self):
+        outbox = EmailOutbox.objects.enqueue(*EmailService.build_signup_confirmation(self.user, 'http://test/'))
+
+        self.assertEqual(outbox.from_email, settings.DEFAULT_FROM_EMAIL or '')
+
+
+class EmailDispatcherTestCase(TransactionTestCase):
+    """EmailDispatcher（固定数のワーカーによるバックグラウンド送信）のテスト"""
+
+    def create_dispatcher(self, **kwargs):
+        dispatcher = EmailDispatcher(**{'workers': 1, 'queue_size': 10, **kwargs})
+        self.addCleanup(dispatcher.shutdown)
+        return dispatcher
+
+    def enqueue(self, count=1):
+        for index in range(count):
+            EmailOutbox.objects.create(
+                subject=f'テスト{index}', body='本文', from_email='',
+                recipients=['test@example.com'],
+            )
+
+    def test_sends_pending_mail_in_worker_threads(self):
+        dispatcher = self.create_dispatcher(workers=2)
+        self.enqueue(5)
+
+        self.assertTrue(dispatcher.wake_outbox())
+        dispatcher.flush()
+
+        self.assertEqual(sorted(email.subject for email in mail.outbox), [f'テスト{index}' for index in range(5)])
+        self.assertFalse(EmailOutbox.objects.filter(sent_at__isnull=True).exists())
+
+    def test_reuses_connection_per_worker(self):
+        dispatcher = self.create_dispatcher()
+
+        with patch('Co_fitting.services.email_dispatcher.get_connection', wraps=get_connection) as mock_get_connection:
+            for _ in range(3):
+                self.enqueue()
+                dispatcher.wake_outbox()
+                dispatcher.flush()
+
+        self.assertEqual(mock_get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_failed_mail_left_for_retry(self):
+        dispatcher = self.create_dispatcher()
+        failing_connection = MagicMock()
+        failing_connection.send_messages.side_effect = SMTPException('一時的なエラー')
+        self.enqueue()
+
+        with patch('Co_fitting.services.email_dispatcher.get_connection', return_value=failing_connection):
+            dispatcher.wake_outbox()
+            dispatcher.flush()
+
+        failing_connection.close.assert_called()
+        outbox = EmailOutbox.objects.get()
+        self.assertIsNone(outbox.sent_at)
+        self.assertEqual(outbox.attempts, 1)
+        self.assertIn('一時的なエラー', outbox.last_error)
+
+    def test_coalesces_wake_requests(self):
+        dispatcher = self.create_dispatcher()
+        sending = threading.Event()
+        release = threading.Event()
+        blocking_connection = MagicMock()
+        blocking_connection.send_messages.side_effect = lambda messages: sending.set() or release.wait(5)
+        self.enqueue()
+
+        with patch('Co_fitting.services.email_dispatcher.get_connection', return_value=blocking_connection):
+            dispatcher.wake_outbox()
+            sending.wait(5)
+            # 送信中の依頼は1つにまとめ、キューに積み上げない
+            for _ in range(3):
+                self.assertTrue(dispatcher.wake_outbox())
+            self.assertEqual(dispatcher._queue.qsize(), 1)
+            release.set()
+            dispatcher.flush()
+
+        self.assertEqual(blocking_connection.send_messages.call_count, 1)
+
+    def test_shutdown_sends_pending_mail(self):
+        dispatcher = self.create_dispatcher(workers=2)
+        self.enqueue(5)
+        dispatcher.wake_outbox()
+
+        dispatcher.shutdown()
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(any(thread.is_alive() for thread in dispatcher._threads))
+
+    def test_closes_idle_connection(self):
+        dispatcher = self.create_dispatcher(idle_seconds=0.01)
+        connection = MagicMock()
+        self.enqueue()
+
+        with patch('Co_fitting.services.email_dispatcher.get_connection', return_value=connection):
+            dispatcher.wake_outbox()
+            dispatcher.flush()
+            time.sleep(0.1)
+
+        connection.close.assert_called()
+
+
+class EmailDispatcherOutboxTestCase(TransactionTestCase):
+    """コミット後に送信待ちのメール（EmailOutbox）をワーカーが送信することのテスト"""
+
+    def test_enqueued_mail_sent_after_commit(self):
+        dispatcher = EmailDispatcher(workers=1)
+        self.addCleanup(dispatcher.shutdown)
+
+        with patch('users.models.email_dispatcher', dispatcher):
+            with transaction.atomic():
+                outbox = EmailOutbox.objects.enqueue('テスト', '本文', ['test@example.com'])
+                # コミット前は送信しない
+                self.assertEqual(len(mail.outbox), 0)
+            dispatcher.flush()
+
+        outbox.refresh_from_db()
+        self.assertIsNotNone(outbox.sent_at)
+        self.assertEqual([email.subject for email in mail.outbox], ['テスト'])
+
+    def test_rolled_back_mail_not_sent(self):
+        dispatcher = EmailDispatcher(workers=1)
+        self.addCleanup(dispatcher.shutdown)
+
+        with patch('users.models.email_dispatcher', dispatcher):
+            with transaction.atomic():
+                EmailOutbox.objects.enqueue('テスト', '本文', ['test@example.com'])
+                transaction.set_rollback(True)
+            dispatcher.flush()
+
+        self.assertFalse(EmailOutbox.objects.exists())
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class LoginNotificationCoalescingTestCase(BaseTestCase):
+    """同じ (ユーザー, IPアドレス) のログイン通知をまとめる処理のテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+
+    def test_same_ip_within_window_suppressed(self):
+        self.assertIsNotNone(EmailService.build_coalesced_login_notification(self.user, '192.168.1.1'))
+        self.assertIsNone(EmailService.build_coalesced_login_notification(self.user, '192.168.1.1'))
+
+    def test_new_ip_or_user_always_notified(self):
+        other_user = create_test_user(username='otheruser', email='other@example.com')
+        EmailService.build_coalesced_login_notification(self.user, '192.168.1.1')
+
+        self.assertIsNotNone(EmailService.build_coalesced_login_notification(self.user, '192.168.1.2'))
+        self.assertIsNotNone(EmailService.build_coalesced_login_notification(other_user, '192.168.1.1'))
+
+    def test_next_notification_includes_suppressed_count(self):
+        EmailService.build_coalesced_login_notification(self.user, '192.168.1.1')
+        EmailService.build_coalesced_login_notification(self.user, '192.168.1.1')
+        EmailService.build_coalesced_login_notification(self.user, '192.168.1.1')
+
+        # 期間の経過（期間のキーの期限切れ）を再現する
+        ip_hash = hashlib.sha256('192.168.1.1'.encode()).hexdigest()
+        cache.delete(CacheConstants.LOGIN_NOTIFICATION_WINDOW_KEY.format(user_id=self.user.pk, ip_hash=ip_hash))
+        _, message, _ = EmailService.build_coalesced_login_notification(self.user, '192.168.1.1')
+        self.assertIn('他に2回のログイン', message)
+
+        cache.delete(CacheConstants.LOGIN_NOTIFICATION_WINDOW_KEY.format(user_id=self.user.pk, ip_hash=ip_hash))
+        _, message, _ = EmailService.build_coalesced_login_notification(self.user, '192.168.1.1')
+        self.assertNotIn('他に', message)
+
+    @override_settings(LOGIN_NOTIFICATION_WINDOW_SECONDS=0)
+    def test_window_zero_disables_coalescing(self):
+        self.assertIsNotNone(EmailService.build_coalesced_login_notification(self.user, '192.168.1.1'))
+        self.assertIsNotNone(EmailService.build_coalesced_login_notification(self.user, '192.168.1.1'))
+
+    def test_repeated_logins_enqueue_one_mail(self):
+        User.objects.send_login_notification_async(self.user, '192.168.1.1')
+        User.objects.send_login_notification_async(self.user, '192.168.1.1')
+        User.objects.send_login_notification_async(self.user, '10.0.0.1')
 
-        for call in mock_send_mail.call_args_list:
-            args, _ = call
-            self.assertEqual(args[2], settings.DEFAULT_FROM_EMAIL)
+        self.assertEqual(EmailOutbox.objects.count(), 2)
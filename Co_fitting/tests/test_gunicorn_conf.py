@@ -0,0 +1,76 @@
+"""gunicornの実行時設定のテスト"""
+import importlib
+import os
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from Co_fitting import gunicorn_conf
+
+MB = 1024 * 1024
+
+
+class GunicornWorkerSizingTestCase(SimpleTestCase):
+    """CPU数・メモリ上限からワーカー数・スレッド数を求める処理のテスト"""
+
+    def test_sizing_by_cpus(self):
+        """メモリが十分ならCPU数からモードごとのワーカー数を求めることをテスト"""
+        self.assertEqual(gunicorn_conf.size_workers('sync', 4, None, 192 * MB), (9, 1))
+        self.assertEqual(gunicorn_conf.size_workers('gthread', 4, None, 192 * MB), (5, 4))
+        self.assertEqual(gunicorn_conf.size_workers('asgi', 4, None, 192 * MB), (4, 1))
+
+    def test_memory_limits_workers(self):
+        """メモリ上限に収まるようワーカー数を減らし、gthreadではスレッド数で補うことをテスト"""
+        self.assertEqual(gunicorn_conf.size_workers('sync', 4, 768 * MB, 192 * MB), (3, 1))
+        self.assertEqual(gunicorn_conf.size_workers('gthread', 4, 768 * MB, 192 * MB), (3, 6))
+        self.assertEqual(gunicorn_conf.size_workers('asgi', 4, 128 * MB, 192 * MB), (1, 1))
+
+    def test_cgroup_v2_cpu_quota(self):
+        """cgroup v2のCPUクォータをCPU数の上限とすることをテスト"""
+        def read(path):
+            return {'/sys/fs/cgroup/cpu.max': ['150000', '100000']}.get(path)
+
+        with patch.object(gunicorn_conf, '_read_cgroup_file', side_effect=read), \
+                patch('os.sched_getaffinity', return_value=set(range(8)), create=True):
+            self.assertEqual(gunicorn_conf.available_cpus(), 2)
+
+    def test_unlimited_cgroup_uses_affinity(self):
+        """CPUクォータが無制限ならCPUアフィニティの数を使うことをテスト"""
+        def read(path):
+            return {
+                '/sys/fs/cgroup/cpu.max': ['max', '100000'],
+                '/sys/fs/cgroup/memory.max': ['max'],
+            }.get(path)
+
+        with patch.object(gunicorn_conf, '_read_cgroup_file', side_effect=read), \
+                patch('os.sched_getaffinity', return_value={0, 1, 2}, create=True):
+            self.assertEqual(gunicorn_conf.available_cpus(), 3)
+
+    def test_cgroup_memory_limit(self):
+        """cgroupのメモリ上限を使えるメモリとすることをテスト"""
+        with patch.object(gunicorn_conf, '_read_cgroup_file', return_value=[str(512 * MB)]):
+            self.assertEqual(gunicorn_conf.available_memory(), 512 * MB)
+
+    def test_default_mode_is_wsgi(self):
+        """GUNICORN_MODEを指定しなければWSGIの同期ワーカーで起動することをテスト"""
+        self.addCleanup(importlib.reload, gunicorn_conf)
+        environ = {key: value for key, value in os.environ.items() if key != 'GUNICORN_MODE'}
+
+        with patch.dict(os.environ, environ, clear=True):
+            importlib.reload(gunicorn_conf)
+        self.assertEqual(gunicorn_conf.wsgi_app, 'Co_fitting.wsgi:application')
+        self.assertEqual(gunicorn_conf.worker_class, 'sync')
+
+    def test_mode_selects_app_and_worker(self):
+        """GUNICORN_MODEでアプリとワーカークラスを選び、不正な値はエラーにすることをテスト"""
+        self.addCleanup(importlib.reload, gunicorn_conf)
+
+        with patch.dict(os.environ, {'GUNICORN_MODE': 'gthread', 'WEB_CONCURRENCY': '3'}):
+            importlib.reload(gunicorn_conf)
+        self.assertEqual(gunicorn_conf.wsgi_app, 'Co_fitting.wsgi:application')
+        self.assertEqual(gunicorn_conf.worker_class, 'gthread')
+        self.assertEqual(gunicorn_conf.workers, 3)
+        self.assertGreaterEqual(gunicorn_conf.threads, 2)
+
+        with patch.dict(os.environ, {'GUNICORN_MODE': 'eventlet'}), self.assertRaises(RuntimeError):
+            importlib.reload(gunicorn_conf)
@@ -0,0 +1,82 @@
+"""静的ページ（記事・LP）のレスポンスキャッシュのテスト"""
+from django.contrib.messages.storage.session import SessionStorage
+from django.urls import reverse
+from Co_fitting.tests.helpers import BaseTestCase, create_test_user, login_test_user
+
+
+class StaticPageCacheTestCase(BaseTestCase):
+    """記事・LPのレスポンスキャッシュのテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+
+    def test_anonymous_hit_renders_nothing_and_uses_no_queries(self):
+        """匿名ユーザーの2回目以降のアクセスはレンダリングもDBアクセスも行わないことをテスト"""
+        first = self.client.get(reverse('landing_page'))
+
+        with self.assertNumQueries(0), self.assertTemplateNotUsed('lp.html'):
+            response = self.client.get(reverse('landing_page'))
+        self.assertEqual(response.content, first.content)
+
+    def test_anonymous_response_is_publicly_cacheable(self):
+        """匿名ユーザーへのレスポンスにCDN向けのCache-Controlが付くことをテスト"""
+        response = self.client.get(reverse('articles:about'))
+
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('s-maxage=86400', response['Cache-Control'])
+
+    def test_login_state_varies_response(self):
+        """ログイン状態ごとに別のキャッシュを使い、共有キャッシュには保存させないことをテスト"""
+        self.client.get(reverse('articles:about'))
+        login_test_user(self, user=self.user)
+
+        response = self.client.get(reverse('articles:about'))
+
+        self.assertContains(response, reverse('mypage'))
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_build_id_change_invalidates(self):
+        """ビルドIDが変わればキャッシュを作り直すことをテスト"""
+        self.client.get(reverse('landing_page'))
+
+        with self.settings(BUILD_ID='next-build'), self.assertTemplateUsed('lp.html'):
+            self.client.get(reverse('landing_page'))
+
+    def test_pending_messages_bypass_cache(self):
+        """フラッシュメッセージがある場合はキャッシュを使わずにレンダリングすることをテスト"""
+        self.client.get(reverse('articles:about'))
+        self.client.cookies['messages'] = 'pending'
+
+        with self.assertTemplateUsed('articles/about.html'):
+            self.client.get(reverse('articles:about'))
+
+    def test_pending_session_messages_bypass_cache(self):
+        """セッションに保存されたフラッシュメッセージがある場合もキャッシュを使わないことをテスト"""
+        login_test_user(self, user=self.user)
+        self.client.get(reverse('articles:about'))
+        session = self.client.session
+        session[SessionStorage.session_key] = '[]'
+        session.save()
+
+        with self.assertTemplateUsed('articles/about.html'):
+            self.client.get(reverse('articles:about'))
+
+    def test_responses_vary_on_cookie(self):
+        """匿名・ログインのどちらのレスポンスにもVary: Cookieが付くことをテスト"""
+        response = self.client.get(reverse('articles:about'))
+        self.assertIn('Cookie', response['Vary'])
+
+        login_test_user(self, user=self.user)
+        response = self.client.get(reverse('articles:about'))
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_unknown_query_params_share_cache_entry(self):
+        """許可していないクエリパラメータではキャッシュを分けず、URLにも含めずにレンダリングすることをテスト"""
+        with self.assertTemplateUsed('articles/about.html'):
+            response = self.client.get(reverse('articles:about'), {'utm_source': '<script>'})
+        self.assertNotContains(response, 'utm_source')
+
+        with self.assertTemplateNotUsed('articles/about.html'):
+            cached = self.client.get(reverse('articles:about'), {'x': '1'})
+        self.assertEqual(cached.content, response.content)
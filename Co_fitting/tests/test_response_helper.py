@@ -1,4 +1,6 @@
-from django.test import TestCase
+from django.test import TestCase, RequestFactory
+from django.utils import timezone
+import gzip
 import json
 from Co_fitting.utils.response_helper import ResponseHelper
 from Co_fitting.tests.helpers import BaseTestCase
@@ -316,3 +318,71 @@ class ResponseHelperEdgeCaseTestCase(BaseTestCase):
         self.assertEqual(len(response_data['errors']['username']), 2)
         self.assertEqual(len(response_data['errors']['email']), 1)
         self.assertEqual(len(response_data['errors']['password']), 2)
+
+    def test_encode_data_matches_json_response(self):
+        """encode_dataがJsonResponseと同じbytesを返すことをテスト"""
+        data = {'name': 'テストレシピ', 'created_at': timezone.now(), 'steps': [{'minute': 0, 'total_water_ml_this_step': 50.0}]}
+
+        self.assertEqual(ResponseHelper.encode_data(data), ResponseHelper.create_data_response(data).content)
+
+    def test_create_encoded_data_response_serves_bytes_as_is(self):
+        """エンコード済みのbytesをそのまま返すことをテスト"""
+        content = ResponseHelper.encode_data({'name': 'テストレシピ'})
+
+        response = ResponseHelper.create_encoded_data_response(content, status_code=201)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, content)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_create_encoded_data_response_serves_gzip_when_accepted(self):
+        """クライアントがgzipを受け付ける場合は圧縮済みのbytesを返すことをテスト"""
+        content = ResponseHelper.encode_data({'name': 'テストレシピ'})
+        gzip_content = ResponseHelper.compress(content)
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+
+        response = ResponseHelper.create_encoded_data_response(content, gzip_content=gzip_content, request=request)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content), content)
+
+    def test_create_encoded_data_response_serves_identity_when_gzip_not_accepted(self):
+        """クライアントがgzipを受け付けない場合は非圧縮のbytesを返すことをテスト"""
+        content = ResponseHelper.encode_data({'name': 'テストレシピ'})
+        request = RequestFactory().get('/')
+
+        response = ResponseHelper.create_encoded_data_response(
+            content, gzip_content=ResponseHelper.compress(content), request=request
+        )
+
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, content)
+
+    def test_accepts_gzip_respects_qvalue(self):
+        """Accept-Encodingのq値を見てgzipを受け付けるか判定することをテスト"""
+        cases = {
+            'gzip': True,
+            'gzip, deflate, br': True,
+            'GZIP;q=0.5': True,
+            'br;q=1.0, gzip;q=0.8': True,
+            '*': True,
+            'gzip;q=0': False,
+            'gzip; q=0.0, deflate': False,
+            '*, gzip;q=0': False,
+            'br, *;q=0': False,
+            'x-gzip-like': False,
+            '': False,
+        }
+        for accept_encoding, expected in cases.items():
+            with self.subTest(accept_encoding=accept_encoding):
+                request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+                self.assertEqual(ResponseHelper.accepts_gzip(request), expected)
+
+    def test_compress_is_deterministic(self):
+        """同じ内容は同じ圧縮結果になることをテスト（ETagやキャッシュの一貫性のため）"""
+        content = ResponseHelper.encode_data({'name': 'テストレシピ'})
+
+        self.assertEqual(ResponseHelper.compress(content), ResponseHelper.compress(content))
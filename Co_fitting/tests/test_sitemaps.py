@@ -1,7 +1,14 @@
 """サイトマップのテスト"""
-from django.test import TestCase, Client
-from django.urls import reverse
-from Co_fitting.tests.helpers import create_test_user
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from Co_fitting.sitemaps import SharedRecipeSitemap, prebuilt_sitemap_path
+from Co_fitting.tests.helpers import create_test_user, create_test_shared_recipe
 from recipes.models import SharedRecipe, SharedRecipeStep
 
 
@@ -17,9 +24,18 @@ class SitemapTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'application/xml')
 
+    def test_sitemap_index_lists_sections(self):
+        """サイトマップインデックスに各セクションのサイトマップが含まれること"""
+        response = self.client.get('/sitemap.xml')
+        content = response.content.decode('utf-8')
+
+        self.assertIn('<sitemapindex', content)
+        self.assertIn('/sitemap-static.xml', content)
+        self.assertIn('/sitemap-shared_recipes.xml', content)
+
     def test_sitemap_contains_static_pages(self):
         """サイトマップに静的ページが含まれること"""
-        response = self.client.get('/sitemap.xml')
+        response = self.client.get('/sitemap-static.xml')
         content = response.content.decode('utf-8')
 
         # トップページ
@@ -52,13 +68,81 @@ class SitemapTests(TestCase):
             total_water_ml_this_step=50.0
         )
 
-        response = self.client.get('/sitemap.xml')
+        response = self.client.get('/sitemap-shared_recipes.xml')
         content = response.content.decode('utf-8')
 
         # 共有レシピのURLが含まれること
         self.assertIn('/recipes/share/test_token_12345678/', content)
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ChunkedSitemapTests(TestCase):
+    """IDの範囲で分割した共有レシピのサイトマップと事前生成のテスト"""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.recipes = [create_test_shared_recipe(self.user, name=f'レシピ{i}') for i in range(5)]
+        self.chunk_patcher = patch.object(SharedRecipeSitemap, 'limit', 2)
+        self.chunk_patcher.start()
+        self.addCleanup(self.chunk_patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def chunk_pages(self):
+        """チャンク番号（p）ごとに、その最大ID以下の範囲に入るIDを求める"""
+        return [
+            [recipe for recipe in self.recipes if (page - 1) * 2 < recipe.id <= page * 2]
+            for page in range(1, -(-self.recipes[-1].id // 2) + 1)
+        ]
+
+    def test_index_lists_every_chunk(self):
+        """インデックスに最大IDから求めた全チャンクが含まれること"""
+        content = self.client.get('/sitemap.xml').content.decode('utf-8')
+
+        for page in range(2, len(self.chunk_pages()) + 1):
+            self.assertIn(f'/sitemap-shared_recipes.xml?p={page}', content)
+
+    def test_chunks_split_by_id_range(self):
+        """各チャンクにはIDの範囲内の共有レシピだけが含まれること"""
+        for page, chunk in enumerate(self.chunk_pages(), start=1):
+            content = self.client.get(f'/sitemap-shared_recipes.xml?p={page}').content.decode('utf-8')
+            for recipe in self.recipes:
+                if recipe in chunk:
+                    self.assertIn(recipe.access_token, content)
+                else:
+                    self.assertNotIn(recipe.access_token, content)
+
+    def test_out_of_range_chunk_returns_404(self):
+        """存在しないチャンクは404を返すこと"""
+        page = len(self.chunk_pages()) + 1
+        self.assertEqual(self.client.get(f'/sitemap-shared_recipes.xml?p={page}').status_code, 404)
+        self.assertEqual(self.client.get('/sitemap-shared_recipes.xml?p=abc').status_code, 404)
+
+    def test_chunk_uses_single_query(self):
+        """チャンクの生成はモデルを作らず、件数の集計と範囲の取得だけで済むこと"""
+        with self.assertNumQueries(2):
+            self.client.get('/sitemap-shared_recipes.xml?p=1')
+
+    def test_generate_sitemaps_writes_files_that_are_served(self):
+        """generate_sitemapsで事前生成したファイルがそのまま返されること"""
+        out = StringIO()
+        call_command('generate_sitemaps', domain='example.com', stdout=out)
+
+        index_path = prebuilt_sitemap_path()
+        self.assertTrue(default_storage.exists(index_path))
+        for page in range(1, len(self.chunk_pages()) + 1):
+            self.assertTrue(default_storage.exists(prebuilt_sitemap_path('shared_recipes', page)))
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/sitemap.xml')
+        self.assertIn('https://example.com/sitemap-shared_recipes.xml?p=2', response.content.decode('utf-8'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/sitemap-shared_recipes.xml?p=1')
+        self.assertIn(f'https://example.com/recipes/share/{self.recipes[0].access_token}/', response.content.decode('utf-8'))
+
+
 class RobotsTxtTests(TestCase):
     """robots.txtのテスト"""
 
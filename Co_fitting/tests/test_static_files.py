@@ -0,0 +1,54 @@
+"""静的ファイル配信ミドルウェアのテスト"""
+import os
+import shutil
+import tempfile
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from Co_fitting.utils.static_files import StaticFilesMiddleware
+
+
+class StaticFilesMiddlewareTestCase(SimpleTestCase):
+    """同期・非同期の両方で静的ファイルを配信し、それ以外は後続へ渡すことのテスト"""
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        with open(os.path.join(self.static_root, 'app.css'), 'w') as css_file:
+            css_file.write('body {}')
+
+    def create_middleware(self, get_response):
+        middleware = StaticFilesMiddleware(get_response)
+        middleware.add_files(self.static_root, prefix='/static/')
+        return middleware
+
+    def test_sync_passes_through(self):
+        """同期では従来通り、静的ファイル以外を後続へ渡すことをテスト"""
+        middleware = self.create_middleware(lambda request: HttpResponse('view'))
+
+        self.assertFalse(iscoroutinefunction(middleware))
+        self.assertEqual(middleware(RequestFactory().get('/recipes/')).content, b'view')
+
+    def test_async_passes_through(self):
+        """非同期の後続を受け取った場合は非同期のまま後続へ渡すことをテスト"""
+        async def get_response(request):
+            return HttpResponse('view')
+
+        middleware = self.create_middleware(get_response)
+
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertEqual(async_to_sync(middleware)(RequestFactory().get('/recipes/')).content, b'view')
+
+    def test_async_serves_static_file(self):
+        """非同期でも静的ファイルは後続を呼ばずに配信することをテスト"""
+        async def get_response(request):
+            raise AssertionError('静的ファイルのリクエストが後続へ渡されました')
+
+        middleware = self.create_middleware(get_response)
+        response = async_to_sync(middleware)(RequestFactory().get('/static/app.css'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'body {}')
+        response.close()
@@ -16,12 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.contrib.sitemaps.views import sitemap
 from django.views.generic import TemplateView
 from recipes import views as recipe_views
 from django.conf import settings
 from django.conf.urls.static import static
-from .sitemaps import sitemaps
+from .sitemaps import sitemap_index, sitemap_section
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -33,7 +32,8 @@ urlpatterns = [
     path('articles/', include('articles.urls')),
     path('users/', include('users.urls')),
     # SEO: サイトマップとrobots.txt
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    path('sitemap.xml', sitemap_index, name='sitemap-index'),
+    path('sitemap-<section>.xml', sitemap_section, name='sitemap-section'),
     path('robots.txt', TemplateView.as_view(template_name='robots.txt', content_type='text/plain')),
 ]
 
@@ -0,0 +1,120 @@
+"""
+認証済みユーザーのキャッシュ
+
+AuthenticationMiddlewareはリクエストごとにUserテーブルからログインユーザーを読み込む。
+CACHED_AUTH_USERを有効にすると、(ユーザーID, セッションの認証ハッシュ) ごとにユーザーをキャッシュし、
+ヒットした場合はUserテーブルを読まずにビューへ渡す。
+
+- キーにセッションの認証ハッシュを含めるため、パスワード変更前のセッションが新しいエントリを参照することはない
+- ユーザーが保存・削除されたらバージョンを更新し、そのユーザーのエントリをまとめて無効化する（users.signals）
+- 非同期ビューの request.auser() も同じキャッシュを使う
+- キャッシュにはミドルウェア・テンプレートが使うフィールドの値だけを保存し、パスワードのハッシュは保存しない
+"""
+import hashlib
+from functools import partial
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import get_user_model
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .cache_utils import aget_version, bump_version, get_version
+from .constants import CacheConstants
+
+# キャッシュに保存するユーザーのフィールド（passwordは含めない）
+CACHED_USER_FIELDS = (
+    'id', 'username', 'email', 'is_active', 'is_staff', 'is_superuser', 'last_login',
+    'preset_count', 'shared_recipe_count',
+)
+
+
+def user_cache_key(user_id, session_hash):
+    """ユーザーのキャッシュキー（ユーザーのバージョンとセッションの認証ハッシュで一意）"""
+    version = get_version(CacheConstants.AUTH_USER_VERSION_KEY.format(user_id=user_id))
+    return _build_user_cache_key(user_id, version, session_hash)
+
+
+async def auser_cache_key(user_id, session_hash):
+    """user_cache_keyの非同期版"""
+    version = await aget_version(CacheConstants.AUTH_USER_VERSION_KEY.format(user_id=user_id))
+    return _build_user_cache_key(user_id, version, session_hash)
+
+
+def _build_user_cache_key(user_id, version, session_hash):
+    hash_digest = hashlib.sha256(session_hash.encode()).hexdigest()
+    return CacheConstants.AUTH_USER_KEY.format(user_id=user_id, version=version, hash_digest=hash_digest)
+
+
+def _dump_user(user):
+    """ユーザーをキャッシュに保存する値（CACHED_USER_FIELDSの値の辞書）に変換する"""
+    return {field_name: getattr(user, field_name) for field_name in CACHED_USER_FIELDS}
+
+
+def _load_user(values):
+    """キャッシュの値からユーザーを復元する
+
+    保存済みのインスタンスとして復元し、キャッシュしていないフィールド（password）は遅延読み込みにする。
+    遅延読み込みのフィールドはsave()で保存されないため、復元したユーザーを保存しても値を上書きしない。
+    """
+    user_model = get_user_model()
+    # from_dbは値をモデルのフィールド定義順で受け取る
+    field_names = [field.attname for field in user_model._meta.concrete_fields if field.attname in values]
+    return user_model.from_db('default', field_names, [values[field_name] for field_name in field_names])
+
+
+def get_cached_user(request):
+    """セッションのユーザーをキャッシュから取得し、なければ通常の認証処理で読み込んでキャッシュする"""
+    user_id = request.session.get(auth.SESSION_KEY)
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    if user_id is None or not session_hash:
+        return auth.get_user(request)
+
+    cache_key = user_cache_key(user_id, session_hash)
+    values = cache.get(cache_key)
+    if values is not None:
+        return _load_user(values)
+
+    # セッションの検証（認証ハッシュの照合）は通常の処理に任せ、認証できたユーザーだけを保存する
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(cache_key, _dump_user(user), CacheConstants.AUTH_USER_TIMEOUT)
+    return user
+
+
+async def aget_cached_user(request):
+    """get_cached_userの非同期版（同じリクエスト内では結果を使い回す）"""
+    if hasattr(request, '_acached_user'):
+        return request._acached_user
+
+    user_id = await request.session.aget(auth.SESSION_KEY)
+    session_hash = await request.session.aget(auth.HASH_SESSION_KEY)
+    if user_id is None or not session_hash:
+        user = await auth.aget_user(request)
+    else:
+        cache_key = await auser_cache_key(user_id, session_hash)
+        values = await cache.aget(cache_key)
+        if values is not None:
+            user = _load_user(values)
+        else:
+            user = await auth.aget_user(request)
+            if user.is_authenticated:
+                await cache.aset(cache_key, _dump_user(user), CacheConstants.AUTH_USER_TIMEOUT)
+    request._acached_user = user
+    return user
+
+
+def invalidate_cached_user(user_id):
+    """ユーザーのキャッシュを全セッション分無効化する"""
+    bump_version(CacheConstants.AUTH_USER_VERSION_KEY.format(user_id=user_id))
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """CACHED_AUTH_USERが有効な場合、request.userをキャッシュから取得するAuthenticationMiddleware"""
+
+    def process_request(self, request):
+        super().process_request(request)
+        if settings.CACHED_AUTH_USER:
+            request.user = SimpleLazyObject(lambda: get_cached_user(request))
+            request.auser = partial(aget_cached_user, request)
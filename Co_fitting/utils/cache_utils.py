@@ -0,0 +1,139 @@
+"""
+キャッシュの取得・再計算ヘルパー
+
+- get_or_compute: キャッシュがなければ計算して保存する。同じキーの再計算はロックで1つに絞る（スタンピード対策）
+- 期限が近づくと確率的に早めに再計算し、期限切れの瞬間にアクセスが集中するのを防ぐ（XFetch）
+- TTLにはキーごとにばらつき（ジッター）を加え、同時に作られたエントリが一斉に期限切れになるのを防ぐ
+
+キャッシュには (値, 計算にかかった秒数, 論理的な期限) を保存するため、値にNoneも保存できる。
+非同期ビュー用に同じ形式で読み書きする aget_version / aget_or_compute も用意する。
+"""
+import asyncio
+import math
+import random
+import time
+import uuid
+
+from django.core.cache import cache
+
+from .constants import CacheConstants
+
+
+def get_version(version_key):
+    """共有キャッシュからバージョンを取得（未設定なら初期化する）
+
+    キーにバージョンを含めておき、バージョンを更新することで古いエントリをまとめて参照させなくする。
+    """
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid.uuid4().hex, None)
+        version = cache.get(version_key)
+    return version
+
+
+async def aget_version(version_key):
+    """get_versionの非同期版"""
+    version = await cache.aget(version_key)
+    if version is None:
+        await cache.aadd(version_key, uuid.uuid4().hex, None)
+        version = await cache.aget(version_key)
+    return version
+
+
+def bump_version(version_key):
+    """バージョンを更新する（古いバージョンのエントリは参照されずに期限切れとなる）"""
+    cache.set(version_key, uuid.uuid4().hex, None)
+
+
+def lock_key(key):
+    """再計算用ロックのキー"""
+    return f'{key}:lock'
+
+
+def set_cached(key, value, timeout, compute_seconds=0.0, jitter=CacheConstants.TTL_JITTER):
+    """値をキャッシュに保存する（timeoutは秒数、または値を受け取って秒数を返す関数）"""
+    cache.set(key, *_build_entry(value, timeout, compute_seconds, jitter))
+
+
+def _build_entry(value, timeout, compute_seconds, jitter):
+    """キャッシュに保存する (エントリ, キャッシュの期限秒数) を作成する"""
+    if callable(timeout):
+        timeout = timeout(value)
+    timeout = timeout * random.uniform(1 - jitter, 1 + jitter)
+    return (value, compute_seconds, time.time() + timeout), math.ceil(timeout)
+
+
+def _is_fresh(entry, beta):
+    """エントリをそのまま使うかどうか（計算に時間がかかる値ほど、期限の手前で再計算する確率が高くなる）"""
+    _, compute_seconds, expires_at = entry
+    return time.time() - compute_seconds * beta * math.log(1.0 - random.random()) < expires_at
+
+
+def get_or_compute(key, compute, timeout, jitter=CacheConstants.TTL_JITTER, beta=CacheConstants.EARLY_RECOMPUTE_BETA):
+    """キャッシュから値を取得し、なければcompute()の結果を保存して返す
+
+    timeout: 秒数、または値を受け取って秒数を返す関数（存在しない結果だけ短くする場合など）
+    beta: 早期再計算の度合い（大きいほど早めに再計算する、0で無効）
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        if _is_fresh(entry, beta):
+            return entry[0]
+        # 早期再計算はロックを取れた1リクエストだけが行い、他は現在の値を返す
+        if not cache.add(lock_key(key), 1, CacheConstants.LOCK_TIMEOUT):
+            return entry[0]
+        return _compute_and_set(key, compute, timeout, jitter)
+
+    if not cache.add(lock_key(key), 1, CacheConstants.LOCK_TIMEOUT):
+        # 他のリクエストが計算中なので完了を待つ（待ちきれなければキャッシュせずに自分で計算する）
+        for _ in range(CacheConstants.LOCK_WAIT_RETRIES):
+            time.sleep(CacheConstants.LOCK_WAIT_SECONDS)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        return compute()
+
+    return _compute_and_set(key, compute, timeout, jitter)
+
+
+def _compute_and_set(key, compute, timeout, jitter):
+    """ロックを取得済みの状態で計算して保存し、ロックを解放する"""
+    try:
+        started_at = time.monotonic()
+        value = compute()
+        set_cached(key, value, timeout, time.monotonic() - started_at, jitter)
+        return value
+    finally:
+        cache.delete(lock_key(key))
+
+
+async def aget_or_compute(key, acompute, timeout, jitter=CacheConstants.TTL_JITTER, beta=CacheConstants.EARLY_RECOMPUTE_BETA):
+    """get_or_computeの非同期版（acomputeは値を返すコルーチン関数、待機中はイベントループを止めない）"""
+    entry = await cache.aget(key)
+    if entry is not None:
+        if _is_fresh(entry, beta):
+            return entry[0]
+        if not await cache.aadd(lock_key(key), 1, CacheConstants.LOCK_TIMEOUT):
+            return entry[0]
+        return await _acompute_and_set(key, acompute, timeout, jitter)
+
+    if not await cache.aadd(lock_key(key), 1, CacheConstants.LOCK_TIMEOUT):
+        for _ in range(CacheConstants.LOCK_WAIT_RETRIES):
+            await asyncio.sleep(CacheConstants.LOCK_WAIT_SECONDS)
+            entry = await cache.aget(key)
+            if entry is not None:
+                return entry[0]
+        return await acompute()
+
+    return await _acompute_and_set(key, acompute, timeout, jitter)
+
+
+async def _acompute_and_set(key, acompute, timeout, jitter):
+    """_compute_and_setの非同期版"""
+    try:
+        started_at = time.monotonic()
+        value = await acompute()
+        await cache.aset(key, *_build_entry(value, timeout, time.monotonic() - started_at, jitter))
+        return value
+    finally:
+        await cache.adelete(lock_key(key))
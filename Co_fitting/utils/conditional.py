@@ -0,0 +1,45 @@
+"""
+非同期ビュー向けの条件付きGET
+
+Djangoのconditionデコレータは非同期ビューにも付けられるが、ETag・Last-Modifiedを求める関数は同期で呼ばれる。
+キャッシュやDBを読む関数を非同期ビューから同期で呼ぶことはできないため、これらをコルーチン関数で受け取る版を用意する。
+"""
+import datetime
+import functools
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def acondition(etag_func=None, last_modified_func=None, vary=()):
+    """conditionの非同期版（etag_func・last_modified_funcはビューと同じ引数を受け取るコルーチン関数）
+
+    vary: ETagがリクエストヘッダーで変わる場合にそのヘッダー名を指定する（304を含むすべてのレスポンスに付ける）
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        async def wrapped_view(request, *args, **kwargs):
+            res_last_modified = None
+            if last_modified_func:
+                if dt := await last_modified_func(request, *args, **kwargs):
+                    if not timezone.is_aware(dt):
+                        dt = timezone.make_aware(dt, datetime.timezone.utc)
+                    res_last_modified = int(dt.timestamp())
+            res_etag = await etag_func(request, *args, **kwargs) if etag_func else None
+            res_etag = quote_etag(res_etag) if res_etag is not None else None
+
+            response = get_conditional_response(request, etag=res_etag, last_modified=res_last_modified)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+
+            if vary:
+                patch_vary_headers(response, vary)
+            if request.method in ('GET', 'HEAD'):
+                if res_last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(res_last_modified)
+                if res_etag:
+                    response.headers.setdefault('ETag', res_etag)
+            return response
+        return wrapped_view
+    return decorator
@@ -7,6 +7,98 @@ class AppConstants:
     # トークン設定
     TOKEN_LENGTH = 16
 
+    # デフォルトプリセットを保持するユーザー名
+    DEFAULT_PRESET_USERNAME = 'DefaultPreset'
+
+    # 共有レシピ一覧APIのページサイズ
+    SHARED_RECIPES_PAGE_SIZE = 20
+    SHARED_RECIPES_MAX_PAGE_SIZE = 100
+
+    # サイトのドメイン（事前生成するサイトマップのURLに使う）
+    SITE_DOMAIN = 'co-fitting.com'
+
+    # 共有レシピのサイトマップを分割するIDの範囲（1ファイルあたり最大URL数、上限は50,000）
+    SITEMAP_CHUNK_SIZE = 10000
+    # 事前生成したサイトマップの保存先（ストレージ内のディレクトリ）
+    SITEMAP_STORAGE_DIR = 'sitemaps'
+
+    # 期限切れセッションを削除する1回あたりの件数（大量削除でテーブルを長くロックしないため）
+    SESSION_SWEEP_BATCH_SIZE = 1000
+
+
+class CacheConstants:
+    """キャッシュ関連の定数"""
+
+    # デフォルトプリセットのバージョンキー（全ワーカーで共有）
+    DEFAULT_PRESETS_VERSION_KEY = 'recipes:default_presets:version'
+
+    # デフォルトプリセット所有ユーザーのID（所有ユーザーの作成・削除で削除）
+    DEFAULT_PRESET_OWNER_KEY = 'recipes:default_preset_owner'
+    DEFAULT_PRESET_OWNER_TIMEOUT = 60 * 60 * 24  # 1日
+
+    # ユーザーごとのプリセットのバージョンキー（プリセットの保存・削除で更新）
+    USER_PRESETS_VERSION_KEY = 'recipes:user_presets:version:{user_id}'
+
+    # プリセット一覧APIのエンコード済みレスポンス（ユーザーとデフォルトプリセットのバージョンで一意）
+    PRESET_PAYLOAD_KEY = 'recipes:preset_payload:{user_id}:{user_version}:{default_version}'
+    PRESET_PAYLOAD_TIMEOUT = 60 * 60 * 24  # 1日（古いバージョンのエントリは参照されずに期限切れとなる）
+
+    # 共有レシピのトークン→(シリアライズ済みデータ, 更新日時)（存在しないトークンはNoneを短時間キャッシュ）
+    SHARED_RECIPE_KEY = 'recipes:shared_recipe:v2:{token_hash}'
+    SHARED_RECIPE_TIMEOUT = 60 * 60  # 1時間
+    SHARED_RECIPE_NOT_FOUND_TIMEOUT = 60  # 1分
+
+    # デプロイ単位の静的ページ（記事・LP）のレスポンスキャッシュ（ビルドIDが変われば参照されなくなる）
+    STATIC_PAGE_KEY = 'pages:{build_id}:{variant}:{uri_hash}'
+    STATIC_PAGE_TIMEOUT = 60 * 60 * 24  # 1日
+    # ページの内容を変えるクエリパラメータ（これ以外はキャッシュキーにもレンダリングにも使わない、現状はなし）
+    STATIC_PAGE_QUERY_PARAMS = ()
+    # 匿名ユーザー向けレスポンスのCache-Control（ブラウザ1時間、CDN・プロキシ1日）
+    STATIC_PAGE_MAX_AGE = 60 * 60
+    STATIC_PAGE_SHARED_MAX_AGE = 60 * 60 * 24
+
+    # 認証済みユーザー（CACHED_AUTH_USER有効時、ユーザーの保存・削除でバージョンを更新）
+    AUTH_USER_VERSION_KEY = 'auth:user:version:{user_id}'
+    AUTH_USER_KEY = 'auth:user:{user_id}:{version}:{hash_digest}'
+    AUTH_USER_TIMEOUT = 60 * 5  # 5分
+
+    # ログイン通知をまとめる (ユーザー, IPアドレス) ごとの期間と、期間内にまとめたログイン回数
+    LOGIN_NOTIFICATION_WINDOW_KEY = 'email:login_notification:{user_id}:{ip_hash}'
+    LOGIN_NOTIFICATION_SUPPRESSED_KEY = 'email:login_notification:{user_id}:{ip_hash}:suppressed'
+    LOGIN_NOTIFICATION_SUPPRESSED_TIMEOUT = 60 * 60 * 24 * 7  # 7日（次の通知までに消えた場合は回数を記載しない）
+
+    # get_or_computeの再計算を1リクエストに絞るロック（他のリクエストは最大1秒待つ）
+    LOCK_TIMEOUT = 10
+    LOCK_WAIT_SECONDS = 0.05
+    LOCK_WAIT_RETRIES = 20
+    # TTLのばらつき（±10%）と早期再計算の度合い
+    TTL_JITTER = 0.1
+    EARLY_RECOMPUTE_BETA = 1.0
+
+
+class EmailConstants:
+    """メール送信関連の定数"""
+
+    # バックグラウンド送信のワーカー数とキューの上限（プロセスごと）
+    WORKERS = 2
+    QUEUE_SIZE = 100
+
+    # 送信がない状態でSMTP接続を保持する秒数
+    CONNECTION_IDLE_SECONDS = 30
+
+    # プロセス終了時に残りのメールの送信を待つ秒数
+    SHUTDOWN_TIMEOUT = 10
+
+    # 送信待ちメール（EmailOutbox）を1回に取得する件数と、送信を諦めるまでの試行回数
+    OUTBOX_BATCH_SIZE = 50
+    OUTBOX_MAX_ATTEMPTS = 5
+    # 送信失敗後、次に試行するまでの秒数（1分、2分、4分と倍にする）
+    OUTBOX_RETRY_BACKOFF_SECONDS = 60
+    # 取得したメールを送信中として他のワーカーから隠す秒数（送信中にプロセスが終了した場合はこの後に再送する）
+    OUTBOX_CLAIM_SECONDS = 5 * 60
+    # drain_outbox --loop で送信待ちを確認する間隔
+    OUTBOX_POLL_SECONDS = 5
+
 
 class ImageConstants:
     """画像生成関連の定数"""
@@ -0,0 +1,143 @@
+"""
+読み取り専用エンドポイント向けのリードレプリカ振り分け
+
+- `read_from_replica` を付けたビュー内のレシピ読み取りだけをレプリカ（settings.DATABASE_REPLICAS）へ送る
+- ユーザー・セッション等の読み取りと、すべての書き込みはプライマリ（default）へ送る
+- 書き込みを行ったクライアントは REPLICA_STICKY_SECONDS 秒間プライマリから読む（自分の書き込みが見えるように）
+- レプリカはリクエストごとに1つ選び、遅延の異なるレプリカから親子の行を読み合わせないようにする
+"""
+import contextlib
+import contextvars
+import functools
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# リクエスト単位の振り分け状態（読み取りに使うレプリカのエイリアス、プライマリから読む場合はNone）
+_replica_alias = contextvars.ContextVar('replica_alias', default=None)
+_wrote = contextvars.ContextVar('wrote_to_primary', default=False)
+
+# プライマリ固定の期限（UNIX時刻）を保持するCookie名
+STICKY_COOKIE_NAME = 'primary_sticky_until'
+
+# レプリカへ振り分ける対象のアプリ
+REPLICA_APP_LABELS = {'recipes'}
+
+
+def read_from_replica(view_func):
+    """ビュー内のレシピ読み取りをレプリカへ振り分けるデコレータ（非同期ビューにも使える）"""
+    if iscoroutinefunction(view_func):
+        @functools.wraps(view_func)
+        async def async_wrapped_view(request, *args, **kwargs):
+            token = _replica_alias.set(_choose_replica(request))
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _replica_alias.reset(token)
+        return async_wrapped_view
+
+    @functools.wraps(view_func)
+    def wrapped_view(request, *args, **kwargs):
+        token = _replica_alias.set(_choose_replica(request))
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _replica_alias.reset(token)
+    return wrapped_view
+
+
+@contextlib.contextmanager
+def read_from_primary():
+    """ブロック内の読み取りをプライマリへ固定する（プロセス内キャッシュの再構築など、遅延したデータを残せない処理用）"""
+    token = _replica_alias.set(None)
+    try:
+        yield
+    finally:
+        _replica_alias.reset(token)
+
+
+def _choose_replica(request):
+    """このリクエストで読み取りに使うレプリカを1つ選ぶ（レプリカがない、またはプライマリに固定する場合はNone）"""
+    replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+    if not replicas or _is_sticky_to_primary(request):
+        return None
+    return random.choice(replicas)
+
+
+def _is_sticky_to_primary(request):
+    """直近に書き込みを行ったクライアントかどうか"""
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE_NAME, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaRouter:
+    """リードレプリカ用のデータベースルーター"""
+
+    def db_for_read(self, model, **hints):
+        replica_alias = _replica_alias.get()
+        if replica_alias is not None and model._meta.app_label in REPLICA_APP_LABELS:
+            return replica_alias
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # レプリカはプライマリの複製なので、どのエイリアス間のリレーションも許可する
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # レプリカのスキーマはレプリケーションで同期されるため、マイグレーションしない
+        if db in getattr(settings, 'DATABASE_REPLICAS', []):
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """書き込みを行ったクライアントを一定時間プライマリに固定するミドルウェア（ASGIでは非同期で動く）"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            self._set_sticky_cookie(response)
+            return response
+        finally:
+            _wrote.reset(token)
+
+    async def __acall__(self, request):
+        token = _wrote.set(False)
+        try:
+            response = await self.get_response(request)
+            self._set_sticky_cookie(response)
+            return response
+        finally:
+            _wrote.reset(token)
+
+    @staticmethod
+    def _set_sticky_cookie(response):
+        """このリクエストで書き込みを行っていれば、プライマリに固定するCookieを付ける"""
+        if _wrote.get() and getattr(settings, 'DATABASE_REPLICAS', []):
+            sticky_seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE_NAME,
+                str(time.time() + sticky_seconds),
+                max_age=sticky_seconds,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
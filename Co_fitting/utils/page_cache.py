@@ -0,0 +1,91 @@
+"""
+デプロイ単位で内容が変わらないページ（記事・LP）のレスポンスキャッシュ
+
+テンプレートが参照するリクエスト依存の値は、ログイン状態（base.htmlのヘッダー）と
+URL（canonical / og:url）、フラッシュメッセージのみなので、ログイン状態とURLでキャッシュを分ける。
+キャッシュキーにビルドID（settings.BUILD_ID）を含め、デプロイごとに作り直す。
+
+URLはパスと許可したクエリパラメータ（STATIC_PAGE_QUERY_PARAMS）だけで判定し、
+それ以外のパラメータ（広告の計測用など）は除いたURLでレンダリングする（任意のパラメータでキャッシュを増やさない）。
+ログイン状態でヘッダーが変わるため、CDN等の共有キャッシュにはCookieごとに分けさせる（Vary: Cookie）。
+"""
+import copy
+import functools
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.messages.storage.session import SessionStorage
+from django.core.cache import cache
+from django.http import HttpResponse, QueryDict
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from .constants import CacheConstants
+
+
+def cache_static_page(view_func):
+    """ページのレンダリング結果をビルドID・ログイン状態・URLごとにキャッシュするデコレータ"""
+    @functools.wraps(view_func)
+    def wrapped_view(request, *args, **kwargs):
+        # セッションCookieがなければ匿名ユーザーなので、セッション・ユーザーを読まずに判定する
+        has_session = settings.SESSION_COOKIE_NAME in request.COOKIES
+
+        # フラッシュメッセージを表示する必要があるリクエストはキャッシュしない
+        # （Cookieに収まらないメッセージはセッションに保存されるため、セッションも確認する）
+        if (
+            request.method not in ('GET', 'HEAD')
+            or CookieStorage.cookie_name in request.COOKIES
+            or (has_session and SessionStorage.session_key in request.session)
+        ):
+            return view_func(request, *args, **kwargs)
+
+        request = normalize_query(request)
+
+        variant = 'auth' if has_session and request.user.is_authenticated else 'anon'
+        cache_key = CacheConstants.STATIC_PAGE_KEY.format(
+            build_id=settings.BUILD_ID,
+            variant=variant,
+            uri_hash=hashlib.sha256(request.build_absolute_uri().encode()).hexdigest(),
+        )
+
+        cached = cache.get(cache_key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            response = view_func(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            cache.set(cache_key, (response.content, response['Content-Type']), CacheConstants.STATIC_PAGE_TIMEOUT)
+
+        patch_vary_headers(response, ('Cookie',))
+        if has_session:
+            # ログイン状態で内容が変わるため、共有キャッシュには保存させない
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=CacheConstants.STATIC_PAGE_MAX_AGE,
+                s_maxage=CacheConstants.STATIC_PAGE_SHARED_MAX_AGE,
+            )
+        return response
+    return wrapped_view
+
+
+def normalize_query(request):
+    """許可したクエリパラメータだけを残したリクエストを返す（除くものがなければそのまま返す）"""
+    query_string = urlencode([
+        (key, value)
+        for key, values in sorted(request.GET.lists())
+        if key in CacheConstants.STATIC_PAGE_QUERY_PARAMS
+        for value in values
+    ])
+    if query_string == request.META.get('QUERY_STRING', ''):
+        return request
+
+    normalized = copy.copy(request)
+    normalized.META = {**request.META, 'QUERY_STRING': query_string}
+    normalized.GET = QueryDict(query_string)
+    return normalized
@@ -1,9 +1,46 @@
-from django.http import JsonResponse
+import gzip
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
 
 
 class ResponseHelper:
     """レスポンス作成のヘルパークラス"""
 
+    @staticmethod
+    def encode_data(data):
+        """データをJsonResponseと同じ形式でJSONのbytesにエンコード（キャッシュして使い回す用）"""
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+    @staticmethod
+    def compress(content):
+        """エンコード済みのJSONをgzipで圧縮（mtimeを固定し、同じ内容なら同じbytesにする）"""
+        return gzip.compress(content, mtime=0)
+
+    @staticmethod
+    def accepts_gzip(request):
+        """クライアントがgzip圧縮されたレスポンスを受け付けるかどうか
+
+        Accept-Encodingのq値を見て、gzip;q=0は拒否として扱う。gzipの指定がなければ*の指定に従う。
+        """
+        qvalues = {}
+        for item in request.headers.get('Accept-Encoding', '').split(','):
+            coding, *params = (part.strip() for part in item.split(';'))
+            if not coding:
+                continue
+            qvalue = 1.0
+            for param in params:
+                name, _, value = param.partition('=')
+                if name.strip().lower() == 'q':
+                    try:
+                        qvalue = float(value)
+                    except ValueError:
+                        qvalue = 0.0
+            qvalues[coding.lower()] = qvalue
+        return qvalues.get('gzip', qvalues.get('*', 0.0)) > 0
+
     @staticmethod
     def create_error_response(error_type, message, status_code=400, details=None):
         """統一されたエラーレスポンスを作成"""
@@ -31,6 +68,23 @@ class ResponseHelper:
         """データのみのレスポンスを作成"""
         return JsonResponse(data, status=status_code)
 
+    @staticmethod
+    def create_encoded_data_response(content, status_code=200, gzip_content=None, request=None):
+        """エンコード済みのJSON（bytes）からレスポンスを作成（再エンコードしない）
+
+        gzip_contentとrequestを渡すと、クライアントがgzipを受け付ける場合は圧縮済みのbytesを返す。
+        """
+        if gzip_content is None or request is None:
+            return HttpResponse(content, content_type='application/json', status=status_code)
+
+        if ResponseHelper.accepts_gzip(request):
+            response = HttpResponse(gzip_content, content_type='application/json', status=status_code)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(content, content_type='application/json', status=status_code)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
     @staticmethod
     def create_validation_error_response(form_errors, message="データの検証に失敗しました。"):
         """フォームバリデーションエラーレスポンスを作成"""
@@ -0,0 +1,36 @@
+"""
+静的ファイル配信ミドルウェア
+
+WhiteNoiseMiddlewareは同期専用のため、ASGIで使うと後続のミドルウェアとビューが同期に変換され、
+リクエストごとにスレッドとイベントループの間の切り替えが発生する。
+同期・非同期の両方に対応させ、ASGIではリクエストを非同期のまま後続へ渡す。
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddlewareの同期・非同期両対応版"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # 開発時はリクエストごとにディスクを探索するため、スレッドで行う
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            # ファイルを開く処理を含むため、イベントループを止めないようスレッドで行う
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
@@ -1,21 +1,27 @@
 from django.shortcuts import render
+from Co_fitting.utils.page_cache import cache_static_page
 
 
+@cache_static_page
 def how_to_use(request):
     return render(request, 'articles/how-to-use.html')
 
 
+@cache_static_page
 def introduce_preset(request):
     return render(request, 'articles/introduce-preset.html')
 
 
+@cache_static_page
 def coffee_theory(request):
     return render(request, 'articles/coffee-theory.html')
 
 
+@cache_static_page
 def privacy_policy(request):
     return render(request, 'articles/privacy-policy.html')
 
 
+@cache_static_page
 def about(request):
     return render(request, 'articles/about.html')
@@ -49,6 +49,11 @@ class RecipeAdmin(admin.ModelAdmin):
     # PresetRecipeの詳細ページにPresetRecipeStepをインラインで表示
     inlines = [RecipeStepInline]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # インラインで編集されたステップをsteps_packedに反映
+        form.instance.refresh_steps_packed()
+
 
 class SharedRecipeStepInline(admin.TabularInline):
     model = SharedRecipeStep
@@ -62,3 +67,8 @@ class SharedRecipeAdmin(admin.ModelAdmin):
     list_filter = ('is_ice',)
     search_fields = ('name', 'access_token')
     inlines = [SharedRecipeStepInline]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # インラインで編集されたステップをsteps_packedに反映
+        form.instance.refresh_steps_packed()
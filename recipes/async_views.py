@@ -0,0 +1,80 @@
+"""
+読み取り専用エンドポイントの非同期ビュー
+
+GUNICORN_MODE=asgi（settings.ASYNC_READ_VIEWS）の場合のみ recipes/urls.py から使い、
+キャッシュ・DBの待ち時間中に同じイベントループで他のリクエストを処理する。
+WSGIでは同期ビュー（recipes/views.py）を使い、スレッドの切り替えを挟まない。
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import Http404
+from django.shortcuts import render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+
+from .models import PresetRecipe, SharedRecipe
+from Co_fitting.utils.conditional import acondition
+from Co_fitting.utils.db_router import read_from_replica
+from Co_fitting.utils.response_helper import ResponseHelper
+
+
+async def shared_recipe_etag(request, token):
+    return await SharedRecipe.aget_etag_by_token(token)
+
+
+async def shared_recipe_last_modified(request, token):
+    return await SharedRecipe.aget_last_modified_by_token(token)
+
+
+@read_from_replica
+@acondition(etag_func=shared_recipe_etag, last_modified_func=shared_recipe_last_modified)
+async def shared_recipe_ogp(request, token):
+    shared_recipe = await SharedRecipe.aget_cached_data_by_token(token)
+    if not shared_recipe:
+        raise Http404("共有レシピが見つかりません。")
+    # テンプレートのレンダリングは同期処理のため、イベントループを止めないようスレッドで行う
+    return await sync_to_async(render)(request, 'recipes/shared_recipe_ogp.html', {'shared_recipe': shared_recipe})
+
+
+@require_GET
+@login_required
+async def get_user_shared_recipes(request):
+    # ユーザーの共有レシピ一覧データを取得（Model層で実行）
+    return await SharedRecipe.aget_user_shared_recipes_data(
+        await request.auser(),
+        after=request.GET.get('after'),
+        limit=request.GET.get('limit'),
+        fields=request.GET.get('fields'),
+    )
+
+
+@require_GET
+@csrf_exempt
+@read_from_replica
+@acondition(etag_func=shared_recipe_etag, last_modified_func=shared_recipe_last_modified)
+async def retrieve_shared_recipe(request, token):
+    shared_recipe_data, error_response = await SharedRecipe.aget_shared_recipe_data_or_error(token)
+    if error_response:
+        return error_response
+
+    # キャッシュ済みの辞書データをそのまま返す
+    return ResponseHelper.create_data_response(shared_recipe_data)
+
+
+async def preset_recipes_etag(request):
+    etag = await PresetRecipe.aget_preset_recipes_etag(await request.auser())
+    # gzip圧縮したレスポンスは別の表現なので、強いETagを分ける
+    return f'{etag}-gz' if ResponseHelper.accepts_gzip(request) else etag
+
+
+@require_GET
+@read_from_replica
+@acondition(etag_func=preset_recipes_etag, vary=('Accept-Encoding',))
+async def get_preset_recipes(request):
+    """プリセットレシピデータを取得するAPIエンドポイント（非同期版）"""
+    try:
+        # エンコード・圧縮済みのレスポンスをキャッシュから取得（匿名ユーザーはデフォルトプリセットのみ）
+        content, gzip_content = await PresetRecipe.apreset_recipes_payload(await request.auser())
+        return ResponseHelper.create_encoded_data_response(content, gzip_content=gzip_content, request=request)
+    except Exception:
+        return ResponseHelper.create_server_error_response('プリセットレシピの取得に失敗しました。')
@@ -0,0 +1,162 @@
+"""
+起動済みのサーバーに同時接続でリクエストを送り、スループットとレイテンシを計測するベンチマーク
+
+WSGI（syncワーカー）とASGI（uvicornワーカー）で同じエンドポイントを計測し、同時接続数に対する伸び方を比較する。
+各接続はKeep-Aliveで1つずつリクエストを送り、レスポンスを受け取ったら次のリクエストを送る。
+
+使い方:
+    # 比較するサーバーを起動する（ワーカー数は揃える）
+    GUNICORN_MODE=sync WEB_CONCURRENCY=2 gunicorn -c Co_fitting/gunicorn_conf.py --bind 127.0.0.1:8000
+    GUNICORN_MODE=asgi WEB_CONCURRENCY=2 gunicorn -c Co_fitting/gunicorn_conf.py --bind 127.0.0.1:8001
+
+    python manage.py benchmark_concurrency http://127.0.0.1:8000/recipes/api/preset-recipes/ \\
+        http://127.0.0.1:8001/recipes/api/preset-recipes/ --connections 100 --duration 10
+    python manage.py benchmark_concurrency http://127.0.0.1:8001/recipes/api/shared-recipes/ \\
+        --header "Cookie: sessionid=..."                       # ログインが必要なエンドポイント
+"""
+import asyncio
+import math
+import ssl
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = '起動済みのサーバーに同時接続でリクエストを送り、スループットとレイテンシを計測する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='計測するURL（複数指定した場合は順に計測する）')
+        parser.add_argument('--connections', type=int, default=50, help='同時接続数')
+        parser.add_argument('--duration', type=float, default=10.0, help='URLごとの計測時間（秒）')
+        parser.add_argument(
+            '--header', action='append', default=[], help='追加するリクエストヘッダー（"名前: 値" 形式、複数指定可）'
+        )
+        parser.add_argument('--insecure', action='store_true', help='HTTPSの証明書を検証しない（自己署名証明書の環境用）')
+
+    def handle(self, *args, **options):
+        headers = []
+        for header in options['header']:
+            name, separator, value = header.partition(':')
+            if not separator:
+                raise CommandError(f'ヘッダーの形式が正しくありません: {header}')
+            headers.append((name.strip(), value.strip()))
+
+        self.stdout.write(f'同時接続数: {options["connections"]}、計測時間: {options["duration"]}秒')
+        for url in options['urls']:
+            latencies, errors, elapsed = asyncio.run(
+                self.run(url, headers, options['connections'], options['duration'], options['insecure'])
+            )
+            self.report(url, latencies, errors, elapsed)
+
+    async def run(self, url, headers, connections, duration, insecure):
+        """計測時間の間、同時接続数分のクライアントでリクエストを送り続ける"""
+        target = urlsplit(url)
+        if target.scheme not in ('http', 'https') or not target.hostname:
+            raise CommandError(f'URLの形式が正しくありません: {url}')
+
+        ssl_context = None
+        if target.scheme == 'https':
+            ssl_context = ssl.create_default_context()
+            if insecure:
+                ssl_context.check_hostname = False
+                ssl_context.verify_mode = ssl.CERT_NONE
+        port = target.port or (443 if ssl_context else 80)
+
+        path = (target.path or '/') + (f'?{target.query}' if target.query else '')
+        request_lines = [f'GET {path} HTTP/1.1', f'Host: {target.netloc}', 'Connection: keep-alive']
+        request_lines.extend(f'{name}: {value}' for name, value in headers)
+        request = ('\r\n'.join(request_lines) + '\r\n\r\n').encode('latin-1')
+
+        started_at = time.monotonic()
+        deadline = started_at + duration
+        results = await asyncio.gather(*(
+            self.client(target.hostname, port, ssl_context, request, deadline) for _ in range(connections)
+        ))
+        elapsed = time.monotonic() - started_at
+
+        latencies = [latency for client_latencies, _ in results for latency in client_latencies]
+        return latencies, sum(errors for _, errors in results), elapsed
+
+    async def client(self, host, port, ssl_context, request, deadline):
+        """1つの接続でリクエストを繰り返し、(レイテンシの一覧, エラー件数) を返す"""
+        latencies = []
+        errors = 0
+        writer = None
+        while time.monotonic() < deadline:
+            reused = writer is not None
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port, ssl=ssl_context)
+                sent_at = time.monotonic()
+                writer.write(request)
+                status, keep_alive = await self.read_response(reader)
+                latencies.append(time.monotonic() - sent_at)
+                if status >= 400:
+                    errors += 1
+                if not keep_alive:
+                    writer = await self.close(writer)
+            except ConnectionResetError:
+                writer = await self.close(writer)
+                # 再利用した接続がワーカーの再起動などで閉じられていた場合は、ブラウザと同様に接続し直して再送する
+                if not reused:
+                    errors += 1
+                    await asyncio.sleep(0.1)
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                errors += 1
+                writer = await self.close(writer)
+                # サーバーが接続を受け付けない場合に空回りしない
+                await asyncio.sleep(0.1)
+        await self.close(writer)
+        return latencies, errors
+
+    @staticmethod
+    async def read_response(reader):
+        """レスポンスを本文まで読み、(ステータスコード, 接続を再利用できるか) を返す"""
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('レスポンスを受信する前に接続が閉じられました')
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await reader.readexactly(int(headers.get('content-length', 0)))
+        return status, headers.get('connection', '').lower() != 'close'
+
+    @staticmethod
+    async def close(writer):
+        """接続を閉じる（閉じる際のエラーは無視する）"""
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+        return None
+
+    def report(self, url, latencies, errors, elapsed):
+        """スループットとレイテンシのパーセンタイルを表示する"""
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f'{url}: レスポンスを受信できませんでした（エラー: {errors}件）'))
+            return
+
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, math.ceil(len(latencies) * p / 100) - 1)] * 1000
+
+        self.stdout.write(
+            f'{url}: {len(latencies) / elapsed:.1f} req/s（{len(latencies)}件、エラー: {errors}件）、'
+            f'p50 {percentile(50):.1f} ms、p99 {percentile(99):.1f} ms'
+        )
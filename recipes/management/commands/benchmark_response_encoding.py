@@ -0,0 +1,70 @@
+"""
+プリセット一覧APIのレスポンス作成を、毎回エンコードする場合とエンコード済みのbytesを使う場合で比較するベンチマーク
+
+DBは使わず、メモリ上に作った実際の形のレシピデータ（デフォルト3件 + ユーザー上限分）で計測する。
+
+使い方:
+    python manage.py benchmark_response_encoding                   # 既定の回数で計測する
+    python manage.py benchmark_response_encoding --iterations 5000
+"""
+import gzip
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from Co_fitting.utils.constants import AppConstants
+from Co_fitting.utils.response_helper import ResponseHelper
+from recipes.models import PresetRecipe
+
+
+class Command(BaseCommand):
+    help = 'エンコード済みレスポンスと毎回エンコードするレスポンスの作成時間を比較する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help='各方式の計測回数')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        data = {
+            'user_preset_recipes': self.build_recipes(AppConstants.PRESET_LIMIT, first_id=100),
+            'default_preset_recipes': self.build_recipes(3, first_id=1),
+        }
+        content = ResponseHelper.encode_data(data)
+        gzip_content = ResponseHelper.compress(content)
+        request = RequestFactory().get('/recipes/api/preset-recipes/', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+
+        cases = [
+            ('毎回エンコード（JsonResponse）', lambda: ResponseHelper.create_data_response(data)),
+            ('毎回エンコード + gzip圧縮', lambda: gzip.compress(ResponseHelper.create_data_response(data).content)),
+            ('エンコード済みbytes', lambda: ResponseHelper.create_encoded_data_response(content)),
+            (
+                'エンコード済みbytes（gzip圧縮済み）',
+                lambda: ResponseHelper.create_encoded_data_response(content, gzip_content=gzip_content, request=request),
+            ),
+        ]
+
+        self.stdout.write(f'レスポンスサイズ: {len(content)} bytes（gzip: {len(gzip_content)} bytes）、{iterations}回')
+        for label, create_response in cases:
+            seconds = min(timeit.repeat(create_response, number=iterations, repeat=3))
+            self.stdout.write(f'{label}: {seconds / iterations * 1_000_000:.1f} µs/リクエスト')
+
+    def build_recipes(self, count, first_id):
+        """保存せずに、実際のプリセットと同じ形の辞書データを作る（6ステップ、湯量は段階的に増える）"""
+        recipes = []
+        for index in range(count):
+            recipe = PresetRecipe(
+                id=first_id + index,
+                name=f'ベンチマーク用レシピ{index + 1}',
+                is_ice=index % 2 == 1,
+                ice_g=80.0 if index % 2 == 1 else None,
+                len_steps=6,
+                bean_g=20.0,
+                water_ml=300.0,
+                memo='蒸らし30秒、その後は30秒ごとに注湯する。',
+            )
+            recipe.steps_packed = recipe.pack_steps([
+                recipe.get_step_model()(step_number=step, minute=step // 2, seconds=(step % 2) * 30, total_water_ml_this_step=50.0 * step)
+                for step in range(1, 7)
+            ])
+            recipes.append(recipe.to_dict())
+        return recipes
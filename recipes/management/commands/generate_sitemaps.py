@@ -0,0 +1,36 @@
+"""
+サイトマップを事前生成してストレージに保存するコマンド
+
+クローラーからのリクエストでは保存済みのファイルをそのまま返すため、共有レシピの増加に合わせて定期的に実行する。
+
+使い方:
+    python manage.py generate_sitemaps                          # co-fitting.com のURLで生成する
+    python manage.py generate_sitemaps --domain example.com     # ドメインを指定して生成する
+"""
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from Co_fitting.sitemaps import render_sitemap_files
+from Co_fitting.utils.constants import AppConstants
+
+
+class Command(BaseCommand):
+    help = 'サイトマップインデックスと共有レシピのチャンクを事前生成する'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--domain',
+            default=AppConstants.SITE_DOMAIN,
+            help='サイトマップのURLに使うドメイン',
+        )
+
+    def handle(self, *args, **options):
+        file_count = 0
+        for path, content in render_sitemap_files(options['domain']):
+            # 既存のファイルを置き換える（storage.saveは同名ファイルがあると別名で保存するため、先に削除する）
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            default_storage.save(path, ContentFile(content.encode('utf-8')))
+            file_count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'サイトマップを{file_count}ファイル生成しました'))
@@ -0,0 +1,40 @@
+"""
+ユーザーごとのプリセット数・共有レシピ数カウンタをレシピテーブルから再計算するコマンド
+
+使い方:
+    python manage.py recount_recipe_quotas
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from recipes.models import PresetRecipe, SharedRecipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'ユーザーごとのプリセット数・共有レシピ数カウンタを再計算する'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted = User.objects.exclude(
+                preset_count=self.count_for_owner(PresetRecipe),
+                shared_recipe_count=self.count_for_owner(SharedRecipe),
+            ).count()
+            updated = User.objects.update(
+                preset_count=self.count_for_owner(PresetRecipe),
+                shared_recipe_count=self.count_for_owner(SharedRecipe),
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{updated}人分のカウンタを再計算しました（不一致: {drifted}人）'
+        ))
+
+    @staticmethod
+    def count_for_owner(recipe_model):
+        """ユーザーごとのレシピ件数を返すサブクエリ"""
+        counts = (
+            recipe_model.objects.filter(created_by=OuterRef('pk'))
+            .order_by().values('created_by').annotate(count=Count('id')).values('count')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
@@ -0,0 +1,60 @@
+"""
+steps_packed（ステップの非正規化コピー）とステップテーブルの整合性を検証するコマンド
+
+使い方:
+    python manage.py verify_steps_packed          # 不一致を報告する
+    python manage.py verify_steps_packed --fix    # 不一致をステップテーブルの内容で修復する
+"""
+from django.core.management.base import BaseCommand
+from recipes.models import PresetRecipe, SharedRecipe
+
+
+class Command(BaseCommand):
+    help = 'steps_packedとステップテーブルの整合性を検証する'
+
+    batch_size = 500
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='不一致のレシピのsteps_packedをステップテーブルから再計算する',
+        )
+
+    def handle(self, *args, **options):
+        total_mismatches = 0
+
+        for recipe_model in (PresetRecipe, SharedRecipe):
+            mismatched_ids = self.find_mismatches(recipe_model)
+            total_mismatches += len(mismatched_ids)
+
+            for recipe_id in mismatched_ids:
+                self.stdout.write(f'{recipe_model.__name__} id={recipe_id}: steps_packedがステップテーブルと一致しません')
+
+            if options['fix'] and mismatched_ids:
+                for recipe in recipe_model.objects.filter(pk__in=mismatched_ids):
+                    recipe.refresh_steps_packed()
+                self.stdout.write(f'{recipe_model.__name__}: {len(mismatched_ids)}件を修復しました')
+
+        if total_mismatches:
+            style = self.style.SUCCESS if options['fix'] else self.style.ERROR
+            self.stdout.write(style(f'不一致: {total_mismatches}件'))
+        else:
+            self.stdout.write(self.style.SUCCESS('すべてのレシピでsteps_packedが一致しています'))
+
+    def find_mismatches(self, recipe_model):
+        """steps_packedがステップテーブルと一致しないレシピのIDを返す"""
+        mismatched_ids = []
+        recipes = recipe_model.objects.only('id', 'steps_packed').order_by('id')
+        last_id = 0
+
+        while True:
+            batch = list(recipes.filter(id__gt=last_id).prefetch_related('steps')[:self.batch_size])
+            if not batch:
+                break
+            for recipe in batch:
+                if recipe.steps_packed != recipe.pack_steps(recipe.steps.all()):
+                    mismatched_ids.append(recipe.id)
+            last_id = batch[-1].id
+
+        return mismatched_ids
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.5 on 2026-10-17 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_unify_user_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='presetrecipe',
+            name='steps_packed',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='sharedrecipe',
+            name='steps_packed',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
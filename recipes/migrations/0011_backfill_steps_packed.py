@@ -0,0 +1,46 @@
+# Generated by Django 6.0.5 on 2026-10-17 10:52
+
+from django.db import migrations
+
+
+BATCH_SIZE = 500
+
+
+def backfill_steps_packed(apps, schema_editor):
+    """既存レシピのsteps_packedをステップテーブルから埋める"""
+    for recipe_model_name, step_model_name in (
+        ('PresetRecipe', 'PresetRecipeStep'),
+        ('SharedRecipe', 'SharedRecipeStep'),
+    ):
+        recipe_model = apps.get_model('recipes', recipe_model_name)
+        step_model = apps.get_model('recipes', step_model_name)
+
+        packed_by_recipe = {}
+        steps = step_model.objects.order_by('recipe_id', 'step_number').values_list(
+            'recipe_id', 'step_number', 'minute', 'seconds', 'total_water_ml_this_step'
+        )
+        for recipe_id, step_number, minute, seconds, total_water_ml_this_step in steps.iterator():
+            packed_by_recipe.setdefault(recipe_id, []).append(
+                [step_number, minute, seconds, total_water_ml_this_step]
+            )
+
+        recipes = []
+        for recipe in recipe_model.objects.only('id').iterator():
+            recipe.steps_packed = packed_by_recipe.get(recipe.id, [])
+            recipes.append(recipe)
+            if len(recipes) >= BATCH_SIZE:
+                recipe_model.objects.bulk_update(recipes, ['steps_packed'])
+                recipes = []
+        if recipes:
+            recipe_model.objects.bulk_update(recipes, ['steps_packed'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_add_steps_packed'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_steps_packed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.5 on 2026-10-17 11:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_steps(apps, schema_editor):
+    """一意制約の追加前に、同じ(recipe, step_number)の重複ステップを最古の1行だけ残して削除する
+
+    0011で重複を含んだまま埋めたsteps_packedは、削除後のステップから詰め直す。
+    """
+    for recipe_model_name, step_model_name in (
+        ('PresetRecipe', 'PresetRecipeStep'),
+        ('SharedRecipe', 'SharedRecipeStep'),
+    ):
+        recipe_model = apps.get_model('recipes', recipe_model_name)
+        step_model = apps.get_model('recipes', step_model_name)
+        duplicates = list(
+            step_model.objects.values('recipe_id', 'step_number')
+            .annotate(keep_id=Min('id'), row_count=Count('id'))
+            .filter(row_count__gt=1)
+        )
+        for duplicate in duplicates:
+            step_model.objects.filter(
+                recipe_id=duplicate['recipe_id'],
+                step_number=duplicate['step_number'],
+            ).exclude(id=duplicate['keep_id']).delete()
+
+        for recipe_id in {duplicate['recipe_id'] for duplicate in duplicates}:
+            steps = step_model.objects.filter(recipe_id=recipe_id).order_by('step_number').values_list(
+                'step_number', 'minute', 'seconds', 'total_water_ml_this_step'
+            )
+            recipe_model.objects.filter(id=recipe_id).update(steps_packed=[list(step) for step in steps])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_backfill_steps_packed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_steps, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='sharedrecipe',
+            index=models.Index(fields=['created_by', 'created_at'], name='shared_created_by_at_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='presetrecipestep',
+            constraint=models.UniqueConstraint(fields=('recipe', 'step_number'), name='uniq_preset_step_number'),
+        ),
+        migrations.AddConstraint(
+            model_name='sharedrecipestep',
+            constraint=models.UniqueConstraint(fields=('recipe', 'step_number'), name='uniq_shared_step_number'),
+        ),
+    ]
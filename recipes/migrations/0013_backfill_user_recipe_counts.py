@@ -0,0 +1,36 @@
+# Generated by Django 6.0.5 on 2026-10-17 11:42
+
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_user_recipe_counts(apps, schema_editor):
+    """ユーザーごとのプリセット数・共有レシピ数カウンタをレシピテーブルから埋める"""
+    User = apps.get_model('users', 'User')
+    PresetRecipe = apps.get_model('recipes', 'PresetRecipe')
+    SharedRecipe = apps.get_model('recipes', 'SharedRecipe')
+
+    def count_for_owner(recipe_model):
+        counts = (
+            recipe_model.objects.filter(created_by=OuterRef('pk'))
+            .order_by().values('created_by').annotate(count=Count('id')).values('count')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    User.objects.update(
+        preset_count=count_for_owner(PresetRecipe),
+        shared_recipe_count=count_for_owner(SharedRecipe),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_hot_path_indexes'),
+        ('users', '0012_user_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_user_recipe_counts, migrations.RunPython.noop),
+    ]
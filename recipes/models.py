@@ -1,8 +1,44 @@
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import F, Value, Window, aprefetch_related_objects, prefetch_related_objects
+from django.db.models.functions import Coalesce, Lag
+from django.utils import timezone
+import contextlib
+import datetime
+import hashlib
 import secrets
 from users.models import User
 from Co_fitting.utils.response_helper import ResponseHelper
-from Co_fitting.utils.constants import AppConstants
+from Co_fitting.utils.db_router import read_from_primary
+from Co_fitting.utils.cache_utils import aget_or_compute, aget_version, bump_version, get_or_compute, get_version
+from Co_fitting.utils.constants import AppConstants, CacheConstants
+
+
+class RecipeManager(models.Manager):
+    """レシピ共通のマネージャー"""
+    # 一括シリアライズ時に先読みするステップ以外のリレーション
+    related_lookups = ()
+
+    def serialize_recipes(self, recipes):
+        """複数レシピをステップごと一括で辞書形式に変換する（ステップ取得は最大1クエリ）"""
+        recipes = list(recipes)
+        # steps_packedを持つレシピはステップテーブルを読まない
+        prefetch_related_objects([recipe for recipe in recipes if recipe.steps_packed is None], 'steps')
+        prefetch_related_objects(recipes, *self.related_lookups)
+        return [recipe.to_dict() for recipe in recipes]
+
+    async def aserialize_recipes(self, recipes):
+        """serialize_recipesの非同期版（recipesはクエリセットまたはレシピのリスト）"""
+        recipes = [recipe async for recipe in recipes] if isinstance(recipes, models.QuerySet) else list(recipes)
+        await aprefetch_related_objects([recipe for recipe in recipes if recipe.steps_packed is None], 'steps')
+        await aprefetch_related_objects(recipes, *self.related_lookups)
+        return [recipe.to_dict() for recipe in recipes]
+
+
+class SharedRecipeManager(RecipeManager):
+    """共有レシピのマネージャー"""
+    related_lookups = ('created_by',)
 
 
 class BaseRecipe(models.Model):
@@ -15,6 +51,13 @@ class BaseRecipe(models.Model):
     water_ml = models.FloatField()
     memo = models.TextField(blank=True, null=True, max_length=300)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    # ステップの非正規化コピー: [[step_number, minute, seconds, total_water_ml_this_step], ...]
+    # 正はステップテーブルで、未設定(None)の場合はステップテーブルから読む
+    steps_packed = models.JSONField(blank=True, null=True, editable=False)
+    # 条件付きGET（ETag / Last-Modified）用の更新日時
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeManager()
 
     class Meta:
         abstract = True
@@ -25,17 +68,27 @@ class BaseRecipe(models.Model):
 
     def to_dict(self):
         """レシピを辞書形式に変換するメソッド"""
-        # ステップデータを取得
-        steps = self.get_steps()
-        steps_data = [
-            {
-                'step_number': step.step_number,
-                'minute': step.minute,
-                'seconds': step.seconds,
-                'total_water_ml_this_step': step.total_water_ml_this_step
-            }
-            for step in steps
-        ]
+        # ステップデータを取得（steps_packedがあればレシピ1行だけで完結する）
+        if self.steps_packed is not None and 'steps' not in getattr(self, '_prefetched_objects_cache', {}):
+            steps_data = [
+                {
+                    'step_number': step_number,
+                    'minute': minute,
+                    'seconds': seconds,
+                    'total_water_ml_this_step': total_water_ml_this_step
+                }
+                for step_number, minute, seconds, total_water_ml_this_step in self.steps_packed
+            ]
+        else:
+            steps_data = [
+                {
+                    'step_number': step.step_number,
+                    'minute': step.minute,
+                    'seconds': step.seconds,
+                    'total_water_ml_this_step': step.total_water_ml_this_step
+                }
+                for step in self.get_steps()
+            ]
 
         # 基本情報を構築
         base_data = {
@@ -60,8 +113,10 @@ class BaseRecipe(models.Model):
         """サブクラス固有のフィールドを辞書に追加するメソッド（サブクラスで実装）"""
         raise NotImplementedError("サブクラスで実装してください")
 
-    def create_steps_from_form_data(self, form_data):
-        """フォームデータからレシピステップを作成する"""
+    def build_steps_from_form_data(self, form_data):
+        """フォームデータから未保存のステップ一覧と最後のステップの総湯量を組み立てる"""
+        step_model = self.get_step_model()
+        steps = []
         total_water_ml = 0
 
         for step_number in range(1, self.len_steps + 1):
@@ -70,34 +125,115 @@ class BaseRecipe(models.Model):
             second = form_data.get(f'step{step_number}_second')
 
             if total_water_ml_this_step and minute and second:
-                # ステップを作成
-                self.create_step(
+                steps.append(step_model(
                     step_number=step_number,
                     minute=int(minute),
                     seconds=int(second),
                     total_water_ml_this_step=float(total_water_ml_this_step)
-                )
+                ))
                 total_water_ml = float(total_water_ml_this_step)
 
-        # 最後のステップの総湯量をレシピの総湯量として設定
-        if total_water_ml > 0:
-            # アイスコーヒーの場合は氷量を足す
-            if self.is_ice and self.ice_g:
-                self.water_ml = total_water_ml + self.ice_g
-            else:
-                self.water_ml = total_water_ml
-            self.save()
+        return steps, total_water_ml
+
+    def build_steps_from_recipe_data(self, recipe_data):
+        """レシピデータから未保存のステップ一覧を組み立てる（累積湯量をそのまま使う）"""
+        step_model = self.get_step_model()
+        return [
+            step_model(
+                step_number=step.get('step_number', i+1),
+                minute=step['minute'],
+                seconds=step['seconds'],
+                total_water_ml_this_step=step['total_water_ml_this_step']
+            )
+            for i, step in enumerate(recipe_data['steps'])
+        ]
+
+    def set_water_ml_from_total(self, total_water_ml):
+        """最後のステップの総湯量からレシピの総湯量を設定する"""
+        # アイスコーヒーの場合は氷量を足す
+        if self.is_ice and self.ice_g:
+            self.water_ml = total_water_ml + self.ice_g
+        else:
+            self.water_ml = total_water_ml
+
+    @staticmethod
+    def pack_steps(steps):
+        """ステップをsteps_packed形式に変換する"""
+        return [
+            [int(step.step_number), int(step.minute), int(step.seconds), float(step.total_water_ml_this_step)]
+            for step in sorted(steps, key=lambda step: step.step_number)
+        ]
 
+    def bulk_create_steps(self, steps):
+        """組み立て済みのステップを1回のINSERTでまとめて保存する"""
+        for step in steps:
+            step.recipe = self
+        return self.get_step_model().objects.bulk_create(steps)
+
+    def refresh_steps_packed(self):
+        """ステップテーブルからsteps_packedを再計算して保存する"""
+        self.steps_packed = self.pack_steps(self.get_step_model().objects.filter(recipe=self))
+        # ステップの変更はレシピの変更として扱い、更新日時も進める（update()ではauto_nowが働かないため明示する）
+        self.updated_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).update(steps_packed=self.steps_packed, updated_at=self.updated_at)
         return self
 
-    def create_step(self, step_number, minute, seconds, total_water_ml_this_step):
-        """ステップを作成するメソッド（サブクラスで実装）"""
+    def save_with_steps(self, steps):
+        """レシピ本体とステップを1トランザクションで保存する（レシピ1 INSERT + ステップ1 INSERT）"""
+        self.steps_packed = self.pack_steps(steps)
+        with transaction.atomic():
+            self.save()
+            self.bulk_create_steps(steps)
+        return self
+
+    def get_step_model(self):
+        """ステップのモデルクラスを返すメソッド（サブクラスで実装）"""
         raise NotImplementedError("サブクラスで実装してください")
 
     def update_with_steps(self, form_data):
         """ステップを含めてレシピを更新する"""
-        # サブクラスで実装
-        raise NotImplementedError("サブクラスで実装してください")
+        self.update_from_form_data(form_data)
+        steps, total_water_ml = self.build_steps_from_form_data(form_data)
+        if total_water_ml > 0:
+            self.set_water_ml_from_total(total_water_ml)
+        # 差分更新後のステップは送信されたステップと一致する
+        self.steps_packed = self.pack_steps(steps)
+
+        with transaction.atomic():
+            # ステップの削除ではシグナルでsteps_packedが破棄されるため、ステップを書き込んでからレシピを保存する
+            self.sync_steps(steps)
+            self.save()
+        return self
+
+    def sync_steps(self, steps):
+        """送信されたステップを既存ステップとstep_numberで突き合わせ、差分のみを書き込む
+
+        変更行はbulk_update、新規行はbulk_create、不要になった行は1回のDELETEで削除する。
+        変更がなければステップへの書き込みは発生しない。
+        """
+        step_model = self.get_step_model()
+        value_fields = step_model.value_fields
+        existing_steps = {step.step_number: step for step in step_model.objects.filter(recipe=self)}
+
+        steps_to_create = []
+        steps_to_update = []
+        for step in steps:
+            current = existing_steps.pop(step.step_number, None)
+            if current is None:
+                steps_to_create.append(step)
+            elif any(getattr(current, field) != getattr(step, field) for field in value_fields):
+                for field in value_fields:
+                    setattr(current, field, getattr(step, field))
+                steps_to_update.append(current)
+
+        # 残った既存ステップは送信されなかったもの（末尾の削除されたステップなど）
+        if existing_steps:
+            step_model.objects.filter(recipe=self, step_number__in=list(existing_steps)).delete()
+        if steps_to_update:
+            step_model.objects.bulk_update(steps_to_update, value_fields)
+        if steps_to_create:
+            self.bulk_create_steps(steps_to_create)
+        return self
 
     def update_from_form_data(self, form_data):
         """フォームデータからレシピの基本情報を更新する"""
@@ -110,6 +246,21 @@ class BaseRecipe(models.Model):
         return self
 
 
+class RecipeStepQuerySet(models.QuerySet):
+    """レシピステップ共通のクエリセット"""
+
+    def with_pour_amounts(self):
+        """各ステップの注湯量（前のステップとの累積湯量の差）をウィンドウ関数で1クエリのまま付与する"""
+        previous_total = Window(
+            expression=Lag('total_water_ml_this_step'),
+            partition_by=[F('recipe_id')],
+            order_by=F('step_number').asc(),
+        )
+        return self.annotate(
+            annotated_pour_ml_this_step=F('total_water_ml_this_step') - Coalesce(previous_total, Value(0.0)),
+        )
+
+
 class BaseRecipeStep(models.Model):
     """レシピステップの基底クラス"""
     step_number = models.IntegerField()
@@ -117,43 +268,37 @@ class BaseRecipeStep(models.Model):
     seconds = models.IntegerField()
     total_water_ml_this_step = models.FloatField()
 
+    # step_number以外の値フィールド（差分更新の比較対象）
+    value_fields = ('minute', 'seconds', 'total_water_ml_this_step')
+
+    objects = RecipeStepQuerySet.as_manager()
+
     class Meta:
         abstract = True
         ordering = ['step_number']
 
+    def _sibling_steps(self):
+        """同じレシピのステップ一覧を取得（prefetch済みならキャッシュを使い、なければ1クエリで読み込む）"""
+        return sorted(self.recipe.steps.all(), key=lambda step: step.step_number)
+
     @property
     def pour_ml_this_step(self):
         """このステップでの注湯量を計算する"""
-        if self.step_number == 1:
-            return self.total_water_ml_this_step
+        if hasattr(self, 'annotated_pour_ml_this_step'):
+            return self.annotated_pour_ml_this_step
 
         # 前のステップの累積湯量を取得
-        previous_step = self.__class__.objects.filter(
-            recipe=self.recipe,
-            step_number=self.step_number - 1
-        ).first()
-
-        if previous_step:
-            return self.total_water_ml_this_step - previous_step.total_water_ml_this_step
+        previous_steps = [step for step in self._sibling_steps() if step.step_number < self.step_number]
+        if previous_steps:
+            return self.total_water_ml_this_step - previous_steps[-1].total_water_ml_this_step
 
         return self.total_water_ml_this_step
 
-    @property
-    def cumulative_water_ml(self):
-        """このステップまでの累積湯量を計算する"""
-        cumulative = 0
-        for step_number in range(1, self.step_number + 1):
-            step = self.__class__.objects.filter(
-                recipe=self.recipe,
-                step_number=step_number
-            ).first()
-            if step:
-                cumulative += step.pour_ml_this_step
-        return cumulative
-
 
 class PresetRecipe(BaseRecipe):
     """プリセットレシピ"""
+    # ワーカープロセス内に保持するデフォルトプリセット: (バージョン, シリアライズ済みデータ)
+    _default_presets_cache = None
 
     def __str__(self):
         return self.name
@@ -161,9 +306,156 @@ class PresetRecipe(BaseRecipe):
     @classmethod
     def default_presets(cls):
         """デフォルトプリセットを取得"""
-        default_user = User.objects.get(username='DefaultPreset')
+        default_user = User.objects.get(username=AppConstants.DEFAULT_PRESET_USERNAME)
         return cls.objects.filter(created_by=default_user)
 
+    @classmethod
+    def default_presets_data(cls):
+        """シリアライズ済みのデフォルトプリセットを取得（プロセス内キャッシュ、共有バージョンキーで無効化）
+
+        返り値は全リクエストで共有されるため、呼び出し側で変更しないこと。
+        """
+        version = get_version(CacheConstants.DEFAULT_PRESETS_VERSION_KEY)
+
+        cached = cls._default_presets_cache
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        # キャッシュは次の無効化まで使い回されるため、レプリカの遅延を拾わないようプライマリから読む
+        with read_from_primary():
+            data = cls.objects.serialize_recipes(cls.default_presets())
+        cls._default_presets_cache = (version, data)
+        return data
+
+    @classmethod
+    async def adefault_presets_data(cls):
+        """default_presets_dataの非同期版（プロセス内キャッシュを共有する）"""
+        version = await aget_version(CacheConstants.DEFAULT_PRESETS_VERSION_KEY)
+
+        cached = cls._default_presets_cache
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        with read_from_primary():
+            default_user = await User.objects.aget(username=AppConstants.DEFAULT_PRESET_USERNAME)
+            data = await cls.objects.aserialize_recipes(cls.objects.filter(created_by=default_user))
+        cls._default_presets_cache = (version, data)
+        return data
+
+    @classmethod
+    def preset_recipes_payload(cls, user):
+        """プリセット一覧APIのレスポンスを (エンコード済みのbytes, gzip圧縮済みのbytes) で取得
+
+        (ユーザー, プリセットのバージョン) ごとにキャッシュし、ヒット時はORM・JSONエンコード・圧縮を行わない。
+        """
+        return get_or_compute(
+            cls.preset_payload_cache_key(*cls.get_preset_versions(user)),
+            lambda: cls._build_preset_recipes_payload(user),
+            CacheConstants.PRESET_PAYLOAD_TIMEOUT,
+        )
+
+    @classmethod
+    async def apreset_recipes_payload(cls, user):
+        """preset_recipes_payloadの非同期版（同じキャッシュを共有する）"""
+        return await aget_or_compute(
+            cls.preset_payload_cache_key(*await cls.aget_preset_versions(user)),
+            lambda: cls._abuild_preset_recipes_payload(user),
+            CacheConstants.PRESET_PAYLOAD_TIMEOUT,
+        )
+
+    @staticmethod
+    def preset_payload_cache_key(user_id, user_version, default_version):
+        """プリセット一覧APIのレスポンスのキャッシュキー"""
+        return CacheConstants.PRESET_PAYLOAD_KEY.format(
+            user_id=user_id, user_version=user_version, default_version=default_version
+        )
+
+    @classmethod
+    def _build_preset_recipes_payload(cls, user):
+        """プリセット一覧APIのレスポンスを構築し、エンコードと圧縮を行う"""
+        # 次のバージョン更新まで使い回されるため、レプリカの遅延を拾わないようプライマリから読む
+        with read_from_primary():
+            user_preset_recipes = cls.objects.filter(created_by=user) if user.is_authenticated else []
+            content = ResponseHelper.encode_data({
+                'user_preset_recipes': cls.objects.serialize_recipes(user_preset_recipes),
+                'default_preset_recipes': cls.default_presets_data(),
+            })
+        return content, ResponseHelper.compress(content)
+
+    @classmethod
+    async def _abuild_preset_recipes_payload(cls, user):
+        """_build_preset_recipes_payloadの非同期版"""
+        with read_from_primary():
+            user_preset_recipes = cls.objects.filter(created_by=user) if user.is_authenticated else []
+            content = ResponseHelper.encode_data({
+                'user_preset_recipes': await cls.objects.aserialize_recipes(user_preset_recipes),
+                'default_preset_recipes': await cls.adefault_presets_data(),
+            })
+        return content, ResponseHelper.compress(content)
+
+    @classmethod
+    def get_preset_versions(cls, user):
+        """(ユーザーID, ユーザーのプリセットのバージョン, デフォルトプリセットのバージョン) を取得（匿名ユーザーのIDは0）"""
+        user_id = user.pk if user.is_authenticated else 0
+        return (
+            user_id,
+            get_version(CacheConstants.USER_PRESETS_VERSION_KEY.format(user_id=user_id)),
+            get_version(CacheConstants.DEFAULT_PRESETS_VERSION_KEY),
+        )
+
+    @classmethod
+    async def aget_preset_versions(cls, user):
+        """get_preset_versionsの非同期版"""
+        user_id = user.pk if user.is_authenticated else 0
+        return (
+            user_id,
+            await aget_version(CacheConstants.USER_PRESETS_VERSION_KEY.format(user_id=user_id)),
+            await aget_version(CacheConstants.DEFAULT_PRESETS_VERSION_KEY),
+        )
+
+    @classmethod
+    def get_preset_recipes_etag(cls, user):
+        """プリセット一覧APIのETag（キャッシュのバージョンのみから求め、レスポンスは構築しない）
+
+        削除は更新日時の最大値に現れないため、Last-Modifiedは使わずバージョンで判定する。
+        """
+        return '-'.join(str(part) for part in cls.get_preset_versions(user))
+
+    @classmethod
+    async def aget_preset_recipes_etag(cls, user):
+        """get_preset_recipes_etagの非同期版"""
+        return '-'.join(str(part) for part in await cls.aget_preset_versions(user))
+
+    @classmethod
+    def invalidate_user_presets_cache(cls, user_id):
+        """ユーザーのプリセット一覧キャッシュを無効化する（バージョンを更新し、古いエントリを参照させない）"""
+        bump_version(CacheConstants.USER_PRESETS_VERSION_KEY.format(user_id=user_id))
+
+    @classmethod
+    def invalidate_default_presets_cache(cls):
+        """デフォルトプリセットのキャッシュを全ワーカーで無効化する"""
+        bump_version(CacheConstants.DEFAULT_PRESETS_VERSION_KEY)
+        cls._default_presets_cache = None
+
+    @classmethod
+    def default_preset_owner_id(cls):
+        """デフォルトプリセット所有ユーザーのID（共有キャッシュ付き、存在しない場合はNone）"""
+        return get_or_compute(
+            CacheConstants.DEFAULT_PRESET_OWNER_KEY,
+            lambda: User.objects.filter(username=AppConstants.DEFAULT_PRESET_USERNAME).values_list('pk', flat=True).first(),
+            CacheConstants.DEFAULT_PRESET_OWNER_TIMEOUT,
+        )
+
+    @classmethod
+    def invalidate_default_preset_owner(cls):
+        """デフォルトプリセット所有ユーザーのIDのキャッシュを削除する"""
+        cache.delete(CacheConstants.DEFAULT_PRESET_OWNER_KEY)
+
+    @classmethod
+    def is_default_preset_owner(cls, user_id):
+        """指定ユーザーがデフォルトプリセットの所有者かどうか（キャッシュ済みのIDと比べ、DBを読まない）"""
+        return user_id is not None and user_id == cls.default_preset_owner_id()
+
     @classmethod
     def get_preset_recipes_for_user(cls, user):
         """ユーザーのプリセットレシピとデフォルトプリセットを取得"""
@@ -171,10 +463,24 @@ class PresetRecipe(BaseRecipe):
         default_preset_recipes = cls.default_presets()
         return user_preset_recipes, default_preset_recipes
 
+    @classmethod
+    def get_preset_button_data(cls, user):
+        """トップページのプリセットボタン用に (ユーザーのプリセット, デフォルトプリセット) の id と name だけを取得
+
+        ステップを含む全データはプリセット一覧API（キャッシュ済み）から取得するため、ここでは読まない。
+        デフォルトプリセットはプロセス内キャッシュから作るため、クエリはユーザーのプリセットの1回だけで済む。
+        """
+        user_preset_buttons = list(cls.objects.filter(created_by=user).values('id', 'name')) if user.is_authenticated else []
+        default_preset_buttons = [{'id': recipe['id'], 'name': recipe['name']} for recipe in cls.default_presets_data()]
+        return user_preset_buttons, default_preset_buttons
+
     @classmethod
     def check_preset_limit_or_error(cls, user):
-        """ユーザーのプリセット上限をチェックし、エラーの場合はレスポンスを返す"""
-        current_preset_count = cls.objects.filter(created_by=user).count()
+        """ユーザーのプリセット上限をチェックし、エラーの場合はレスポンスを返す
+
+        作成と同じtransaction.atomic()内で呼ぶと、コミットまでユーザー行をロックして同時作成による超過を防ぐ。
+        """
+        current_preset_count = User.objects.get_quota_counts(user)['preset_count']
         if current_preset_count >= user.preset_limit_value:
             return ResponseHelper.create_error_response(
                 'preset_limit_exceeded',
@@ -183,45 +489,27 @@ class PresetRecipe(BaseRecipe):
         return None
 
     def get_steps(self):
-        """ステップを取得するメソッド"""
-        return PresetRecipeStep.objects.filter(recipe=self).order_by('step_number')
+        """ステップを取得するメソッド（prefetch済みならキャッシュを使う）"""
+        return self.steps.all()
 
     def add_specific_fields_to_dict(self, base_data):
         """プリセットレシピ固有のフィールドを辞書に追加するメソッド"""
         base_data['id'] = self.id
         return base_data
 
-    def create_step(self, step_number, minute, seconds, total_water_ml_this_step):
-        """ステップを作成するメソッド"""
-        PresetRecipeStep.objects.create(
-            recipe=self,
-            step_number=step_number,
-            minute=minute,
-            seconds=seconds,
-            total_water_ml_this_step=total_water_ml_this_step,
-        )
+    def get_step_model(self):
+        """ステップのモデルクラスを返すメソッド"""
+        return PresetRecipeStep
 
     def create_with_user_and_steps(self, form_data, user):
         """ユーザーとステップを含めてレシピを作成する"""
         self.created_by = user
-        # まずレシピを保存（water_mlは後で設定）
-        self.water_ml = 0  # 一時的に0を設定
-        self.save()
-        # ステップを作成（water_mlが設定される）
-        self.create_steps_from_form_data(form_data)
-        return self
-
-    def update_with_steps(self, form_data):
-        """ステップを含めてレシピを更新する"""
-        self.update_from_form_data(form_data)
-        self.save()
-
-        # 既存のステップを削除
-        PresetRecipeStep.objects.filter(recipe=self).delete()
-
-        # 新しいステップを作成
-        self.create_steps_from_form_data(form_data)
-        return self
+        steps, total_water_ml = self.build_steps_from_form_data(form_data)
+        # 総湯量はステップから先に計算し、レシピは1回のINSERTで保存する
+        self.water_ml = 0
+        if total_water_ml > 0:
+            self.set_water_ml_from_total(total_water_ml)
+        return self.save_with_steps(steps)
 
 
 class PresetRecipeStep(BaseRecipeStep):
@@ -230,6 +518,9 @@ class PresetRecipeStep(BaseRecipeStep):
 
     class Meta:
         ordering = ['step_number']  # 手順の順番で並べる
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'step_number'], name='uniq_preset_step_number'),
+        ]
 
     def __str__(self):
         return f"Step {self.step_number} for {self.recipe.name}"
@@ -240,6 +531,14 @@ class SharedRecipe(BaseRecipe):
     created_at = models.DateTimeField(auto_now_add=True)
     access_token = models.CharField(max_length=32, unique=True)
 
+    objects = SharedRecipeManager()
+
+    class Meta:
+        indexes = [
+            # ユーザーごとの共有レシピ一覧（作成日時順）と件数チェック用
+            models.Index(fields=['created_by', 'created_at'], name='shared_created_by_at_idx'),
+        ]
+
     def __str__(self):
         return f"Shared: {self.name} ({self.access_token})"
 
@@ -248,24 +547,123 @@ class SharedRecipe(BaseRecipe):
         """トークンで共有レシピを取得"""
         return cls.objects.filter(access_token=token).first()
 
+    @classmethod
+    def get_cached_data_by_token(cls, token):
+        """トークンで共有レシピの辞書データを取得（キャッシュ付き、存在しない場合はNone）
+
+        存在しないトークンも短時間キャッシュし、リンクスキャナーによるDBアクセスを防ぐ。
+        返り値はリクエスト間で共有されるため、呼び出し側で変更しないこと。
+        """
+        entry = cls._get_cached_entry_by_token(token)
+        return entry[0] if entry else None
+
+    @classmethod
+    async def aget_cached_data_by_token(cls, token):
+        """get_cached_data_by_tokenの非同期版（同じキャッシュを共有する）"""
+        entry = await cls._aget_cached_entry_by_token(token)
+        return entry[0] if entry else None
+
+    @classmethod
+    def _get_cached_entry_by_token(cls, token):
+        """(辞書データ, 更新日時) をキャッシュ付きで取得（存在しない場合はNone）
+
+        更新日時はETag・Last-Modified用で、APIのレスポンスには含めないため辞書データとは別に持つ。
+        """
+        return get_or_compute(cls.token_cache_key(token), lambda: cls._load_token_data(token), cls._token_data_timeout)
+
+    @classmethod
+    async def _aget_cached_entry_by_token(cls, token):
+        """_get_cached_entry_by_tokenの非同期版（同じキャッシュを共有する）"""
+        return await aget_or_compute(
+            cls.token_cache_key(token), lambda: cls._aload_token_data(token), cls._token_data_timeout
+        )
+
+    @staticmethod
+    def _token_data_timeout(entry):
+        """共有レシピのキャッシュ期間（存在しないトークンは短くする）"""
+        return CacheConstants.SHARED_RECIPE_TIMEOUT if entry else CacheConstants.SHARED_RECIPE_NOT_FOUND_TIMEOUT
+
+    @classmethod
+    def _load_token_data(cls, token):
+        """DBから共有レシピの (辞書データ, 更新日時) を読む（存在しない場合はNone）"""
+        # 直近に変更されたトークンは、レプリカの遅延した内容をTTLの間キャッシュしないようプライマリから読む
+        recently_changed = cache.get(f'{cls.token_cache_key(token)}:changed')
+        with read_from_primary() if recently_changed else contextlib.nullcontext():
+            shared_recipe = cls.objects.select_related('created_by').filter(access_token=token).first()
+            return (shared_recipe.to_dict(), shared_recipe.updated_at) if shared_recipe else None
+
+    @classmethod
+    async def _aload_token_data(cls, token):
+        """_load_token_dataの非同期版"""
+        recently_changed = await cache.aget(f'{cls.token_cache_key(token)}:changed')
+        with read_from_primary() if recently_changed else contextlib.nullcontext():
+            shared_recipe = await cls.objects.select_related('created_by').filter(access_token=token).afirst()
+            if not shared_recipe:
+                return None
+            # to_dict()はステップを同期で読むため、steps_packedを持たないレシピは先読みしておく
+            if shared_recipe.steps_packed is None:
+                await aprefetch_related_objects([shared_recipe], 'steps')
+            return shared_recipe.to_dict(), shared_recipe.updated_at
+
+    @staticmethod
+    def token_cache_key(token):
+        """トークンのキャッシュキー（URL由来の任意の文字列でもキャッシュキーとして安全な形にする）"""
+        return CacheConstants.SHARED_RECIPE_KEY.format(token_hash=hashlib.sha256(token.encode()).hexdigest())
+
+    @classmethod
+    def invalidate_token_cache(cls, token):
+        """トークンのキャッシュを削除し、レプリカの遅延が収まるまで再構築をプライマリから行わせる"""
+        cache_key = cls.token_cache_key(token)
+        cache.set(f'{cache_key}:changed', 1, settings.REPLICA_STICKY_SECONDS)
+        cache.delete(cache_key)
+
+    @classmethod
+    def get_etag_by_token(cls, token):
+        """共有レシピのETag（キャッシュ済みデータの更新日時から求める、存在しない場合はNone）"""
+        return cls._build_etag(token, cls.get_last_modified_by_token(token))
+
+    @classmethod
+    async def aget_etag_by_token(cls, token):
+        """get_etag_by_tokenの非同期版"""
+        return cls._build_etag(token, await cls.aget_last_modified_by_token(token))
+
+    @staticmethod
+    def _build_etag(token, updated_at):
+        """トークンと更新日時からETagを作成する（更新日時がNoneならNone）"""
+        if updated_at is None:
+            return None
+        return f"{token}-{int(updated_at.timestamp() * 1_000_000):x}"
+
+    @classmethod
+    def get_last_modified_by_token(cls, token):
+        """共有レシピの更新日時（存在しない場合はNone）"""
+        entry = cls._get_cached_entry_by_token(token)
+        return entry[1] if entry else None
+
+    @classmethod
+    async def aget_last_modified_by_token(cls, token):
+        """get_last_modified_by_tokenの非同期版"""
+        entry = await cls._aget_cached_entry_by_token(token)
+        return entry[1] if entry else None
+
     @classmethod
     def get_shared_recipe_data(cls, shared_token):
         """共有レシピデータを取得（エラーハンドリング付き）"""
         if not shared_token:
             return None
 
-        shared_recipe = cls.get_by_token(shared_token)
-        if not shared_recipe:
+        shared_recipe_data = cls.get_cached_data_by_token(shared_token)
+        if not shared_recipe_data:
             return {'error': 'not_found', 'message': 'この共有リンクは存在しません。'}
 
-        return shared_recipe.to_dict()
+        return shared_recipe_data
 
     @classmethod
     def create_shared_recipe_from_data(cls, recipe_data, user):
         """レシピデータから共有レシピを作成する"""
         access_token = secrets.token_hex(AppConstants.TOKEN_LENGTH)
 
-        shared_recipe = cls.objects.create(
+        shared_recipe = cls(
             name=recipe_data['name'],
             created_by=user,
             is_ice=recipe_data['is_ice'],
@@ -277,24 +675,35 @@ class SharedRecipe(BaseRecipe):
             access_token=access_token
         )
 
-        # Model層のメソッドを使用してステップを作成
-        shared_recipe.create_steps_from_recipe_data(recipe_data)
+        # レシピ本体とステップを1トランザクションでまとめて保存
+        steps = shared_recipe.build_steps_from_recipe_data(recipe_data)
+        return shared_recipe.save_with_steps(steps)
+
+    @classmethod
+    def get_shared_recipe_data_or_error(cls, token):
+        """共有レシピの辞書データをキャッシュから取得し、存在チェックを行う"""
+        shared_recipe_data = cls.get_cached_data_by_token(token)
+        if not shared_recipe_data:
+            return None, ResponseHelper.create_error_response('not_found', 'この共有リンクは存在しません。', 404)
 
-        return shared_recipe
+        return shared_recipe_data, None
 
     @classmethod
-    def get_shared_recipe_or_error(cls, token):
-        """共有レシピを取得し、存在・期限チェックを行う"""
-        shared_recipe = cls.get_by_token(token)
-        if not shared_recipe:
+    async def aget_shared_recipe_data_or_error(cls, token):
+        """get_shared_recipe_data_or_errorの非同期版"""
+        shared_recipe_data = await cls.aget_cached_data_by_token(token)
+        if not shared_recipe_data:
             return None, ResponseHelper.create_error_response('not_found', 'この共有リンクは存在しません。', 404)
 
-        return shared_recipe, None
+        return shared_recipe_data, None
 
     @classmethod
     def check_share_limit_or_error(cls, user):
-        """共有レシピ上限チェック、上限超過の場合はエラーレスポンスを返す"""
-        current_count = cls.objects.filter(created_by=user).count()
+        """共有レシピ上限チェック、上限超過の場合はエラーレスポンスを返す
+
+        作成と同じtransaction.atomic()内で呼ぶと、コミットまでユーザー行をロックして同時作成による超過を防ぐ。
+        """
+        current_count = User.objects.get_quota_counts(user)['shared_recipe_count']
         limit = user.share_limit_value
 
         if current_count >= limit:
@@ -311,45 +720,40 @@ class SharedRecipe(BaseRecipe):
         return None
 
     @classmethod
-    def copy_to_preset(cls, shared_recipe, user):
-        """共有レシピをプリセットとして複製"""
-        # プリセット上限チェック
-        error_response = PresetRecipe.check_preset_limit_or_error(user)
-        if error_response:
-            return None, error_response
+    def copy_to_preset(cls, shared_recipe_data, user):
+        """共有レシピをプリセットとして複製（キャッシュ済みの辞書データから作成し、共有レシピの行は読まない）"""
+        # 上限チェック（ユーザー行をロック）と複製を同一トランザクションで行う
+        with transaction.atomic():
+            # プリセット上限チェック
+            error_response = PresetRecipe.check_preset_limit_or_error(user)
+            if error_response:
+                return None, error_response
+
+            try:
+                # 共有レシピをプリセットとして複製
+                new_recipe = PresetRecipe(
+                    name=shared_recipe_data['name'],
+                    created_by=user,
+                    is_ice=shared_recipe_data['is_ice'],
+                    ice_g=shared_recipe_data['ice_g'],
+                    len_steps=shared_recipe_data['len_steps'],
+                    bean_g=shared_recipe_data['bean_g'],
+                    water_ml=shared_recipe_data['water_ml'],
+                    memo=shared_recipe_data['memo'] or ''
+                )
 
-        try:
-            # 共有レシピをプリセットとして複製
-            new_recipe = PresetRecipe.objects.create(
-                name=shared_recipe.name,
-                created_by=user,
-                is_ice=shared_recipe.is_ice,
-                ice_g=shared_recipe.ice_g,
-                len_steps=shared_recipe.len_steps,
-                bean_g=shared_recipe.bean_g,
-                water_ml=shared_recipe.water_ml,
-                memo=shared_recipe.memo or ''
-            )
+                # ステップを複製（レシピ本体とまとめて1トランザクションで保存）
+                steps = new_recipe.build_steps_from_recipe_data(shared_recipe_data)
+                new_recipe.save_with_steps(steps)
 
-            # ステップを複製
-            shared_steps = SharedRecipeStep.objects.filter(recipe=shared_recipe).order_by('step_number')
-            for shared_step in shared_steps:
-                PresetRecipeStep.objects.create(
-                    recipe=new_recipe,
-                    step_number=shared_step.step_number,
-                    minute=shared_step.minute,
-                    seconds=shared_step.seconds,
-                    total_water_ml_this_step=shared_step.total_water_ml_this_step
+                return new_recipe, None
+            except Exception:
+                return None, ResponseHelper.create_error_response(
+                    'database_error',
+                    'レシピの保存に失敗しました。しばらく時間をおいてから再度お試しください。',
+                    500
                 )
 
-            return new_recipe, None
-        except Exception:
-            return None, ResponseHelper.create_error_response(
-                'database_error',
-                'レシピの保存に失敗しました。しばらく時間をおいてから再度お試しください。',
-                500
-            )
-
     @classmethod
     def delete_with_image(cls, shared_recipe):
         """共有レシピを削除"""
@@ -364,33 +768,119 @@ class SharedRecipe(BaseRecipe):
                 500
             )
 
+    # 共有レシピ一覧APIで取得できるフィールド
+    LISTING_FIELDS = (
+        'access_token', 'name', 'created_at', 'is_ice', 'bean_g', 'water_ml', 'ice_g', 'len_steps', 'memo'
+    )
+
     @classmethod
-    def get_user_shared_recipes_data(cls, user):
-        """ユーザーの共有レシピ一覧データを取得"""
+    def get_user_shared_recipes_data(cls, user, after=None, limit=None, fields=None):
+        """ユーザーの共有レシピ一覧データを取得（作成日時の新しい順、キーセットページネーション）
+
+        after: 前ページのレスポンスのnext（"作成日時,ID"形式のカーソル）
+        limit: 1ページの件数（上限はSHARED_RECIPES_MAX_PAGE_SIZE）
+        fields: カンマ区切りで返すフィールドを指定（省略時は全フィールド）
+        """
+        queryset, selected_fields, page_size, error_response = cls._listing_queryset_or_error(user, after, limit, fields)
+        if error_response:
+            return error_response
+
         try:
-            shared_recipes = cls.objects.filter(created_by=user).order_by('-created_at')
-            recipes_data = []
-
-            for recipe in shared_recipes:
-                recipes_data.append({
-                    'access_token': recipe.access_token,
-                    'name': recipe.name,
-                    'created_at': recipe.created_at.isoformat(),
-                    'is_ice': recipe.is_ice,
-                    'bean_g': recipe.bean_g,
-                    'water_ml': recipe.water_ml,
-                    'ice_g': recipe.ice_g,
-                    'len_steps': recipe.len_steps,
-                    'memo': recipe.memo
-                })
-
-            return ResponseHelper.create_data_response({'shared_recipes': recipes_data})
+            return cls._build_listing_response(list(queryset), selected_fields, page_size)
         except Exception:
             return ResponseHelper.create_server_error_response('共有レシピ一覧の取得に失敗しました。')
 
+    @classmethod
+    async def aget_user_shared_recipes_data(cls, user, after=None, limit=None, fields=None):
+        """get_user_shared_recipes_dataの非同期版"""
+        queryset, selected_fields, page_size, error_response = cls._listing_queryset_or_error(user, after, limit, fields)
+        if error_response:
+            return error_response
+
+        try:
+            return cls._build_listing_response([row async for row in queryset], selected_fields, page_size)
+        except Exception:
+            return ResponseHelper.create_server_error_response('共有レシピ一覧の取得に失敗しました。')
+
+    @classmethod
+    def _listing_queryset_or_error(cls, user, after, limit, fields):
+        """一覧APIのパラメータを検証し、(クエリセット, 返すフィールド, ページサイズ, エラーレスポンス) を返す
+
+        クエリセットは次ページの有無を判定するため、ページサイズより1件多く取得する。
+        """
+        try:
+            page_size = int(limit) if limit else AppConstants.SHARED_RECIPES_PAGE_SIZE
+            if not 1 <= page_size <= AppConstants.SHARED_RECIPES_MAX_PAGE_SIZE:
+                raise ValueError
+        except ValueError:
+            return None, None, None, ResponseHelper.create_error_response(
+                'invalid_parameter',
+                f'limitは1から{AppConstants.SHARED_RECIPES_MAX_PAGE_SIZE}の整数で指定してください。'
+            )
+
+        selected_fields = [field for field in fields.split(',') if field] if fields else list(cls.LISTING_FIELDS)
+        if not selected_fields or any(field not in cls.LISTING_FIELDS for field in selected_fields):
+            return None, None, None, ResponseHelper.create_error_response(
+                'invalid_parameter',
+                f'fieldsには次の値を指定してください: {", ".join(cls.LISTING_FIELDS)}'
+            )
+
+        queryset = cls.objects.filter(created_by=user)
+        if after:
+            cursor = cls.parse_listing_cursor(after)
+            if cursor is None:
+                return None, None, None, ResponseHelper.create_error_response(
+                    'invalid_parameter', 'afterの形式が正しくありません。'
+                )
+            created_at, recipe_id = cursor
+            queryset = queryset.filter(
+                models.Q(created_at__lt=created_at) | models.Q(created_at=created_at, id__lt=recipe_id)
+            )
+
+        queryset = (
+            queryset.order_by('-created_at', '-id')
+            .values('id', *dict.fromkeys(['created_at', *selected_fields]))[:page_size + 1]
+        )
+        return queryset, selected_fields, page_size, None
+
+    @classmethod
+    def _build_listing_response(cls, rows, selected_fields, page_size):
+        """一覧APIの取得結果（ページサイズ+1件まで）からレスポンスを作成する"""
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = cls.build_listing_cursor(rows[-1]['created_at'], rows[-1]['id'])
+
+        recipes_data = []
+        for row in rows:
+            recipe_data = {field: row[field] for field in selected_fields}
+            if 'created_at' in recipe_data:
+                recipe_data['created_at'] = row['created_at'].isoformat()
+            recipes_data.append(recipe_data)
+
+        return ResponseHelper.create_data_response({'shared_recipes': recipes_data, 'next': next_cursor})
+
+    @staticmethod
+    def build_listing_cursor(created_at, recipe_id):
+        """一覧APIのカーソル文字列を作成（URLエンコード不要な形式）"""
+        return f"{created_at.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')},{recipe_id}"
+
+    @staticmethod
+    def parse_listing_cursor(cursor):
+        """一覧APIのカーソル文字列を(作成日時, ID)に変換（不正な場合やタイムゾーンを持たない場合はNone）"""
+        try:
+            created_at, recipe_id = cursor.rsplit(',', 1)
+            created_at, recipe_id = datetime.datetime.fromisoformat(created_at), int(recipe_id)
+        except ValueError:
+            return None
+        # タイムゾーンなしの日時はサーバーのタイムゾーン次第で比較結果が変わるため受け付けない
+        if timezone.is_naive(created_at):
+            return None
+        return created_at, recipe_id
+
     def get_steps(self):
-        """ステップを取得するメソッド"""
-        return SharedRecipeStep.objects.filter(recipe=self).order_by('step_number')
+        """ステップを取得するメソッド（prefetch済みならキャッシュを使う）"""
+        return self.steps.all()
 
     def add_specific_fields_to_dict(self, base_data):
         """共有レシピ固有のフィールドを辞書に追加するメソッド"""
@@ -399,40 +889,9 @@ class SharedRecipe(BaseRecipe):
         base_data['access_token'] = self.access_token
         return base_data
 
-    def create_steps_from_recipe_data(self, recipe_data):
-        """レシピデータから共有レシピステップを作成する（累積湯量をそのまま保存）"""
-        for i, step in enumerate(recipe_data['steps']):
-            # プリセットのtotal_water_ml_this_stepは既に累積湯量なので、そのまま使用
-            SharedRecipeStep.objects.create(
-                recipe=self,
-                step_number=step.get('step_number', i+1),
-                minute=step['minute'],
-                seconds=step['seconds'],
-                total_water_ml_this_step=step['total_water_ml_this_step']
-            )
-        return self
-
-    def create_step(self, step_number, minute, seconds, total_water_ml_this_step):
-        """ステップを作成するメソッド"""
-        SharedRecipeStep.objects.create(
-            recipe=self,
-            step_number=step_number,
-            minute=minute,
-            seconds=seconds,
-            total_water_ml_this_step=total_water_ml_this_step
-        )
-
-    def update_with_steps(self, form_data):
-        """ステップを含めて共有レシピを更新する"""
-        self.update_from_form_data(form_data)
-        self.save()  # 基本情報を保存
-
-        # 既存のステップを削除
-        SharedRecipeStep.objects.filter(recipe=self).delete()
-
-        # 新しいステップを作成
-        self.create_steps_from_form_data(form_data)
-        return self
+    def get_step_model(self):
+        """ステップのモデルクラスを返すメソッド"""
+        return SharedRecipeStep
 
 
 class SharedRecipeStep(BaseRecipeStep):
@@ -441,6 +900,9 @@ class SharedRecipeStep(BaseRecipeStep):
 
     class Meta:
         ordering = ['step_number']
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'step_number'], name='uniq_shared_step_number'),
+        ]
 
     def __str__(self):
         return f"SharedStep {self.step_number} for {self.recipe.name}"
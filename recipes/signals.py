@@ -0,0 +1,150 @@
+"""
+レシピ関連のシグナルハンドラ
+
+デフォルトプリセットが変更された際にプロセス内キャッシュを無効化する。
+ユーザーのプリセットが変更された際にはプリセット一覧APIのキャッシュを無効化する。
+共有レシピが編集・削除された際にはトークンのキャッシュを無効化する。
+ステップが一括書き込み（save_with_steps・sync_steps）以外で保存・削除された際にはsteps_packedを破棄する。
+また、レシピの作成・削除に合わせてユーザーごとの上限チェック用カウンタを更新する。
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from users.models import User
+from Co_fitting.utils.constants import AppConstants
+from .models import PresetRecipe, PresetRecipeStep, SharedRecipe, SharedRecipeStep
+
+
+def _invalidate_default_presets():
+    """キャッシュを即時に無効化し、コミット後にも再度無効化する
+
+    ステップはbulk_createで保存されシグナルが飛ばないため、コミット前に他ワーカーが
+    古いデータで再構築したキャッシュもコミット時点で破棄されるようにする。
+    """
+    PresetRecipe.invalidate_default_presets_cache()
+    transaction.on_commit(PresetRecipe.invalidate_default_presets_cache)
+
+
+@receiver([post_save, post_delete], sender=PresetRecipe)
+def invalidate_default_presets_on_recipe_change(sender, instance, **kwargs):
+    """デフォルトプリセットのレシピが変更されたらキャッシュを無効化"""
+    if PresetRecipe.is_default_preset_owner(instance.created_by_id):
+        _invalidate_default_presets()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_default_presets_on_owner_change(sender, instance, **kwargs):
+    """デフォルトプリセット所有ユーザーが作成・削除されたらキャッシュを無効化"""
+    if instance.username == AppConstants.DEFAULT_PRESET_USERNAME:
+        PresetRecipe.invalidate_default_preset_owner()
+        transaction.on_commit(PresetRecipe.invalidate_default_preset_owner)
+        _invalidate_default_presets()
+
+
+def _invalidate_user_presets(user_id):
+    """ユーザーのプリセット一覧キャッシュを即時とコミット後の2回無効化する（理由は_invalidate_default_presetsと同じ）"""
+    PresetRecipe.invalidate_user_presets_cache(user_id)
+    transaction.on_commit(lambda: PresetRecipe.invalidate_user_presets_cache(user_id))
+
+
+@receiver([post_save, post_delete], sender=PresetRecipe)
+def invalidate_user_presets_on_recipe_change(sender, instance, **kwargs):
+    """プリセットの作成・更新・削除（共有レシピからのコピーを含む）でキャッシュを無効化"""
+    _invalidate_user_presets(instance.created_by_id)
+
+
+@receiver([post_save, post_delete], sender=PresetRecipeStep)
+def invalidate_presets_on_step_change(sender, instance, **kwargs):
+    """プリセットのステップが変更されたら、所有ユーザーのプリセット一覧（デフォルトプリセットならそのキャッシュも）を無効化"""
+    # 読み込み済みのレシピがあれば所有ユーザーを問い合わせない
+    if PresetRecipeStep.recipe.is_cached(instance):
+        recipe_owner_id = instance.recipe.created_by_id
+    else:
+        recipe_owner_id = (
+            PresetRecipe.objects.filter(pk=instance.recipe_id).values_list('created_by_id', flat=True).first()
+        )
+    # レシピごと削除された場合は所有ユーザーが分からないため、デフォルトプリセットも無効化する
+    if recipe_owner_id is None or PresetRecipe.is_default_preset_owner(recipe_owner_id):
+        _invalidate_default_presets()
+    if recipe_owner_id is not None:
+        _invalidate_user_presets(recipe_owner_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_presets_on_user_created(sender, instance, created, **kwargs):
+    """ユーザー作成時にキャッシュを無効化（IDが再利用されるDBで以前のユーザーのキャッシュを参照させない）"""
+    if created:
+        PresetRecipe.invalidate_user_presets_cache(instance.pk)
+
+
+def _invalidate_shared_recipe(token):
+    """共有レシピのトークンキャッシュを即時とコミット後の2回無効化する"""
+    SharedRecipe.invalidate_token_cache(token)
+    transaction.on_commit(lambda: SharedRecipe.invalidate_token_cache(token))
+
+
+@receiver([post_save, post_delete], sender=SharedRecipe)
+def invalidate_shared_recipe_on_recipe_change(sender, instance, **kwargs):
+    """共有レシピの編集（update_with_steps）・削除（delete_with_image）でキャッシュを無効化"""
+    _invalidate_shared_recipe(instance.access_token)
+
+
+@receiver([post_save, post_delete], sender=SharedRecipeStep)
+def invalidate_shared_recipe_on_step_change(sender, instance, **kwargs):
+    """共有レシピのステップが変更されたらキャッシュを無効化（管理画面からの編集など）"""
+    token = SharedRecipe.objects.filter(pk=instance.recipe_id).values_list('access_token', flat=True).first()
+    if token is not None:
+        _invalidate_shared_recipe(token)
+
+
+def _discard_steps_packed(recipe_model, recipe_id):
+    """steps_packedを破棄し、to_dict()にステップテーブルから組み立てさせる（更新日時も進める）"""
+    recipe_model.objects.filter(pk=recipe_id).update(steps_packed=None, updated_at=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=PresetRecipeStep)
+def discard_preset_steps_packed_on_step_change(sender, instance, **kwargs):
+    """プリセットのステップが直接保存・削除されたらsteps_packedを破棄"""
+    _discard_steps_packed(PresetRecipe, instance.recipe_id)
+
+
+@receiver([post_save, post_delete], sender=SharedRecipeStep)
+def discard_shared_steps_packed_on_step_change(sender, instance, **kwargs):
+    """共有レシピのステップが直接保存・削除されたらsteps_packedを破棄"""
+    _discard_steps_packed(SharedRecipe, instance.recipe_id)
+
+
+def _adjust_recipe_counter(user_id, counter_field, delta):
+    """ユーザーのレシピ数カウンタをF()式で増減する（保存・削除と同じトランザクション内で実行される）"""
+    queryset = User.objects.filter(pk=user_id)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{counter_field}__gt': 0})
+    queryset.update(**{counter_field: F(counter_field) + delta})
+
+
+@receiver(post_save, sender=PresetRecipe)
+def increment_preset_count(sender, instance, created, **kwargs):
+    """プリセット作成時にカウンタを増やす"""
+    if created:
+        _adjust_recipe_counter(instance.created_by_id, 'preset_count', 1)
+
+
+@receiver(post_delete, sender=PresetRecipe)
+def decrement_preset_count(sender, instance, **kwargs):
+    """プリセット削除時にカウンタを減らす"""
+    _adjust_recipe_counter(instance.created_by_id, 'preset_count', -1)
+
+
+@receiver(post_save, sender=SharedRecipe)
+def increment_shared_recipe_count(sender, instance, created, **kwargs):
+    """共有レシピ作成時にカウンタを増やす"""
+    if created:
+        _adjust_recipe_counter(instance.created_by_id, 'shared_recipe_count', 1)
+
+
+@receiver(post_delete, sender=SharedRecipe)
+def decrement_shared_recipe_count(sender, instance, **kwargs):
+    """共有レシピ削除時にカウンタを減らす"""
+    _adjust_recipe_counter(instance.created_by_id, 'shared_recipe_count', -1)
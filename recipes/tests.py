@@ -1,14 +1,25 @@
-from django.test import TestCase
-from django.urls import reverse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from io import StringIO
+from django.urls import resolve, reverse
+from django.utils import timezone
+import gzip
 import json
+from unittest.mock import patch
+from asgiref.sync import sync_to_async
 from Co_fitting.tests.helpers import (
     create_test_user, create_test_recipe, create_test_shared_recipe,
     login_test_user, BaseTestCase, assert_json_response,
-    create_recipe_data, create_form_data
+    create_recipe_data, create_form_data, assert_queries_use_index, analyze_tables, count_queries
 )
 from users.models import User
 from recipes.models import PresetRecipe, PresetRecipeStep, SharedRecipe, SharedRecipeStep
 from recipes.forms import RecipeForm
+from recipes import views
+from Co_fitting.utils.cache_utils import lock_key, set_cached
 
 
 class RecipeCreateTestCase(BaseTestCase):
@@ -528,6 +539,20 @@ class SharedRecipeAddToPresetTestCase(TestCase):
         self.assertEqual(added_recipe.water_ml, 200.0)
         self.assertEqual(added_recipe.len_steps, 2)
 
+    def test_add_shared_recipe_to_preset_uses_cached_recipe(self):
+        """キャッシュ済みの共有レシピはDBから読まずにプリセットへ複製することをテスト"""
+        add_url = reverse('recipes:add_shared_recipe_to_preset', kwargs={'token': self.shared_recipe.access_token})
+        SharedRecipe.get_cached_data_by_token(self.shared_recipe.access_token)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(add_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT') and 'recipes_sharedrecipe' in query['sql']
+        ])
+
     def test_add_shared_recipe_to_preset_limit_exceeded(self):
         """プリセット枠上限時のエラーハンドリング"""
         # プリセット枠を上限まで埋める
@@ -760,15 +785,13 @@ class RecipeModelTestCase(TestCase):
         step_numbers = [step.step_number for step in steps]
         self.assertEqual(step_numbers, [1, 2, 3])
 
-    def test_create_steps_from_form_data(self):
+    def test_create_with_user_and_steps_from_form_data(self):
         """フォームデータからステップを作成するテスト"""
-        recipe = PresetRecipe.objects.create(
+        recipe = PresetRecipe(
             name='テストレシピ',
-            created_by=self.user,
             is_ice=False,
             len_steps=2,
             bean_g=20.0,
-            water_ml=0.0,  # 初期値
             memo='テストメモ'
         )
 
@@ -781,7 +804,14 @@ class RecipeModelTestCase(TestCase):
             'step2_water': '100.0',
         }
 
-        recipe.create_steps_from_form_data(form_data)
+        with CaptureQueriesContext(connection) as queries:
+            recipe.create_with_user_and_steps(form_data, self.user)
+
+        # 作成したステップから詰めるため、ステップテーブルを読み直さない
+        self.assertFalse([
+            query for query in queries
+            if query['sql'].startswith('SELECT') and 'recipes_presetrecipestep' in query['sql']
+        ])
 
         # ステップが正しく作成されたかチェック
         steps = PresetRecipeStep.objects.filter(recipe=recipe).order_by('step_number')
@@ -804,6 +834,7 @@ class RecipeModelTestCase(TestCase):
         # 総湯量が更新されたかチェック
         recipe.refresh_from_db()
         self.assertEqual(recipe.water_ml, 100.0)  # 最後のステップの湯量
+        self.assertEqual(recipe.steps_packed, [[1, 0, 30, 100.0], [2, 1, 0, 100.0]])
 
     def test_update_from_form_data(self):
         """フォームデータからレシピを更新するテスト"""
@@ -1014,9 +1045,9 @@ class SharedRecipeModelTestCase(TestCase):
         step_numbers = [step.step_number for step in steps]
         self.assertEqual(step_numbers, [1, 2, 3])
 
-    def test_create_steps_from_recipe_data(self):
+    def test_save_with_steps_from_recipe_data(self):
         """レシピデータからステップを作成するテスト（累積湯量をそのまま保存）"""
-        shared_recipe = SharedRecipe.objects.create(
+        shared_recipe = SharedRecipe(
             name='共有テストレシピ',
             created_by=self.user,
             is_ice=False,
@@ -1044,7 +1075,7 @@ class SharedRecipeModelTestCase(TestCase):
             ]
         }
 
-        shared_recipe.create_steps_from_recipe_data(recipe_data)
+        shared_recipe.save_with_steps(shared_recipe.build_steps_from_recipe_data(recipe_data))
 
         # ステップが正しく作成されたかチェック
         steps = SharedRecipeStep.objects.filter(recipe=shared_recipe).order_by('step_number')
@@ -1064,9 +1095,9 @@ class SharedRecipeModelTestCase(TestCase):
         self.assertEqual(step2.seconds, 0)
         self.assertEqual(step2.total_water_ml_this_step, 200.0)
 
-    def test_create_steps_from_form_data(self):
+    def test_save_with_steps_from_form_data(self):
         """フォームデータから共有レシピステップを作成するテスト（累積湯量をそのまま保存）"""
-        shared_recipe = SharedRecipe.objects.create(
+        shared_recipe = SharedRecipe(
             name='共有テストレシピ',
             created_by=self.user,
             is_ice=False,
@@ -1089,7 +1120,8 @@ class SharedRecipeModelTestCase(TestCase):
             'step3_water': '300.0',  # 3投目の累積湯量
         }
 
-        shared_recipe.create_steps_from_form_data(form_data)
+        steps, _ = shared_recipe.build_steps_from_form_data(form_data)
+        shared_recipe.save_with_steps(steps)
 
         # ステップが正しく作成されたかチェック
         steps = SharedRecipeStep.objects.filter(recipe=shared_recipe).order_by('step_number')
@@ -1816,6 +1848,10 @@ class RecipeAPITestCase(TestCase):
 class LandingPageTestCase(TestCase):
     """ランディングページのテスト"""
 
+    def setUp(self):
+        # キャッシュされたレスポンスをテスト間で持ち越さない
+        cache.clear()
+
     def test_landing_page_returns_200(self):
         """LPが正常に表示されること"""
         response = self.client.get(reverse('landing_page'))
@@ -1831,3 +1867,976 @@ class LandingPageTestCase(TestCase):
         response = self.client.get(reverse('landing_page'))
         self.assertContains(response, '今すぐ試す')
         self.assertContains(response, reverse('home'))
+
+
+class IndexPresetButtonTestCase(BaseTestCase):
+    """トップページのプリセットボタンのテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+        self.default_recipe = create_test_recipe(self.default_preset_user, name='デフォルト1')
+        self.user_recipe = create_test_recipe(self.user, name='ユーザー1', len_steps=3)
+
+    def test_index_renders_buttons_from_id_and_name(self):
+        """ボタンがidとnameだけで描画されることをテスト"""
+        login_test_user(self, user=self.user)
+
+        response = self.client.get(reverse('home'))
+
+        self.assertContains(response, f'<button id="{self.default_recipe.id}" class="preset-button">デフォルト1</button>')
+        self.assertContains(response, f'id="{self.user_recipe.id}" class="preset-button users-preset-button">ユーザー1</button>')
+        self.assertEqual(response.context['user_preset_recipes'], [{'id': self.user_recipe.id, 'name': 'ユーザー1'}])
+
+    def test_get_preset_button_data_uses_single_narrow_query(self):
+        """デフォルトプリセットがキャッシュ済みなら、ユーザーのプリセットを1回のクエリで取得することをテスト"""
+        PresetRecipe.default_presets_data()
+
+        with CaptureQueriesContext(connection) as context:
+            user_buttons, default_buttons = PresetRecipe.get_preset_button_data(self.user)
+
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('steps_packed', context.captured_queries[0]['sql'])
+        self.assertNotIn('presetrecipestep', context.captured_queries[0]['sql'])
+        self.assertEqual(user_buttons, [{'id': self.user_recipe.id, 'name': 'ユーザー1'}])
+        self.assertEqual(default_buttons, [{'id': self.default_recipe.id, 'name': 'デフォルト1'}])
+
+
+class RecipeSerializationTestCase(BaseTestCase):
+    """レシピ一括シリアライズのテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+
+    def test_serialize_recipes_matches_to_dict(self):
+        """serialize_recipesがto_dictと同じ辞書を返すことをテスト"""
+        create_test_recipe(self.user, name='レシピ1', len_steps=3)
+        create_test_recipe(self.user, name='レシピ2', len_steps=2, is_ice=True)
+        create_test_shared_recipe(self.user, len_steps=4)
+
+        preset_recipes = PresetRecipe.objects.filter(created_by=self.user)
+        self.assertEqual(
+            PresetRecipe.objects.serialize_recipes(preset_recipes),
+            [recipe.to_dict() for recipe in preset_recipes]
+        )
+
+        shared_recipes = SharedRecipe.objects.filter(created_by=self.user)
+        self.assertEqual(
+            SharedRecipe.objects.serialize_recipes(shared_recipes),
+            [recipe.to_dict() for recipe in shared_recipes]
+        )
+
+    def test_serialize_recipes_empty(self):
+        """空のリストを渡した場合は空のリストを返すことをテスト"""
+        self.assertEqual(PresetRecipe.objects.serialize_recipes([]), [])
+
+    def test_serialize_recipes_query_count_is_constant(self):
+        """レシピ数に関わらずクエリ数が一定であることをテスト"""
+        create_test_recipe(self.user, name='レシピ1')
+
+        def serialize():
+            PresetRecipe.objects.serialize_recipes(PresetRecipe.objects.filter(created_by=self.user))
+
+        self.assertEqual(count_queries(serialize), 2)
+
+        for i in range(4):
+            create_test_recipe(self.user, name=f'追加レシピ{i+1}', len_steps=5)
+
+        self.assertEqual(count_queries(serialize), 2)
+
+    def test_index_query_count_is_constant_regardless_of_preset_count(self):
+        """トップページのクエリ数がプリセット数に依存しないことをテスト"""
+        create_test_recipe(self.default_preset_user, name='デフォルト1')
+        login_test_user(self, user=self.user)
+        create_test_recipe(self.user, name='ユーザー1')
+
+        def load_pages():
+            self.client.get(reverse('home'))
+            self.client.get(reverse('recipes:get_preset_recipes'))
+
+        baseline = count_queries(load_pages)
+
+        for i in range(2):
+            create_test_recipe(self.default_preset_user, name=f'デフォルト追加{i+1}', len_steps=4)
+        for i in range(3):
+            create_test_recipe(self.user, name=f'ユーザー追加{i+1}', len_steps=4)
+
+        self.assertEqual(count_queries(load_pages), baseline)
+
+
+class RecipeStepPourAmountTestCase(TestCase):
+    """ステップの注湯量計算のテスト"""
+
+    def setUp(self):
+        self.user = create_test_user()
+        self.recipe = PresetRecipe.objects.create(
+            name='注湯量テスト',
+            created_by=self.user,
+            len_steps=3,
+            bean_g=15.0,
+            water_ml=225.0
+        )
+        for step_number, total in enumerate([45.0, 120.0, 225.0], start=1):
+            PresetRecipeStep.objects.create(
+                recipe=self.recipe,
+                step_number=step_number,
+                minute=step_number - 1,
+                seconds=0,
+                total_water_ml_this_step=total
+            )
+        create_test_recipe(self.user, name='別レシピ', len_steps=3)
+
+    def test_with_pour_amounts_pins_pour_per_step(self):
+        """3ステップのレシピで、各ステップの注湯量が前のステップとの差になることをテスト"""
+        pours = PresetRecipeStep.objects.filter(recipe=self.recipe).with_pour_amounts().values_list(
+            'step_number', 'annotated_pour_ml_this_step'
+        )
+
+        self.assertEqual(list(pours), [(1, 45.0), (2, 75.0), (3, 105.0)])
+
+    def test_with_pour_amounts_annotates_in_single_query(self):
+        """with_pour_amountsが1クエリで注湯量を付与することをテスト"""
+        with self.assertNumQueries(1):
+            steps = list(PresetRecipeStep.objects.filter(recipe=self.recipe).with_pour_amounts())
+            pours = [step.pour_ml_this_step for step in steps]
+
+        self.assertEqual(pours, [45.0, 75.0, 105.0])
+
+    def test_with_pour_amounts_partitions_by_recipe(self):
+        """複数レシピをまとめて取得してもレシピごとに計算されることをテスト"""
+        steps = PresetRecipeStep.objects.with_pour_amounts().order_by('recipe_id', 'step_number')
+        previous = None
+        for step in steps:
+            if step.step_number == 1:
+                self.assertAlmostEqual(step.pour_ml_this_step, step.total_water_ml_this_step)
+            else:
+                self.assertEqual(previous.recipe_id, step.recipe_id)
+                self.assertAlmostEqual(
+                    step.pour_ml_this_step, step.total_water_ml_this_step - previous.total_water_ml_this_step
+                )
+            previous = step
+
+    def test_properties_fall_back_to_prefetched_steps(self):
+        """アノテーションがない場合はprefetch済みのステップから計算することをテスト"""
+        recipe = PresetRecipe.objects.prefetch_related('steps').get(id=self.recipe.id)
+        with self.assertNumQueries(0):
+            steps = list(recipe.steps.all())
+            for step in steps:
+                step.recipe = recipe
+            pours = [step.pour_ml_this_step for step in steps]
+
+        self.assertEqual(pours, [45.0, 75.0, 105.0])
+
+
+class DefaultPresetsCacheTestCase(BaseTestCase):
+    """デフォルトプリセットのプロセス内キャッシュのテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.default_recipe = create_test_recipe(self.default_preset_user, name='デフォルト1')
+
+    def test_anonymous_index_uses_no_queries_when_cached(self):
+        """キャッシュ済みなら匿名ユーザーのトップページはDBにアクセスしないことをテスト"""
+        self.client.get(reverse('home'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'デフォルト1')
+
+    def test_default_presets_data_matches_serialized_queryset(self):
+        """キャッシュされたデータがシリアライズ結果と一致することをテスト"""
+        self.assertEqual(
+            PresetRecipe.default_presets_data(),
+            PresetRecipe.objects.serialize_recipes(PresetRecipe.default_presets())
+        )
+
+    def test_cache_invalidated_on_recipe_save_and_delete(self):
+        """デフォルトプリセットの保存・削除でキャッシュが無効化されることをテスト"""
+        PresetRecipe.default_presets_data()
+
+        new_recipe = create_test_recipe(self.default_preset_user, name='デフォルト2')
+        names = [recipe['name'] for recipe in PresetRecipe.default_presets_data()]
+        self.assertIn('デフォルト2', names)
+
+        new_recipe.delete()
+        names = [recipe['name'] for recipe in PresetRecipe.default_presets_data()]
+        self.assertNotIn('デフォルト2', names)
+
+    def test_recipe_and_step_saves_do_not_query_users(self):
+        """レシピ・ステップの保存時に所有ユーザーの判定でUserテーブルを読まないことをテスト"""
+        PresetRecipe.default_presets_data()
+        step = PresetRecipeStep.objects.select_related('recipe').filter(recipe=self.default_recipe).first()
+
+        with CaptureQueriesContext(connection) as context:
+            self.default_recipe.save()
+            step.save()
+        self.assertFalse([query for query in context.captured_queries if query['sql'].startswith('SELECT')])
+
+    def test_cache_invalidated_on_step_change(self):
+        """デフォルトプリセットのステップ変更でキャッシュが無効化されることをテスト"""
+        PresetRecipe.default_presets_data()
+
+        step = PresetRecipeStep.objects.filter(recipe=self.default_recipe).first()
+        step.total_water_ml_this_step = 999.0
+        step.save()
+
+        steps = PresetRecipe.default_presets_data()[0]['steps']
+        self.assertIn(999.0, [s['total_water_ml_this_step'] for s in steps])
+
+    def test_cache_invalidated_by_shared_version_key(self):
+        """共有バージョンキーが更新されたら他ワーカーのキャッシュも再構築されることをテスト"""
+        PresetRecipe.default_presets_data()
+
+        # 別ワーカーでの無効化を模擬（プロセス内キャッシュは残したまま共有キーのみ更新）
+        PresetRecipe.objects.filter(pk=self.default_recipe.pk).update(name='更新後')
+        cached = PresetRecipe._default_presets_cache
+        PresetRecipe.invalidate_default_presets_cache()
+        PresetRecipe._default_presets_cache = cached
+
+        self.assertEqual(PresetRecipe.default_presets_data()[0]['name'], '更新後')
+
+    def test_user_preset_change_does_not_invalidate(self):
+        """一般ユーザーのプリセット変更ではキャッシュが無効化されないことをテスト"""
+        PresetRecipe.default_presets_data()
+        user = create_test_user(username='other', email='other@example.com')
+        cached = PresetRecipe._default_presets_cache
+
+        create_test_recipe(user, name='ユーザーレシピ')
+
+        self.assertIs(PresetRecipe._default_presets_cache, cached)
+
+
+class PresetPayloadCacheTestCase(BaseTestCase):
+    """プリセット一覧APIのエンコード済みレスポンスキャッシュのテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+        self.recipe = create_test_recipe(self.user, name='ユーザー1')
+        create_test_recipe(self.default_preset_user, name='デフォルト1')
+        login_test_user(self, user=self.user)
+
+    def get_recipe_queries(self):
+        """プリセット一覧APIが発行したレシピテーブルへのクエリを返す"""
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('recipes:get_preset_recipes'))
+        return [q['sql'] for q in context.captured_queries if 'recipes_' in q['sql']]
+
+    def get_user_recipe_names(self):
+        response = self.client.get(reverse('recipes:get_preset_recipes'))
+        return [recipe['name'] for recipe in response.json()['user_preset_recipes']]
+
+    def test_response_matches_serialized_data(self):
+        """キャッシュされたレスポンスがシリアライズ結果と一致することをテスト"""
+        self.client.get(reverse('recipes:get_preset_recipes'))
+        response = self.client.get(reverse('recipes:get_preset_recipes'))
+
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json(), {
+            'user_preset_recipes': PresetRecipe.objects.serialize_recipes(PresetRecipe.objects.filter(created_by=self.user)),
+            'default_preset_recipes': PresetRecipe.default_presets_data(),
+        })
+
+    def test_serves_precompressed_gzip(self):
+        """gzipを受け付けるクライアントには圧縮済みのレスポンスを返すことをテスト"""
+        response = self.client.get(reverse('recipes:get_preset_recipes'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        names = [recipe['name'] for recipe in json.loads(gzip.decompress(response.content))['user_preset_recipes']]
+        self.assertEqual(names, ['ユーザー1'])
+
+    def test_cache_hit_skips_recipe_queries(self):
+        """キャッシュヒット時はレシピテーブルにアクセスしないことをテスト"""
+        self.assertTrue(self.get_recipe_queries())
+        self.assertEqual(self.get_recipe_queries(), [])
+
+    def test_cache_invalidated_on_recipe_save_and_delete(self):
+        """プリセットの作成・更新・削除でキャッシュが無効化されることをテスト"""
+        self.get_user_recipe_names()
+
+        new_recipe = create_test_recipe(self.user, name='ユーザー2')
+        self.assertIn('ユーザー2', self.get_user_recipe_names())
+
+        new_recipe.name = '変更後'
+        new_recipe.save()
+        self.assertIn('変更後', self.get_user_recipe_names())
+
+        new_recipe.delete()
+        self.assertEqual(self.get_user_recipe_names(), ['ユーザー1'])
+
+    def test_cache_invalidated_on_step_change(self):
+        """ステップの変更でキャッシュが無効化されることをテスト"""
+        self.client.get(reverse('recipes:get_preset_recipes'))
+
+        step = PresetRecipeStep.objects.filter(recipe=self.recipe).first()
+        step.total_water_ml_this_step = 999.0
+        step.save()
+
+        response = self.client.get(reverse('recipes:get_preset_recipes'))
+        steps = response.json()['user_preset_recipes'][0]['steps']
+        self.assertIn(999.0, [s['total_water_ml_this_step'] for s in steps])
+
+    def test_cache_invalidated_on_copy_to_preset(self):
+        """共有レシピのコピーでキャッシュが無効化されることをテスト"""
+        self.get_user_recipe_names()
+        shared_recipe = create_test_shared_recipe(self.user, name='共有レシピ')
+
+        SharedRecipe.copy_to_preset(shared_recipe.to_dict(), self.user)
+
+        self.assertIn('共有レシピ', self.get_user_recipe_names())
+
+    def test_other_user_change_does_not_invalidate(self):
+        """他ユーザーのプリセット変更ではキャッシュが無効化されないことをテスト"""
+        self.client.get(reverse('recipes:get_preset_recipes'))
+        other_user = create_test_user(username='other', email='other@example.com')
+
+        create_test_recipe(other_user, name='他ユーザー')
+
+        self.assertEqual(self.get_recipe_queries(), [])
+
+    def test_default_preset_change_invalidates(self):
+        """デフォルトプリセットの変更でキャッシュが無効化されることをテスト"""
+        self.client.get(reverse('recipes:get_preset_recipes'))
+
+        create_test_recipe(self.default_preset_user, name='デフォルト2')
+
+        response = self.client.get(reverse('recipes:get_preset_recipes'))
+        names = [recipe['name'] for recipe in response.json()['default_preset_recipes']]
+        self.assertIn('デフォルト2', names)
+
+
+class SharedRecipeTokenCacheTestCase(BaseTestCase):
+    """共有レシピのトークンキャッシュのテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+        self.shared_recipe = create_test_shared_recipe(self.user, name='共有レシピ')
+        self.url = reverse('recipes:retrieve_shared_recipe', args=[self.shared_recipe.access_token])
+
+    def test_cache_hit_uses_no_queries(self):
+        """キャッシュ済みの共有レシピはDBにアクセスせずに返すことをテスト"""
+        self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+            self.client.get(reverse('recipes:shared_recipe_ogp', args=[self.shared_recipe.access_token]))
+        self.assertEqual(response.json()['name'], '共有レシピ')
+        self.assertEqual(len(response.json()['steps']), 2)
+
+    def test_not_found_is_cached(self):
+        """存在しないトークンも短時間キャッシュされることをテスト"""
+        url = reverse('recipes:retrieve_shared_recipe', args=['unknown_token'])
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_not_found_skips_add_to_preset_query(self):
+        """存在しないトークンへのマイプリセット追加はキャッシュで弾かれることをテスト"""
+        login_test_user(self, user=self.user)
+        url = reverse('recipes:add_shared_recipe_to_preset', args=['unknown_token'])
+        self.client.post(url)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse([q for q in context.captured_queries if 'recipes_sharedrecipe' in q['sql']])
+
+    def test_cache_invalidated_on_update_with_steps(self):
+        """update_with_stepsで編集するとキャッシュが無効化されることをテスト"""
+        self.client.get(self.url)
+
+        self.shared_recipe.update_with_steps(create_form_data(name='編集後', len_steps=3))
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['name'], '編集後')
+
+    def test_cache_invalidated_on_delete_with_image(self):
+        """delete_with_imageで削除するとキャッシュが無効化されることをテスト"""
+        self.client.get(self.url)
+
+        SharedRecipe.delete_with_image(self.shared_recipe)
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_waits_for_concurrent_rebuild(self):
+        """他のリクエストが再構築中なら、DBを読まずにその結果を待つことをテスト"""
+        token = self.shared_recipe.access_token
+        cache_key = SharedRecipe.token_cache_key(token)
+        cache.delete(cache_key)
+        cache.add(lock_key(cache_key), 1)
+
+        def finish_rebuild(seconds):
+            set_cached(cache_key, ({'name': '他のリクエストが構築'}, timezone.now()), 60)
+
+        with patch('Co_fitting.utils.cache_utils.time.sleep', side_effect=finish_rebuild), self.assertNumQueries(0):
+            data = SharedRecipe.get_cached_data_by_token(token)
+        self.assertEqual(data['name'], '他のリクエストが構築')
+
+    def test_reads_database_when_rebuild_times_out(self):
+        """再構築の完了を待ちきれない場合はDBから読むことをテスト"""
+        token = self.shared_recipe.access_token
+        cache_key = SharedRecipe.token_cache_key(token)
+        cache.delete(cache_key)
+        cache.add(lock_key(cache_key), 1)
+
+        with patch('Co_fitting.utils.cache_utils.time.sleep'):
+            data = SharedRecipe.get_cached_data_by_token(token)
+        self.assertEqual(data['name'], '共有レシピ')
+        cache.delete(lock_key(cache_key))
+
+
+class ConditionalGetTestCase(BaseTestCase):
+    """ETag / Last-Modified による条件付きGETのテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+        self.shared_recipe = create_test_shared_recipe(self.user, name='共有レシピ')
+        self.url = reverse('recipes:retrieve_shared_recipe', args=[self.shared_recipe.access_token])
+        self.ogp_url = reverse('recipes:shared_recipe_ogp', args=[self.shared_recipe.access_token])
+
+    def test_shared_recipe_returns_validators(self):
+        """共有レシピAPIがETagとLast-Modifiedを返すことをテスト"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith(f'"{self.shared_recipe.access_token}-'))
+        self.assertIn('Last-Modified', response)
+        # 更新日時は検証用にのみ使い、レスポンスの内容には含めない
+        self.assertNotIn('updated_at', response.json())
+
+    def test_if_none_match_returns_304_without_queries(self):
+        """If-None-Matchが一致すれば、DBにアクセスせず304を返すことをテスト"""
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_if_modified_since_returns_304(self):
+        """If-Modified-Sinceが更新日時以降なら304を返すことをテスト"""
+        last_modified = self.client.get(self.ogp_url)['Last-Modified']
+
+        response = self.client.get(self.ogp_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_after_update(self):
+        """共有レシピを編集するとETagが変わり、古いETagでは200を返すことをテスト"""
+        etag = self.client.get(self.url)['ETag']
+
+        self.shared_recipe.update_with_steps(create_form_data(name='編集後'))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['name'], '編集後')
+
+    def test_refresh_steps_packed_advances_updated_at(self):
+        """ステップの再計算で更新日時が進むことをテスト"""
+        updated_at = self.shared_recipe.updated_at
+
+        self.shared_recipe.refresh_steps_packed()
+
+        self.shared_recipe.refresh_from_db()
+        self.assertGreater(self.shared_recipe.updated_at, updated_at)
+
+    def test_not_found_has_no_etag(self):
+        """存在しないトークンにはETagを付けないことをテスト"""
+        response = self.client.get(reverse('recipes:retrieve_shared_recipe', args=['unknown_token']))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+    def test_preset_recipes_if_none_match(self):
+        """プリセット一覧APIがバージョンのETagで304を返し、変更後は200を返すことをテスト"""
+        login_test_user(self, user=self.user)
+        url = reverse('recipes:get_preset_recipes')
+        etag = self.client.get(url)['ETag']
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        create_test_recipe(self.user, name='追加レシピ')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_preset_recipes_gzip_has_own_etag(self):
+        """gzip圧縮したレスポンスは非圧縮と別のETagを持ち、304にもVary: Accept-Encodingが付くことをテスト"""
+        url = reverse('recipes:get_preset_recipes')
+        identity_etag = self.client.get(url)['ETag']
+        gzip_response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(gzip_response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip_response['ETag'], identity_etag[:-1] + '-gz"')
+
+        # 非圧縮のETagでgzipを要求した場合は、別の表現なので304にしない
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=identity_etag).status_code, 200)
+
+        not_modified = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=gzip_response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('Accept-Encoding', not_modified['Vary'])
+
+
+class RecipeBulkWriteTestCase(BaseTestCase):
+    """レシピ保存時のDB往復回数のテスト（ステップ数に依存しないこと）"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+
+    def test_share_round_trips_are_constant(self):
+        """共有レシピ作成の往復回数がステップ数に依存しないことをテスト"""
+        counts = [
+            count_queries(lambda: SharedRecipe.create_shared_recipe_from_data(
+                create_recipe_data(len_steps=len_steps), self.user
+            ))
+            for len_steps in (1, 20)
+        ]
+        self.assertEqual(counts[0], counts[1])
+
+    def test_copy_to_preset_round_trips_are_constant(self):
+        """共有レシピのプリセット複製の往復回数がステップ数に依存しないことをテスト"""
+        short_recipe = create_test_shared_recipe(self.user, len_steps=1)
+        long_recipe = create_test_shared_recipe(self.user, len_steps=20)
+
+        # デフォルトプリセット所有ユーザーのIDはキャッシュされるため、先に読み込んでおく
+        PresetRecipe.default_preset_owner_id()
+        counts = []
+        for shared_recipe in (short_recipe, long_recipe):
+            shared_recipe_data = shared_recipe.to_dict()
+            counts.append(count_queries(lambda: SharedRecipe.copy_to_preset(shared_recipe_data, self.user)))
+            PresetRecipe.objects.filter(created_by=self.user).delete()
+
+        self.assertEqual(counts[0], counts[1])
+        copied = SharedRecipe.copy_to_preset(long_recipe.to_dict(), self.user)[0]
+        self.assertEqual(copied.steps.count(), 20)
+
+    def test_create_with_user_and_steps_saves_recipe_once(self):
+        """プリセット作成時にレシピのINSERTが1回だけでwater_mlが設定されることをテスト"""
+        recipe = PresetRecipe(name='一括作成', len_steps=3, bean_g=15.0)
+        form_data = {
+            'step1_minute': '0', 'step1_second': '10', 'step1_water': '50',
+            'step2_minute': '0', 'step2_second': '40', 'step2_water': '120',
+            'step3_minute': '1', 'step3_second': '10', 'step3_water': '210',
+        }
+
+        with CaptureQueriesContext(connection) as context:
+            recipe.create_with_user_and_steps(form_data, self.user)
+        recipe_writes = [
+            query['sql'] for query in context.captured_queries
+            if 'recipes_presetrecipe"' in query['sql'] and query['sql'].startswith(('INSERT', 'UPDATE'))
+        ]
+
+        self.assertEqual(len(recipe_writes), 1)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.water_ml, 210.0)
+        self.assertEqual(recipe.steps.count(), 3)
+
+
+class RecipeStepSyncTestCase(BaseTestCase):
+    """update_with_stepsのステップ差分更新のテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+        self.recipe = PresetRecipe(name='差分更新', len_steps=3, bean_g=15.0, memo='元のメモ')
+        self.form_data = {
+            'name': '差分更新',
+            'len_steps': '3',
+            'bean_g': '15.0',
+            'memo': '元のメモ',
+            'step1_minute': '0', 'step1_second': '10', 'step1_water': '50',
+            'step2_minute': '0', 'step2_second': '40', 'step2_water': '120',
+            'step3_minute': '1', 'step3_second': '10', 'step3_water': '210',
+        }
+        self.recipe.create_with_user_and_steps(self.form_data, self.user)
+        self.step_ids = list(self.recipe.steps.values_list('id', flat=True))
+
+    def _step_writes(self, form_data):
+        """update_with_stepsで発行されたステップテーブルへの書き込みSQLを返す"""
+        with CaptureQueriesContext(connection) as context:
+            self.recipe.update_with_steps(form_data)
+        return [
+            query['sql'] for query in context.captured_queries
+            if 'recipes_presetrecipestep' in query['sql']
+            and query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+
+    def test_memo_only_change_issues_no_step_writes(self):
+        """メモのみの変更ではステップへの書き込みが発生しないことをテスト"""
+        form_data = dict(self.form_data, memo='新しいメモ')
+
+        self.assertEqual(self._step_writes(form_data), [])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.memo, '新しいメモ')
+        self.assertEqual(list(self.recipe.steps.values_list('id', flat=True)), self.step_ids)
+
+    def test_changed_step_is_updated_in_place(self):
+        """変更されたステップのみが既存の行のまま更新されることをテスト"""
+        form_data = dict(self.form_data, step2_water='130', step3_water='220')
+
+        writes = self._step_writes(form_data)
+
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE'))
+        self.assertEqual(list(self.recipe.steps.values_list('id', flat=True)), self.step_ids)
+        self.assertEqual(
+            list(self.recipe.steps.values_list('total_water_ml_this_step', flat=True)),
+            [50.0, 130.0, 220.0]
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.water_ml, 220.0)
+
+    def test_removed_trailing_steps_are_deleted_at_once(self):
+        """末尾のステップを減らした場合は1回のDELETEで削除されることをテスト"""
+        form_data = dict(self.form_data, len_steps='1')
+
+        writes = self._step_writes(form_data)
+
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('DELETE'))
+        self.assertEqual(list(self.recipe.steps.values_list('id', flat=True)), self.step_ids[:1])
+
+    def test_added_steps_are_bulk_created(self):
+        """ステップを増やした場合は追加分のみがまとめて作成されることをテスト"""
+        form_data = dict(
+            self.form_data, len_steps='5',
+            step4_minute='1', step4_second='40', step4_water='260',
+            step5_minute='2', step5_second='10', step5_water='300',
+        )
+
+        writes = self._step_writes(form_data)
+
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('INSERT'))
+        self.assertEqual(list(self.recipe.steps.values_list('id', flat=True))[:3], self.step_ids)
+        self.assertEqual(self.recipe.steps.count(), 5)
+
+
+class RecipeStepsPackedTestCase(BaseTestCase):
+    """steps_packed（ステップの非正規化コピー）のテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+        self.form_data = {
+            'name': 'パックテスト', 'len_steps': '3', 'bean_g': '15.0',
+            'step1_minute': '0', 'step1_second': '10', 'step1_water': '50',
+            'step2_minute': '0', 'step2_second': '40', 'step2_water': '120',
+            'step3_minute': '1', 'step3_second': '10', 'step3_water': '210',
+        }
+
+    def _create_recipe(self):
+        recipe = PresetRecipe(name='パックテスト', len_steps=3, bean_g=15.0)
+        return recipe.create_with_user_and_steps(self.form_data, self.user)
+
+    def test_write_paths_keep_steps_packed_in_sync(self):
+        """作成・更新・共有・複製の各経路でsteps_packedが同期されることをテスト"""
+        recipe = self._create_recipe()
+        self.assertEqual(recipe.steps_packed, recipe.pack_steps(recipe.steps.all()))
+
+        self.form_data.update({'len_steps': '2', 'step2_water': '150'})
+        recipe.update_with_steps(self.form_data)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.steps_packed, recipe.pack_steps(recipe.steps.all()))
+
+        shared_recipe = SharedRecipe.create_shared_recipe_from_data(create_recipe_data(len_steps=4), self.user)
+        shared_recipe.refresh_from_db()
+        self.assertEqual(shared_recipe.steps_packed, shared_recipe.pack_steps(shared_recipe.steps.all()))
+
+        copied, _ = SharedRecipe.copy_to_preset(shared_recipe.to_dict(), self.user)
+        copied.refresh_from_db()
+        self.assertEqual(copied.steps_packed, shared_recipe.steps_packed)
+
+    def test_to_dict_reads_single_row(self):
+        """steps_packedがある場合はステップテーブルを読まずに同じ辞書を返すことをテスト"""
+        recipe = self._create_recipe()
+        expected = PresetRecipe.objects.prefetch_related('steps').get(pk=recipe.pk).to_dict()
+
+        recipe = PresetRecipe.objects.get(pk=recipe.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(recipe.to_dict(), expected)
+
+    def test_direct_step_writes_discard_steps_packed(self):
+        """ステップを直接保存・削除するとsteps_packedを破棄し、ステップテーブルから組み立てることをテスト"""
+        recipe = self._create_recipe()
+        self.assertIsNotNone(recipe.steps_packed)
+
+        step = PresetRecipeStep.objects.get(recipe=recipe, step_number=2)
+        step.total_water_ml_this_step = 130.0
+        step.save()
+        PresetRecipeStep.objects.get(recipe=recipe, step_number=3).delete()
+
+        recipe = PresetRecipe.objects.get(pk=recipe.pk)
+        self.assertIsNone(recipe.steps_packed)
+        self.assertEqual(
+            [step['total_water_ml_this_step'] for step in recipe.to_dict()['steps']], [50.0, 130.0]
+        )
+
+    def test_verify_command_detects_and_fixes_mismatch(self):
+        """検証コマンドが不一致を検出し、--fixで修復することをテスト"""
+        recipe = self._create_recipe()
+        PresetRecipeStep.objects.filter(recipe=recipe, step_number=3).update(total_water_ml_this_step=999.0)
+
+        output = StringIO()
+        call_command('verify_steps_packed', stdout=output)
+        self.assertIn(f'PresetRecipe id={recipe.id}', output.getvalue())
+
+        call_command('verify_steps_packed', '--fix', stdout=StringIO())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.steps_packed[-1][3], 999.0)
+
+        output = StringIO()
+        call_command('verify_steps_packed', stdout=output)
+        self.assertIn('一致しています', output.getvalue())
+
+
+class RecipeQueryPlanTestCase(BaseTestCase):
+    """ホットパスのクエリが想定したインデックスを使うことのテスト（EXPLAINで検証）"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+        # 複数ユーザー分のデータを投入し、統計情報を更新する
+        for i in range(10):
+            user = create_test_user(username=f'seed{i}', email=f'seed{i}@example.com')
+            for _ in range(5):
+                create_test_shared_recipe(user, len_steps=5)
+                create_test_recipe(user, len_steps=5)
+        for _ in range(3):
+            create_test_shared_recipe(self.user, len_steps=5)
+        analyze_tables('recipes_sharedrecipe', 'recipes_presetrecipestep', 'recipes_sharedrecipestep')
+
+    def test_user_shared_recipes_listing_uses_owner_created_index(self):
+        """共有レシピ一覧取得が(created_by, created_at)インデックスを使うことをテスト"""
+        assert_queries_use_index(
+            self, lambda: SharedRecipe.get_user_shared_recipes_data(self.user),
+            'recipes_sharedrecipe', 'shared_created_by_at_idx'
+        )
+
+    def test_owner_count_uses_owner_created_index(self):
+        """ユーザーごとの共有レシピ件数取得が(created_by, created_at)インデックスを使うことをテスト"""
+        assert_queries_use_index(
+            self, lambda: SharedRecipe.objects.filter(created_by=self.user).count(),
+            'recipes_sharedrecipe', 'shared_created_by_at_idx'
+        )
+
+    def test_step_lookup_uses_unique_step_number_index(self):
+        """(recipe, step_number)でのステップ取得が一意制約のインデックスを使うことをテスト"""
+        preset_recipe = PresetRecipe.objects.filter(created_by__username='seed0').first()
+        shared_recipe = SharedRecipe.objects.filter(created_by=self.user).first()
+
+        assert_queries_use_index(
+            self, lambda: PresetRecipeStep.objects.filter(recipe=preset_recipe, step_number=3).first(),
+            'recipes_presetrecipestep', 'uniq_preset_step_number'
+        )
+        assert_queries_use_index(
+            self, lambda: SharedRecipeStep.objects.filter(recipe=shared_recipe, step_number=3).first(),
+            'recipes_sharedrecipestep', 'uniq_shared_step_number'
+        )
+
+
+class RecipeQuotaCounterTestCase(BaseTestCase):
+    """プリセット数・共有レシピ数カウンタのテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+
+    def _counts(self):
+        return User.objects.get_quota_counts(self.user)
+
+    def test_counters_follow_create_and_delete(self):
+        """レシピの作成・削除に合わせてカウンタが増減することをテスト"""
+        recipe = create_test_recipe(self.user)
+        shared_recipe = create_test_shared_recipe(self.user)
+        self.assertEqual(self._counts(), {'preset_count': 1, 'shared_recipe_count': 1})
+
+        recipe.delete()
+        SharedRecipe.delete_with_image(shared_recipe)
+        self.assertEqual(self._counts(), {'preset_count': 0, 'shared_recipe_count': 0})
+
+    def test_limit_check_reads_counter_without_scanning(self):
+        """上限チェックがレシピテーブルを数えずにカウンタを読むことをテスト"""
+        for i in range(self.user.preset_limit_value):
+            create_test_recipe(self.user, name=f'レシピ{i+1}')
+
+        with CaptureQueriesContext(connection) as context:
+            error_response = PresetRecipe.check_preset_limit_or_error(self.user)
+
+        self.assertIsNotNone(error_response)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('recipes_presetrecipe', context.captured_queries[0]['sql'])
+
+    def test_user_updates_do_not_overwrite_counters(self):
+        """古いユーザーオブジェクトでの有効化・メールアドレス変更でカウンタが上書きされないことをテスト"""
+        stale_user = User.objects.get(pk=self.user.pk)
+        create_test_recipe(self.user)
+
+        User.objects.activate_user(stale_user)
+        User.objects.change_user_email(stale_user, 'changed@example.com')
+
+        self.assertEqual(self._counts()['preset_count'], 1)
+
+    def test_recount_command_repairs_drift(self):
+        """再計算コマンドがレシピテーブルからカウンタを修復することをテスト"""
+        create_test_recipe(self.user)
+        create_test_shared_recipe(self.user)
+        User.objects.filter(pk=self.user.pk).update(preset_count=4, shared_recipe_count=0)
+
+        call_command('recount_recipe_quotas', stdout=StringIO())
+
+        self.assertEqual(self._counts(), {'preset_count': 1, 'shared_recipe_count': 1})
+
+
+class SharedRecipeListingPaginationTestCase(BaseTestCase):
+    """共有レシピ一覧APIのキーセットページネーションのテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_and_login_user()
+        self.url = reverse('recipes:get_user_shared_recipes')
+        self.recipes = [create_test_shared_recipe(self.user, name=f'共有{i}') for i in range(5)]
+        # 作成日時が同じレシピがあってもページ境界で欠落・重複しないようにする
+        SharedRecipe.objects.filter(pk__in=[r.pk for r in self.recipes[1:4]]).update(
+            created_at=self.recipes[0].created_at
+        )
+
+    def _get(self, **params):
+        response = self.client.get(self.url, params)
+        return response.status_code, json.loads(response.content)
+
+    def test_pages_cover_all_recipes_once(self):
+        """limitごとにページを辿ると全件を重複なく新しい順に取得できることをテスト"""
+        tokens = []
+        cursor = None
+        pages = 0
+        while True:
+            params = {'limit': 2}
+            if cursor:
+                params['after'] = cursor
+            status, data = self._get(**params)
+            self.assertEqual(status, 200)
+            self.assertLessEqual(len(data['shared_recipes']), 2)
+            tokens.extend(recipe['access_token'] for recipe in data['shared_recipes'])
+            pages += 1
+            cursor = data['next']
+            if cursor is None:
+                break
+
+        self.assertEqual(pages, 3)
+        expected = SharedRecipe.objects.filter(created_by=self.user).order_by('-created_at', '-id')
+        self.assertEqual(tokens, [recipe.access_token for recipe in expected])
+
+    def test_fields_projection(self):
+        """fieldsで指定したフィールドのみが返されることをテスト"""
+        status, data = self._get(fields='name,created_at')
+        self.assertEqual(status, 200)
+        self.assertEqual(set(data['shared_recipes'][0]), {'name', 'created_at'})
+        self.assertIsNone(data['next'])
+
+    def test_default_response_keeps_all_fields(self):
+        """パラメータなしの場合は従来通り全フィールドを返すことをテスト"""
+        status, data = self._get()
+        self.assertEqual(status, 200)
+        self.assertEqual(set(data['shared_recipes'][0]), set(SharedRecipe.LISTING_FIELDS))
+        self.assertEqual(len(data['shared_recipes']), 5)
+
+    def test_invalid_parameters(self):
+        """不正なパラメータの場合は400を返すことをテスト"""
+        for params in ({'limit': 0}, {'limit': 'abc'}, {'limit': 1000}, {'fields': 'password'}, {'after': 'invalid'},
+                       {'after': '2026-01-01T00:00:00.000000,1'}):
+            status, data = self._get(**params)
+            self.assertEqual(status, 400, params)
+            self.assertEqual(data['error'], 'invalid_parameter')
+
+
+@override_settings(ROOT_URLCONF='Co_fitting.tests.async_read_urls')
+class AsyncReadViewTestCase(BaseTestCase):
+    """読み取り専用APIを非同期ビュー（GUNICORN_MODE=asgiの場合）で呼び出した場合のテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+        self.shared_recipe = create_test_shared_recipe(self.user, name='共有レシピ')
+        create_test_recipe(self.user, name='マイレシピ')
+
+    def test_sync_views_by_default(self):
+        """デフォルト（WSGI）のURL設定では読み取り専用APIも同期ビューで処理することをテスト"""
+        for name, args in [
+            ('shared_recipe_ogp', ['token']),
+            ('get_user_shared_recipes', []),
+            ('retrieve_shared_recipe', ['token']),
+            ('get_preset_recipes', []),
+        ]:
+            with self.subTest(name=name):
+                url = reverse(f'recipes:{name}', args=args, urlconf='Co_fitting.urls')
+                self.assertIs(resolve(url, urlconf='Co_fitting.urls').func, getattr(views, name))
+
+    async def test_shared_recipe_ogp_renders(self):
+        """OGPページの非同期版がテンプレートをレンダリングして返すことをテスト"""
+        response = await self.async_client.get(reverse('recipes:shared_recipe_ogp', args=[self.shared_recipe.access_token]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '共有レシピ')
+
+    async def test_retrieve_shared_recipe(self):
+        """共有レシピAPIが同期クライアントと同じデータを返し、ETagで304を返すことをテスト"""
+        url = reverse('recipes:retrieve_shared_recipe', args=[self.shared_recipe.access_token])
+
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], '共有レシピ')
+        self.assertEqual(len(response.json()['steps']), 2)
+
+        response = await self.async_client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_retrieve_unknown_token(self):
+        """存在しないトークンは404を返すことをテスト"""
+        response = await self.async_client.get(reverse('recipes:retrieve_shared_recipe', args=['unknown_token']))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+    async def test_shared_recipe_without_packed_steps(self):
+        """steps_packedを持たない共有レシピもステップを先読みして返すことをテスト"""
+        await SharedRecipe.objects.filter(pk=self.shared_recipe.pk).aupdate(steps_packed=None)
+        url = reverse('recipes:shared_recipe_ogp', args=[self.shared_recipe.access_token])
+
+        response = await self.async_client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        shared_recipe_data = await SharedRecipe.aget_cached_data_by_token(self.shared_recipe.access_token)
+        self.assertEqual(len(shared_recipe_data['steps']), 2)
+
+    async def test_preset_recipes_matches_sync_payload(self):
+        """プリセット一覧APIの非同期版が同期版と同じキャッシュ・内容を使うことをテスト"""
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(reverse('recipes:get_preset_recipes'))
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual([recipe['name'] for recipe in data['user_preset_recipes']], ['マイレシピ'])
+        content, _ = await sync_to_async(PresetRecipe.preset_recipes_payload)(self.user)
+        self.assertEqual(response.content, content)
+        self.assertEqual(response['ETag'], f'"{await PresetRecipe.aget_preset_recipes_etag(self.user)}"')
+
+    async def test_user_shared_recipes_requires_login(self):
+        """共有レシピ一覧APIは未ログインならログインページへリダイレクトし、ログイン後は一覧を返すことをテスト"""
+        url = reverse('recipes:get_user_shared_recipes')
+
+        self.assertEqual((await self.async_client.get(url)).status_code, 302)
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(url, {'fields': 'name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['shared_recipes'], [{'name': '共有レシピ'}])
@@ -1,10 +1,14 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.views.decorators.http import require_POST, require_GET, require_http_methods
+from django.views.decorators.http import require_POST, require_GET, require_http_methods, condition
+from django.views.decorators.vary import vary_on_headers
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.http import Http404
+from django.db import transaction
 from .models import PresetRecipe, PresetRecipeStep, SharedRecipe
 from Co_fitting.utils.response_helper import ResponseHelper
+from Co_fitting.utils.db_router import read_from_replica
+from Co_fitting.utils.page_cache import cache_static_page
 from .forms import RecipeForm, SharedRecipeDataForm
 from django.views.generic import DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -12,6 +16,7 @@ from django.contrib import messages
 import json
 
 
+@cache_static_page
 def landing_page(request):
     """ランディングページの表示"""
     return render(request, 'lp.html')
@@ -19,21 +24,16 @@ def landing_page(request):
 
 def index(request):
     """メインページの表示"""
-    user = request.user
     shared_token = request.GET.get('shared')
 
-    # 匿名ユーザーの場合は空のリストを返す
-    if user.is_anonymous:
-        user_preset_recipes = []
-        default_preset_recipes = PresetRecipe.default_presets()
-    else:
-        user_preset_recipes, default_preset_recipes = PresetRecipe.get_preset_recipes_for_user(user)
+    # ボタン表示に必要なidとnameだけを取得（ステップはクリック時にプリセット一覧APIから取得する）
+    user_preset_recipes, default_preset_recipes = PresetRecipe.get_preset_button_data(request.user)
 
     shared_recipe_data = SharedRecipe.get_shared_recipe_data(shared_token)
 
     params = {
-        'user_preset_recipes': [recipe.to_dict() for recipe in user_preset_recipes],
-        'default_preset_recipes': [recipe.to_dict() for recipe in default_preset_recipes],
+        'user_preset_recipes': user_preset_recipes,
+        'default_preset_recipes': default_preset_recipes,
         'shared_recipe_data': shared_recipe_data
     }
     return render(request, 'index.html', params)
@@ -55,22 +55,24 @@ def mypage(request):
 @login_required
 def preset_create(request):
     if request.method == 'POST':
-        # プリセット上限チェック（Model層で実行）
-        error_response = PresetRecipe.check_preset_limit_or_error(request.user)
-        if error_response:
-            messages.error(request, "エラー：プリセットレシピ上限を超過しています")
-            recipe_form = RecipeForm()
-            return render(request, 'recipes/preset_create.html', {'recipe_form': recipe_form})
-
-        # レシピデータのバリデーション
-        recipe_form = RecipeForm(request.POST)
-        if recipe_form.is_valid():
-            recipe = recipe_form.save(commit=False)
-
-            # Model層のメソッドを使用してレシピとステップを作成
-            recipe.create_with_user_and_steps(request.POST, request.user)
-
-            return redirect('mypage')
+        # 上限チェックと作成を同一トランザクションで行い、同時リクエストによる超過を防ぐ
+        with transaction.atomic():
+            # プリセット上限チェック（Model層で実行）
+            error_response = PresetRecipe.check_preset_limit_or_error(request.user)
+            if error_response:
+                messages.error(request, "エラー：プリセットレシピ上限を超過しています")
+                recipe_form = RecipeForm()
+                return render(request, 'recipes/preset_create.html', {'recipe_form': recipe_form})
+
+            # レシピデータのバリデーション
+            recipe_form = RecipeForm(request.POST)
+            if recipe_form.is_valid():
+                recipe = recipe_form.save(commit=False)
+
+                # Model層のメソッドを使用してレシピとステップを作成
+                recipe.create_with_user_and_steps(request.POST, request.user)
+
+                return redirect('mypage')
     else:
         recipe_form = RecipeForm()
 
@@ -124,23 +126,28 @@ class PresetDeleteView(LoginRequiredMixin, DeleteView):
 def create_shared_recipe(request):
     user = request.user
 
-    # 共有レシピ上限チェック（Model層で実行）
-    error_response = SharedRecipe.check_share_limit_or_error(user)
-    if error_response:
-        return error_response
-
     try:
         recipe_data = json.loads(request.body)
     except json.JSONDecodeError:
-        return ResponseHelper.create_error_response('invalid_json', 'JSONデータの形式が正しくありません。')
+        recipe_data = None
+
+    # 上限チェックと作成を同一トランザクションで行い、同時リクエストによる超過を防ぐ
+    with transaction.atomic():
+        # 共有レシピ上限チェック（Model層で実行）
+        error_response = SharedRecipe.check_share_limit_or_error(user)
+        if error_response:
+            return error_response
 
-    # Form層でデータ検証
-    form = SharedRecipeDataForm(recipe_data)
-    if not form.is_valid():
-        return ResponseHelper.create_validation_error_response(form.errors)
+        if recipe_data is None:
+            return ResponseHelper.create_error_response('invalid_json', 'JSONデータの形式が正しくありません。')
 
-    # 共通関数を使用して共有レシピを作成
-    shared_recipe = SharedRecipe.create_shared_recipe_from_data(recipe_data, user)
+        # Form層でデータ検証
+        form = SharedRecipeDataForm(recipe_data)
+        if not form.is_valid():
+            return ResponseHelper.create_validation_error_response(form.errors)
+
+        # 共通関数を使用して共有レシピを作成
+        shared_recipe = SharedRecipe.create_shared_recipe_from_data(recipe_data, user)
 
     share_url = request.build_absolute_uri(f'/?shared={shared_recipe.access_token}')
     return ResponseHelper.create_success_response(
@@ -160,14 +167,15 @@ def add_shared_recipe_to_preset(request, token):
             'ログインが必要です。マイプリセットに追加するにはログインしてください。'
         )
 
-    shared_recipe, error_response = SharedRecipe.get_shared_recipe_or_error(token)
+    # 存在チェックと複製はキャッシュ済みの辞書データで行い、共有レシピの行は読まない
+    shared_recipe_data, error_response = SharedRecipe.get_shared_recipe_data_or_error(token)
     if error_response:
         return error_response
 
     user = request.user
 
     # 共有レシピをプリセットとして複製（Model層で実行）
-    new_recipe, error_response = SharedRecipe.copy_to_preset(shared_recipe, user)
+    new_recipe, error_response = SharedRecipe.copy_to_preset(shared_recipe_data, user)
     if error_response:
         return error_response
 
@@ -177,8 +185,19 @@ def add_shared_recipe_to_preset(request, token):
     )
 
 
+def shared_recipe_etag(request, token):
+    return SharedRecipe.get_etag_by_token(token)
+
+
+def shared_recipe_last_modified(request, token):
+    return SharedRecipe.get_last_modified_by_token(token)
+
+
+# 読み取り専用のエンドポイントの非同期版は async_views.py にあり、GUNICORN_MODE=asgiの場合のみ使う
+@read_from_replica
+@condition(etag_func=shared_recipe_etag, last_modified_func=shared_recipe_last_modified)
 def shared_recipe_ogp(request, token):
-    shared_recipe = SharedRecipe.get_by_token(token)
+    shared_recipe = SharedRecipe.get_cached_data_by_token(token)
     if not shared_recipe:
         raise Http404("共有レシピが見つかりません。")
     return render(request, 'recipes/shared_recipe_ogp.html', {'shared_recipe': shared_recipe})
@@ -188,7 +207,12 @@ def shared_recipe_ogp(request, token):
 @login_required
 def get_user_shared_recipes(request):
     # ユーザーの共有レシピ一覧データを取得（Model層で実行）
-    return SharedRecipe.get_user_shared_recipes_data(request.user)
+    return SharedRecipe.get_user_shared_recipes_data(
+        request.user,
+        after=request.GET.get('after'),
+        limit=request.GET.get('limit'),
+        fields=request.GET.get('fields'),
+    )
 
 
 @csrf_exempt
@@ -198,16 +222,18 @@ def share_preset_recipe(request, recipe_id):
     try:
         recipe = get_object_or_404(PresetRecipe, id=recipe_id, created_by=request.user)
 
-        # 共有レシピ上限チェック（Model層で実行）
-        error_response = SharedRecipe.check_share_limit_or_error(request.user)
-        if error_response:
-            return error_response
+        # 上限チェックと作成を同一トランザクションで行い、同時リクエストによる超過を防ぐ
+        with transaction.atomic():
+            # 共有レシピ上限チェック（Model層で実行）
+            error_response = SharedRecipe.check_share_limit_or_error(request.user)
+            if error_response:
+                return error_response
 
-        # レシピデータを準備（Model層で実行）
-        recipe_data = recipe.to_dict()
+            # レシピデータを準備（Model層で実行）
+            recipe_data = PresetRecipe.objects.serialize_recipes([recipe])[0]
 
-        # 共通関数を使用して共有レシピを作成
-        shared_recipe = SharedRecipe.create_shared_recipe_from_data(recipe_data, request.user)
+            # 共通関数を使用して共有レシピを作成
+            shared_recipe = SharedRecipe.create_shared_recipe_from_data(recipe_data, request.user)
 
         return ResponseHelper.create_success_response(
             'プリセットを共有しました。',
@@ -257,31 +283,33 @@ def shared_recipe_edit(request, token):
 
 @require_GET
 @csrf_exempt
+@read_from_replica
+@condition(etag_func=shared_recipe_etag, last_modified_func=shared_recipe_last_modified)
 def retrieve_shared_recipe(request, token):
-    shared_recipe, error_response = SharedRecipe.get_shared_recipe_or_error(token)
+    shared_recipe_data, error_response = SharedRecipe.get_shared_recipe_data_or_error(token)
     if error_response:
         return error_response
 
-    # モデルメソッドを使用してレスポンスデータを構築
-    return ResponseHelper.create_data_response(shared_recipe.to_dict())
+    # キャッシュ済みの辞書データをそのまま返す
+    return ResponseHelper.create_data_response(shared_recipe_data)
+
+
+def preset_recipes_etag(request):
+    etag = PresetRecipe.get_preset_recipes_etag(request.user)
+    # gzip圧縮したレスポンスは別の表現なので、強いETagを分ける
+    return f'{etag}-gz' if ResponseHelper.accepts_gzip(request) else etag
 
 
 @require_GET
+@read_from_replica
+# ETagがAccept-Encodingで変わるため、304を含むすべてのレスポンスにVaryを付ける
+@vary_on_headers('Accept-Encoding')
+@condition(etag_func=preset_recipes_etag)
 def get_preset_recipes(request):
     """プリセットレシピデータを取得するAPIエンドポイント"""
     try:
-        user = request.user
-
-        # 匿名ユーザーの場合は空のリストを返す
-        if user.is_anonymous:
-            user_preset_recipes = []
-            default_preset_recipes = PresetRecipe.default_presets()
-        else:
-            user_preset_recipes, default_preset_recipes = PresetRecipe.get_preset_recipes_for_user(user)
-
-        return ResponseHelper.create_data_response({
-            'user_preset_recipes': [recipe.to_dict() for recipe in user_preset_recipes],
-            'default_preset_recipes': [recipe.to_dict() for recipe in default_preset_recipes]
-        })
+        # エンコード・圧縮済みのレスポンスをキャッシュから取得（匿名ユーザーはデフォルトプリセットのみ）
+        content, gzip_content = PresetRecipe.preset_recipes_payload(request.user)
+        return ResponseHelper.create_encoded_data_response(content, gzip_content=gzip_content, request=request)
     except Exception:
         return ResponseHelper.create_server_error_response('プリセットレシピの取得に失敗しました。')
@@ -0,0 +1,65 @@
+"""
+ログインが必要なエンドポイントについて、セッションの保存先ごとに1リクエストあたりのDBクエリ数を比較するベンチマーク
+（cached_dbにログインユーザーのキャッシュ（CACHED_AUTH_USER）を組み合わせた場合も計測する）
+
+一時ユーザーでログインした状態で各エンドポイントを繰り返し呼び出し、全クエリ数とdjango_sessionへのクエリ数を数える。
+一時ユーザーと作成したデータはトランザクションごとロールバックする。
+
+使い方:
+    python manage.py benchmark_session_queries
+    python manage.py benchmark_session_queries --requests 20
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from users.models import User
+
+ENDPOINTS = [
+    ('プリセット一覧API', 'recipes:get_preset_recipes'),
+    ('共有レシピ一覧API', 'recipes:get_user_shared_recipes'),
+    ('マイページ', 'mypage'),
+]
+
+
+class Command(BaseCommand):
+    help = 'セッションの保存先ごとに、ログインが必要なエンドポイントの1リクエストあたりのDBクエリ数を比較する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10, help='各エンドポイントを呼び出す回数')
+
+    def handle(self, *args, **options):
+        session_table = Session._meta.db_table
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            user = User.objects.create_user(
+                username=f'benchmark-{uuid.uuid4().hex[:8]}',
+                email=f'benchmark-{uuid.uuid4().hex[:8]}@example.com',
+                password=uuid.uuid4().hex,
+            )
+            User.objects.activate_user(user)
+            cases = [(mode, engine, False) for mode, engine in settings.SESSION_ENGINES.items()]
+            cases.append(('cached_db + CACHED_AUTH_USER', settings.SESSION_ENGINES['cached_db'], True))
+            for label, engine, cached_auth_user in cases:
+                self.stdout.write(f'[{label}]')
+                with override_settings(SESSION_ENGINE=engine, CACHED_AUTH_USER=cached_auth_user):
+                    client = Client()
+                    client.force_login(user)
+                    for endpoint_label, url_name in ENDPOINTS:
+                        url = reverse(url_name)
+                        # 初回はキャッシュの作成を含むため計測しない
+                        client.get(url, secure=True)
+                        with CaptureQueriesContext(connection) as queries:
+                            for _ in range(options['requests']):
+                                client.get(url, secure=True)
+                        session_queries = sum(session_table in query['sql'] for query in queries.captured_queries)
+                        self.stdout.write(
+                            f'  {endpoint_label}: {len(queries) / options["requests"]:.1f} クエリ/リクエスト'
+                            f'（うち{session_table}: {session_queries / options["requests"]:.1f}）'
+                        )
+                    client.logout()
+            transaction.set_rollback(True)
@@ -0,0 +1,49 @@
+"""
+期限切れのセッションを一定件数ずつ削除するコマンド（clearsessionsのバッチ版）
+
+clearsessionsは1回のDELETEで全件を削除するため、件数が多いとテーブルを長時間ロックする。
+このコマンドは主キーを一定件数ずつ取得して削除し、バッチの間に待機を挟める。
+cron等で定期実行する。キャッシュのみのセッション（SESSION_MODE=cache）は期限切れで自動的に消えるため何もしない。
+
+使い方:
+    python manage.py clear_expired_sessions
+    python manage.py clear_expired_sessions --batch-size 500 --sleep 0.1
+"""
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DatabaseSessionStore
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from Co_fitting.utils.constants import AppConstants
+
+
+class Command(BaseCommand):
+    help = '期限切れのセッションを一定件数ずつ削除する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=AppConstants.SESSION_SWEEP_BATCH_SIZE, help='1回に削除する件数')
+        parser.add_argument('--sleep', type=float, default=0.0, help='バッチ間の待機秒数')
+
+    def handle(self, *args, **options):
+        session_store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not issubclass(session_store, DatabaseSessionStore):
+            self.stdout.write('セッションをデータベースに保存していないため、削除するものはありません')
+            return
+
+        session_model = session_store.get_model_class()
+        now = timezone.now()
+        deleted = 0
+        while True:
+            session_keys = list(
+                session_model.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:options['batch_size']]
+            )
+            if not session_keys:
+                break
+            deleted += session_model.objects.filter(session_key__in=session_keys).delete()[0]
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'期限切れのセッションを{deleted}件削除しました'))
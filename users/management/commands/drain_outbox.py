@@ -0,0 +1,48 @@
+"""
+送信待ちのメール（EmailOutbox）を送信するコマンド
+
+通常はコミット後にWebプロセスのワーカーが送信するため、このコマンドはワーカーのプロセスが終了して
+送信されずに残ったメールや、再送待ちのメールを送信する。cron等で定期実行するか、--loop で常駐させる。
+複数のプロセスで同時に実行しても、同じメールを二重に送信しない（SELECT ... FOR UPDATE SKIP LOCKED）。
+
+使い方:
+    python manage.py drain_outbox                 # 送信待ちがなくなるまで送信して終了する
+    python manage.py drain_outbox --loop          # 一定間隔で送信待ちを確認し続ける
+    python manage.py drain_outbox --batch-size 100
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from Co_fitting.utils.constants import EmailConstants
+from users.models import EmailOutbox
+
+
+class Command(BaseCommand):
+    help = '送信待ちのメールをバッチで送信する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=EmailConstants.OUTBOX_BATCH_SIZE, help='1回に送信する件数')
+        parser.add_argument('--loop', action='store_true', help='終了せずに送信待ちを確認し続ける')
+        parser.add_argument('--interval', type=float, default=EmailConstants.OUTBOX_POLL_SECONDS, help='--loop 時の確認間隔（秒）')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = self.drain(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(self.style.SUCCESS(f'{sent}件のメールを送信しました（失敗: {failed}件）'))
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    @staticmethod
+    def drain(batch_size):
+        """送信待ちがなくなるまでバッチで送信し、(送信件数, 失敗件数) の合計を返す"""
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = EmailOutbox.objects.drain(batch_size)
+            if not sent and not failed:
+                return total_sent, total_failed
+            total_sent += sent
+            total_failed += failed
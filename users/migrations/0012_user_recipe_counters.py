@@ -0,0 +1,23 @@
+# Generated by Django 6.0.5 on 2026-10-17 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_remove_deactivated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='preset_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='shared_recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
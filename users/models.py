@@ -1,9 +1,15 @@
-from django.db import models
+import datetime
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import models, transaction
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser, PermissionsMixin
 from django.contrib.auth import logout
+from django.utils import timezone
+from Co_fitting.services.email_dispatcher import email_dispatcher
 from Co_fitting.services.email_service import EmailService
 from Co_fitting.utils.security_utils import SecurityUtils
-from Co_fitting.utils.constants import AppConstants
+from Co_fitting.utils.constants import AppConstants, EmailConstants
 
 
 class UserManager(BaseUserManager):
@@ -31,6 +37,13 @@ class UserManager(BaseUserManager):
         user.save(using=self._db)
         return user
 
+    def get_quota_counts(self, user):
+        """プリセット数・共有レシピ数のカウンタを取得する（トランザクション内では行ロックして競合を防ぐ）"""
+        queryset = self.filter(pk=user.pk)
+        if transaction.get_connection(self.db).in_atomic_block:
+            queryset = queryset.select_for_update()
+        return queryset.values('preset_count', 'shared_recipe_count').get()
+
     @staticmethod
     def get_client_ip(request):
         """リクエストのIPアドレスを取得"""
@@ -38,51 +51,57 @@ class UserManager(BaseUserManager):
 
     @staticmethod
     def send_login_notification_async(user, ip_address):
-        """ログイン通知メールを非同期で送信"""
-        EmailService.send_login_notification_async(user, ip_address)
+        """ログイン通知メールを送信待ちに登録（コミット後にバックグラウンドで送信）
+
+        同じIPアドレスからの続けてのログインは、一定時間内は1通にまとめる。
+        """
+        notification = EmailService.build_coalesced_login_notification(user, ip_address)
+        if notification is not None:
+            EmailOutbox.objects.enqueue(*notification)
 
     @staticmethod
     def activate_user(user):
         """ユーザーアカウントを有効化"""
         user.is_active = True
-        user.save()
+        user.save(update_fields=['is_active'])
         return user
 
     @staticmethod
     def change_user_email(user, new_email):
         """ユーザーのメールアドレスを変更"""
         user.email = new_email
-        user.save()
+        user.save(update_fields=['email'])
         return user
 
     @staticmethod
     def create_inactive_user_with_confirmation(form, request):
-        """非アクティブユーザーを作成して確認メールを送信"""
-        user = form.save(commit=False)
-        user.is_active = False
-        form.save()
-
-        # トークン生成とメール送信
-        confirmation_link = SecurityUtils.generate_confirmation_tokens(
-            user, request, "users:signup_confirm"
-        )
-        EmailService.send_signup_confirmation_email(user, confirmation_link)
+        """非アクティブユーザーを作成して確認メールを送信待ちに登録（ユーザーの作成と同じトランザクションで登録する）"""
+        with transaction.atomic():
+            user = form.save(commit=False)
+            user.is_active = False
+            form.save()
+
+            # トークン生成と確認メールの登録
+            confirmation_link = SecurityUtils.generate_confirmation_tokens(
+                user, request, "users:signup_confirm"
+            )
+            EmailOutbox.objects.enqueue(*EmailService.build_signup_confirmation(user, confirmation_link))
 
         return user
 
     @staticmethod
     def send_email_change_confirmation(user, new_email, request):
-        """メールアドレス変更確認メールを送信"""
+        """メールアドレス変更確認メールを送信待ちに登録"""
         confirmation_link = SecurityUtils.generate_confirmation_tokens(
             user, request, "users:email_change_confirm", new_email
         )
-        EmailService.send_email_change_confirmation_email(user, new_email, confirmation_link)
+        EmailOutbox.objects.enqueue(*EmailService.build_email_change_confirmation(user, new_email, confirmation_link))
 
     @staticmethod
     def change_user_password(user, new_password, request=None):
         """ユーザーのパスワードを変更し、ログアウト処理を行う"""
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=['password'])
 
         # パスワードが変更されたら、セキュリティのためログアウトする
         logout(request)
@@ -94,6 +113,10 @@ class User(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(max_length=255, unique=True)
     is_active = models.BooleanField(default=False)
     is_staff = models.BooleanField(default=False)
+    # 上限チェック用のカウンタ（レシピの作成・削除と同じトランザクション内でF()式により更新）
+    # 既存ユーザーの保存ではupdate_fieldsで変更したフィールドだけを保存し、古いカウンタで上書きしない
+    preset_count = models.PositiveIntegerField(default=0)
+    shared_recipe_count = models.PositiveIntegerField(default=0)
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
@@ -114,3 +137,102 @@ class User(AbstractBaseUser, PermissionsMixin):
     def share_limit_value(self):
         """共有枠の上限を返す"""
         return AppConstants.SHARE_LIMIT
+
+
+class EmailOutboxManager(models.Manager):
+
+    def enqueue(self, subject, body, recipients):
+        """メールを送信待ちに登録し、コミット後にバックグラウンドのワーカーで送信する
+
+        呼び出し元のトランザクション内で登録するため、ロールバックされたメールは送信されない。
+        ワーカーのプロセスが終了しても、未送信のメールは drain_outbox コマンドで送信される。
+        """
+        outbox = self.create(
+            subject=subject, body=body, from_email=settings.DEFAULT_FROM_EMAIL or '', recipients=recipients,
+        )
+        transaction.on_commit(email_dispatcher.wake_outbox)
+        return outbox
+
+    def drain(self, batch_size=EmailConstants.OUTBOX_BATCH_SIZE, connection=None):
+        """送信待ちのメールを1バッチ分送信し、(送信件数, 失敗件数) を返す
+
+        行はSELECT ... FOR UPDATE SKIP LOCKEDで取得し、短いトランザクションで試行回数を数えて
+        次の試行時刻を送信中の猶予分だけ先に進める（取得済みとする）ため、複数のワーカーが同時に実行しても
+        同じメールを二重に送信しない。SMTPの送信はトランザクションの外で行い、行ロックを持ったまま待たない。
+        送信中にプロセスが終了した場合は、猶予が過ぎた後に再送される。
+        1バッチは1つのSMTP接続で送信する（connectionを渡せば再利用する）。
+        失敗したメールは待機時間を倍にしながら上限回数まで再送する。
+        """
+        pending = self._claim(batch_size)
+        if not pending:
+            return 0, 0
+
+        owns_connection = connection is None
+        if owns_connection:
+            connection = get_connection()
+        sent = 0
+        try:
+            for outbox in pending:
+                try:
+                    # 接続済みなら何もしない（失敗後は接続し直す）
+                    connection.open()
+                    connection.send_messages([outbox.to_message()])
+                except Exception as error:
+                    # 接続が壊れている可能性があるため閉じる（次の送信で接続し直す）
+                    connection.close()
+                    outbox.last_error = str(error)
+                    outbox.next_attempt_at = timezone.now() + datetime.timedelta(
+                        seconds=EmailConstants.OUTBOX_RETRY_BACKOFF_SECONDS * 2 ** (outbox.attempts - 1)
+                    )
+                else:
+                    outbox.sent_at = timezone.now()
+                    outbox.last_error = ''
+                    sent += 1
+        finally:
+            if owns_connection:
+                connection.close()
+            # 送信できなかった分も含めて結果を記録する（記録されなかった行は猶予の経過後に再送される）
+            self.bulk_update(pending, ['sent_at', 'last_error', 'next_attempt_at'])
+        return sent, len(pending) - sent
+
+    def _claim(self, batch_size):
+        """送信待ちのメールを取得済みにして返す（試行回数を数え、次の試行時刻を送信中の猶予分だけ進める）"""
+        now = timezone.now()
+        with transaction.atomic():
+            pending = list(
+                self.select_for_update(skip_locked=True)
+                .filter(sent_at__isnull=True, attempts__lt=EmailConstants.OUTBOX_MAX_ATTEMPTS, next_attempt_at__lte=now)
+                .order_by('id')[:batch_size]
+            )
+            for outbox in pending:
+                outbox.attempts += 1
+                outbox.next_attempt_at = now + datetime.timedelta(seconds=EmailConstants.OUTBOX_CLAIM_SECONDS)
+            self.bulk_update(pending, ['attempts', 'next_attempt_at'])
+        return pending
+
+
+class EmailOutbox(models.Model):
+    """送信待ちのメール（送信済み・送信を諦めたものも試行履歴として残す）"""
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)  # 空の場合は送信時のDEFAULT_FROM_EMAIL
+    recipients = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    objects = EmailOutboxManager()
+
+    class Meta:
+        indexes = [
+            # 送信待ち（未送信かつ送信予定時刻を過ぎたもの）の取得用
+            models.Index(fields=['sent_at', 'next_attempt_at'], name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} ({', '.join(self.recipients)})"
+
+    def to_message(self):
+        """送信用のEmailMessageを作成"""
+        return EmailMessage(self.subject, self.body, self.from_email, self.recipients)
@@ -0,0 +1,19 @@
+"""
+ユーザー関連のシグナルハンドラ
+
+ユーザーが保存・削除された際（有効化、メールアドレス・パスワードの変更、退会など）に
+認証済みユーザーのキャッシュを無効化する。
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from Co_fitting.utils.auth_cache import invalidate_cached_user
+from .models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user_on_change(sender, instance, **kwargs):
+    """キャッシュを即時とコミット後の2回無効化する（コミット前に古いデータで再キャッシュされるのを防ぐ）"""
+    user_id = instance.pk
+    invalidate_cached_user(user_id)
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
@@ -1,11 +1,22 @@
 from django.test import TestCase, override_settings, RequestFactory
 from django.core import mail
+from django.core.mail import get_connection
 from django.urls import reverse
 from unittest.mock import patch
 from django_recaptcha.client import RecaptchaResponse
 from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPException
+from Co_fitting.utils.constants import EmailConstants
+from Co_fitting.services.email_dispatcher import email_dispatcher
 from Co_fitting.tests.helpers import create_test_user, login_test_user, BaseTestCase
-from users.models import User
+from users.models import EmailOutbox, User
 import json
 
 
@@ -29,6 +40,9 @@ class SignUpTestCase(TestCase):
         })
         self.assertEqual(response.status_code, 302)
 
+        # 送信待ちに登録された確認メールを送信
+        call_command('drain_outbox', stdout=StringIO())
+
         # メール本文をプレーンテキストとして解析し、確認URLを抽出
         email_body = mail.outbox[0].body
         confirmation_url = next(line for line in email_body.split("\n") if "http" in line).strip()
@@ -141,6 +155,7 @@ class LoginTestCase(BaseTestCase):
             'password': 'securepassword123',
             'g-recaptcha-response': 'test',
         })
+        call_command('drain_outbox', stdout=StringIO())  # 送信待ちに登録されたメールを送信
         self.assertEqual(len(mail.outbox), 1)  # メールが送信されていることを確認
 
 
@@ -180,6 +195,7 @@ class EmailChangeTestCase(BaseTestCase):
         # メール送信
         new_email = 'new@example.com'
         self.client.post(self.email_change_url, {'email': new_email})
+        call_command('drain_outbox', stdout=StringIO())
         self.assertEqual(len(mail.outbox), 1)
         self.assertIn('メールアドレス変更の確認', mail.outbox[0].subject)
 
@@ -735,3 +751,158 @@ class UserSessionTestCase(BaseTestCase):
         self.assertEqual(response2.status_code, 200)
         # セッションにユーザーIDが存在することを確認
         self.assertIn('_auth_user_id', self.client.session)
+
+
+class SessionStorageTestCase(BaseTestCase):
+    """セッションの保存先と期限切れセッション削除のテスト"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_test_user()
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_db_session_skips_session_table_reads(self):
+        """cached_dbではログイン後のリクエストでdjango_sessionを読まないことをテスト"""
+        self.client.force_login(self.user)
+        self.client.get(reverse('mypage'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('mypage'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(Session._meta.db_table in query['sql'] for query in queries.captured_queries))
+
+    def test_db_session_reads_session_table(self):
+        """デフォルトのdbではリクエストごとにdjango_sessionを読むことをテスト"""
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('mypage'))
+
+        self.assertTrue(any(Session._meta.db_table in query['sql'] for query in queries.captured_queries))
+
+    def test_clear_expired_sessions_deletes_in_batches(self):
+        """期限切れのセッションだけがバッチに分けて削除されることをテスト"""
+        now = timezone.now()
+        for index in range(5):
+            Session.objects.create(session_key=f'expired{index}', session_data='', expire_date=now - timedelta(days=1))
+        Session.objects.create(session_key='active', session_data='', expire_date=now + timedelta(days=1))
+
+        output = StringIO()
+        call_command('clear_expired_sessions', batch_size=2, stdout=output)
+
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['active'])
+        self.assertIn('5件', output.getvalue())
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache')
+    def test_clear_expired_sessions_skips_cache_sessions(self):
+        """キャッシュのみのセッションではテーブルを削除しないことをテスト"""
+        Session.objects.create(session_key='expired', session_data='', expire_date=timezone.now() - timedelta(days=1))
+
+        call_command('clear_expired_sessions', stdout=StringIO())
+
+        self.assertTrue(Session.objects.filter(session_key='expired').exists())
+
+
+class EmailOutboxTestCase(BaseTestCase):
+    """送信待ちメール（EmailOutbox）と drain_outbox コマンドのテスト"""
+
+    def enqueue(self, count=1):
+        return [EmailOutbox.objects.enqueue(f'テスト{index}', '本文', ['test@example.com']) for index in range(count)]
+
+    @patch("django_recaptcha.fields.client.submit")
+    @override_settings(RECAPTCHA_TESTING=True)
+    def test_signup_enqueues_mail_without_sending(self, mocked_submit):
+        """サインアップではリクエスト中にメールを送信せず、送信待ちに登録することをテスト"""
+        mocked_submit.return_value = RecaptchaResponse(is_valid=True)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(reverse('users:signup_request'), {
+                'username': 'newuser',
+                'email': 'new@example.com',
+                'password1': 'securepassword123',
+                'password2': 'securepassword123',
+                'g-recaptcha-response': 'test',
+            })
+
+        self.assertEqual(len(mail.outbox), 0)
+        outbox = EmailOutbox.objects.get()
+        self.assertEqual(outbox.recipients, ['new@example.com'])
+        self.assertEqual(outbox.subject, 'アカウント登録の確認')
+        # コミット後にワーカーへ送信を依頼する
+        self.assertIn(email_dispatcher.wake_outbox, callbacks)
+
+    def test_drain_sends_batch_over_one_connection(self):
+        """1バッチを1つの接続で送信し、送信日時と試行回数を記録することをテスト"""
+        outboxes = self.enqueue(3)
+
+        with patch('users.models.get_connection', wraps=get_connection) as mock_get_connection:
+            sent, failed = EmailOutbox.objects.drain()
+
+        self.assertEqual((sent, failed), (3, 0))
+        self.assertEqual(mock_get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        for outbox in outboxes:
+            outbox.refresh_from_db()
+            self.assertIsNotNone(outbox.sent_at)
+            self.assertEqual(outbox.attempts, 1)
+
+    def test_drain_does_not_resend(self):
+        """送信済みのメールは再送しないことをテスト"""
+        self.enqueue()
+        EmailOutbox.objects.drain()
+
+        self.assertEqual(EmailOutbox.objects.drain(), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_mail_retried_with_backoff(self):
+        """送信に失敗したメールは試行を記録し、待機時間の経過後に再送することをテスト"""
+        outbox, = self.enqueue()
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=SMTPException('送信エラー')):
+            self.assertEqual(EmailOutbox.objects.drain(), (0, 1))
+
+        outbox.refresh_from_db()
+        self.assertEqual(outbox.attempts, 1)
+        self.assertIn('送信エラー', outbox.last_error)
+        self.assertGreater(outbox.next_attempt_at, timezone.now())
+        # 待機中は再送しない
+        self.assertEqual(EmailOutbox.objects.drain(), (0, 0))
+
+        EmailOutbox.objects.filter(pk=outbox.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(EmailOutbox.objects.drain(), (1, 0))
+        outbox.refresh_from_db()
+        self.assertEqual(outbox.attempts, 2)
+        self.assertEqual(outbox.last_error, '')
+
+    def test_claimed_mail_hidden_while_sending(self):
+        """送信中のメールは取得済みとして、同時に実行された別の送信処理では取得されないことをテスト"""
+        self.enqueue()
+        concurrent_results = []
+
+        def send_messages(messages):
+            concurrent_results.append(EmailOutbox.objects.drain())
+            return len(messages)
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=send_messages):
+            self.assertEqual(EmailOutbox.objects.drain(), (1, 0))
+
+        self.assertEqual(concurrent_results, [(0, 0)])
+
+    def test_gives_up_after_max_attempts(self):
+        """上限回数まで失敗したメールは送信しないことをテスト"""
+        self.enqueue()
+        EmailOutbox.objects.update(attempts=EmailConstants.OUTBOX_MAX_ATTEMPTS)
+
+        self.assertEqual(EmailOutbox.objects.drain(), (0, 0))
+
+    def test_drain_outbox_command_drains_all_batches(self):
+        """drain_outbox コマンドがバッチを繰り返して送信待ちをすべて送信することをテスト"""
+        self.enqueue(5)
+        output = StringIO()
+
+        call_command('drain_outbox', batch_size=2, stdout=output)
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertIn('5件', output.getvalue())
+        self.assertFalse(EmailOutbox.objects.filter(sent_at__isnull=True).exists())